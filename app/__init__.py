@@ -1,13 +1,25 @@
 from flask import Flask
 from app.utils.persistence_manager import PersistenceManager
 from app.config import config_dict, Config
+from app.commands import register_commands
+from app.utils.indexes import uncovered_queries
+from app.utils.compression import register_compression
+from app.utils.json_provider import init_json
+# Registra o esquema persistence-mongo:// usado em RATELIMIT_STORAGE_URI.
+from app.utils.limiter_storage import PersistenceMongoStorage  # noqa: F401
+from app.utils.metrics import register_metrics
+from app.utils.migrations import migrate
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 from flask_cors import CORS
+import atexit
 import os
 
 limiter = Limiter(get_remote_address, default_limits=["100 per minute"])
 
+# O cliente do Mongo vive pelo processo inteiro; fecha só no encerramento.
+atexit.register(PersistenceManager.close_connection)
+
 def create_app():
     app = Flask(__name__)
 
@@ -18,6 +30,9 @@ def create_app():
     app.config.from_object(Config)
 
     limiter.init_app(app)
+    init_json(app)
+    register_metrics(app, limiter)
+    register_compression(app)
 
     with app.app_context():  
         from app.routes import auth, user, spotify, review 
@@ -26,10 +41,16 @@ def create_app():
         app.register_blueprint(user.bp)
         app.register_blueprint(spotify.bp)
         app.register_blueprint(review.bp)
-        
-    @app.teardown_appcontext
-    def close_db_connection(exception):
-        if hasattr(PersistenceManager, "close_connection"):
+
+    register_commands(app)
+
+    if app.config.get("MONGO_MIGRATE_ON_STARTUP"):
+        with app.app_context():
+            migrate(PersistenceManager.get_database())
+            for collection, equality, sort, ranges, source in uncovered_queries():
+                app.logger.warning("Query on %s %s sort=%s ranges=%s is not covered by any index (%s)",
+                                   collection, equality, sort, ranges, source)
+            # Servidores com pre-fork criam o cliente depois do fork.
             PersistenceManager.close_connection()
 
     return app
@@ -0,0 +1,50 @@
+import click
+from flask.cli import with_appcontext
+from app.models.album_stats import AlbumStats
+from app.utils.indexes import uncovered_queries
+from app.utils.migrations import MigrationLockTimeout, migrate, pending_migrations
+from app.utils.persistence_manager import PersistenceManager
+
+
+@click.command("rebuild-album-stats")
+@click.option("--album-id", default=None, help="Reconstrói apenas o álbum informado.")
+@with_appcontext
+def rebuild_album_stats(album_id):
+    """Recalcula album_stats a partir da coleção reviews."""
+    total = AlbumStats.rebuild(album_id)
+    click.echo(f"Rebuilt stats for {total} album(s)")
+
+
+@click.command("db-upgrade")
+@with_appcontext
+def db_upgrade():
+    """Aplica as migrações pendentes e cria os índices registrados."""
+    try:
+        applied = migrate(PersistenceManager.get_database())
+    except MigrationLockTimeout as e:
+        raise click.ClickException(str(e))
+    click.echo(f"Applied migrations: {applied}" if applied else "No pending migrations")
+    click.echo("Indexes are up to date")
+
+
+@click.command("db-check")
+@with_appcontext
+def db_check():
+    """Lista migrações pendentes e consultas sem índice que as cubra."""
+    pending = pending_migrations(PersistenceManager.get_database())
+    for version, description, _ in pending:
+        click.echo(f"Pending migration {version}: {description}")
+
+    uncovered = uncovered_queries()
+    for collection, equality, sort, ranges, source in uncovered:
+        click.echo(f"Uncovered query on {collection} {equality} sort={sort} ranges={ranges} ({source})")
+
+    if pending or uncovered:
+        raise SystemExit(1)
+    click.echo("Database is up to date")
+
+
+def register_commands(app):
+    app.cli.add_command(rebuild_album_stats)
+    app.cli.add_command(db_upgrade)
+    app.cli.add_command(db_check)
@@ -6,10 +6,73 @@ load_dotenv(find_dotenv())
 class Config:
     SECRET_KEY = os.getenv("SECRET_KEY", "default_secret_key") 
     MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/groovesync")
+    MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", 100))
+    MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", 0))
+    MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", 300000))
+    MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", 5000))
+    MONGO_SOCKET_TIMEOUT_MS = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", 30000))
+    MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", 5000))
+    MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", 2000))
+    MONGO_COMPRESSORS = os.getenv("MONGO_COMPRESSORS", "")
+    MONGO_MIGRATE_ON_STARTUP = os.getenv("MONGO_MIGRATE_ON_STARTUP", "false").lower() == "true"
     JWT_EXPIRATION_SECONDS = int(os.getenv("JWT_EXPIRATION_SECONDS", 1800))
+    BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12))
+    BCRYPT_WORKERS = int(os.getenv("BCRYPT_WORKERS", 4))
+    BCRYPT_MAX_PENDING = int(os.getenv("BCRYPT_MAX_PENDING", 64))
+    BCRYPT_TIMEOUT = float(os.getenv("BCRYPT_TIMEOUT", 10))
+    PRINCIPAL_CACHE_TTL = int(os.getenv("PRINCIPAL_CACHE_TTL", 30))
+    PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", 10000))
     SPOTIFY_CLIENT_ID = os.getenv("SPOTIFY_CLIENT_ID")
     SPOTIFY_CLIENT_SECRET = os.getenv("SPOTIFY_CLIENT_SECRET")
     SPOTIFY_REDIRECT_URI = os.getenv("SPOTIFY_REDIRECT_URI")
+    SPOTIFY_TIMEOUT = float(os.getenv("SPOTIFY_TIMEOUT", 5))
+    SPOTIFY_RETRIES = int(os.getenv("SPOTIFY_RETRIES", 3))
+    SPOTIFY_BACKOFF_FACTOR = float(os.getenv("SPOTIFY_BACKOFF_FACTOR", 0.3))
+    SPOTIFY_POOL_CONNECTIONS = int(os.getenv("SPOTIFY_POOL_CONNECTIONS", 4))
+    SPOTIFY_POOL_SIZE = int(os.getenv("SPOTIFY_POOL_SIZE", 32))
+    SPOTIFY_RATE_LIMIT = int(os.getenv("SPOTIFY_RATE_LIMIT", 20))
+    SPOTIFY_RATE_LEASE = int(os.getenv("SPOTIFY_RATE_LEASE", 5))
+    SPOTIFY_ACQUIRE_TIMEOUT = float(os.getenv("SPOTIFY_ACQUIRE_TIMEOUT", 1))
+    SPOTIFY_MAX_ATTEMPTS = int(os.getenv("SPOTIFY_MAX_ATTEMPTS", 3))
+    SPOTIFY_MAX_RETRY_WAIT = float(os.getenv("SPOTIFY_MAX_RETRY_WAIT", 2))
+    SPOTIFY_BREAKER_THRESHOLD = int(os.getenv("SPOTIFY_BREAKER_THRESHOLD", 5))
+    SPOTIFY_BREAKER_RESET = int(os.getenv("SPOTIFY_BREAKER_RESET", 30))
+    SPOTIFY_FANOUT_WORKERS = int(os.getenv("SPOTIFY_FANOUT_WORKERS", 16))
+    SEARCH_CACHE_TTL = int(os.getenv("SEARCH_CACHE_TTL", 60))
+    SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", 5000))
+    SPOTIFY_DASHBOARD_TIMEOUT = float(os.getenv("SPOTIFY_DASHBOARD_TIMEOUT", 3))
+    CATALOG_CACHE_BACKEND = os.getenv("CATALOG_CACHE_BACKEND", "memory")
+    CATALOG_CACHE_SIZE = int(os.getenv("CATALOG_CACHE_SIZE", 10000))
+    CATALOG_CACHE_TTL_ALBUM = int(os.getenv("CATALOG_CACHE_TTL_ALBUM", 24 * 3600))
+    CATALOG_CACHE_TTL_ARTIST = int(os.getenv("CATALOG_CACHE_TTL_ARTIST", 6 * 3600))
+    CATALOG_CACHE_TTL_ARTIST_ALBUMS = int(os.getenv("CATALOG_CACHE_TTL_ARTIST_ALBUMS", 6 * 3600))
+    CATALOG_CACHE_TTL_USER = int(os.getenv("CATALOG_CACHE_TTL_USER", 3600))
+    REVIEW_BULK_MAX_ITEMS = int(os.getenv("REVIEW_BULK_MAX_ITEMS", 50000))
+    REVIEW_BULK_CHUNK_SIZE = int(os.getenv("REVIEW_BULK_CHUNK_SIZE", 1000))
+    LEADERBOARD_PRIOR_COUNT = float(os.getenv("LEADERBOARD_PRIOR_COUNT", 10))
+    LEADERBOARD_PRIOR_MEAN = float(os.getenv("LEADERBOARD_PRIOR_MEAN", 2.5))
+    TRENDING_HALF_LIFE_HOURS = float(os.getenv("TRENDING_HALF_LIFE_HOURS", 72))
+    TRENDING_WINDOW_DAYS = float(os.getenv("TRENDING_WINDOW_DAYS", 7))
+    FEED_CACHE_TTL = float(os.getenv("FEED_CACHE_TTL", 5))
+    SPOTIFY_TOKEN_KEYS = os.getenv("SPOTIFY_TOKEN_KEYS", "")
+    SPOTIFY_TOKEN_REFRESH_MARGIN = int(os.getenv("SPOTIFY_TOKEN_REFRESH_MARGIN", 300))
+    SPOTIFY_TOKEN_ACTIVE_WINDOW = int(os.getenv("SPOTIFY_TOKEN_ACTIVE_WINDOW", 86400))
+    SPOTIFY_TOKEN_REFRESH_INTERVAL = float(os.getenv("SPOTIFY_TOKEN_REFRESH_INTERVAL", 60))
+    SPOTIFY_TOKEN_CACHE_SIZE = int(os.getenv("SPOTIFY_TOKEN_CACHE_SIZE", 10000))
+    SPOTIFY_CLIENT_CACHE_SIZE = int(os.getenv("SPOTIFY_CLIENT_CACHE_SIZE", 1000))
+    RATELIMIT_STORAGE_URI = os.getenv("RATELIMIT_STORAGE_URI", "persistence-mongo://")
+    RATELIMIT_STORAGE_OPTIONS = {
+        "batch_size": int(os.getenv("RATELIMIT_BATCH_SIZE", 10)),
+        "flush_interval": float(os.getenv("RATELIMIT_FLUSH_INTERVAL", 1)),
+    }
+    RATELIMIT_IN_MEMORY_FALLBACK_ENABLED = True
+    JSON_PROVIDER = os.getenv("JSON_PROVIDER", "orjson")
+    COMPRESS_ENABLED = os.getenv("COMPRESS_ENABLED", "true").lower() == "true"
+    COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", 500))
+    COMPRESS_LEVEL = int(os.getenv("COMPRESS_LEVEL", 6))
+    COMPRESS_BROTLI_QUALITY = int(os.getenv("COMPRESS_BROTLI_QUALITY", 4))
+    METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+    METRICS_PATH = os.getenv("METRICS_PATH", "/metrics")
 
 class DevelopmentConfig(Config):
     DEBUG = True
@@ -0,0 +1,308 @@
+import math
+from app.utils.persistence_manager import PersistenceManager
+from app.utils.pagination import keyset_filter
+from datetime import datetime, timedelta
+from flask import current_app
+from pymongo import ReturnDocument, UpdateOne
+
+# Referência fixa para trend; mudar exige reconstruir o ranking.
+TREND_EPOCH = datetime(2024, 1, 1)
+
+
+def _logsumexp(values):
+    if not values:
+        return None
+    peak = max(values)
+    return peak + math.log(sum(math.exp(value - peak) for value in values))
+
+
+class AlbumStats:
+    """
+    Agregados de avaliação por álbum (coleção album_stats), mantidos
+    incrementalmente a cada escrita em reviews. version é incrementado a
+    cada escrita e identifica o estado das avaliações do álbum (ETag).
+    """
+
+    @staticmethod
+    def bucket(rate):
+        return str(min(int(rate), 5))
+
+    @staticmethod
+    def get(album_id):
+        db = PersistenceManager.get_database()
+        return db.album_stats.find_one({"_id": album_id})
+
+    @staticmethod
+    def overall_rating(stats):
+        if not stats or not stats.get("count"):
+            return None
+        return round(stats["sum"] / stats["count"], 1)
+
+    @staticmethod
+    def _ranking_settings():
+        config = current_app.config
+        half_life = config.get('TRENDING_HALF_LIFE_HOURS', 72) * 3600
+        return {
+            "prior_count": config.get('LEADERBOARD_PRIOR_COUNT', 10),
+            "prior_mean": config.get('LEADERBOARD_PRIOR_MEAN', 2.5),
+            "tau": half_life / math.log(2),
+        }
+
+    @staticmethod
+    def score(count, total, settings=None):
+        """
+        Média bayesiana: a média do álbum puxada para prior_mean com o peso
+        de prior_count avaliações, para que poucas notas altas não dominem.
+        """
+        settings = settings or AlbumStats._ranking_settings()
+        if not count:
+            return None
+        return (settings["prior_count"] * settings["prior_mean"] + total) / (settings["prior_count"] + count)
+
+    @staticmethod
+    def trend_point(timestamp, settings=None):
+        """
+        Contribuição de uma avaliação para trend, em escala logarítmica:
+        trend = ln(soma de exp((t - TREND_EPOCH) / tau)). Comparar trend entre
+        álbuns equivale a comparar a soma das avaliações com decaimento
+        exponencial até agora, sem reescrever os álbuns com o passar do tempo.
+        """
+        settings = settings or AlbumStats._ranking_settings()
+        return (timestamp - TREND_EPOCH).total_seconds() / settings["tau"]
+
+    @staticmethod
+    def _pipeline(inc, last_review_at=None, trend_add=None, trend_remove=None):
+        """
+        Update em pipeline que aplica os incrementos e recalcula score no
+        mesmo comando, mantendo a ordenação do ranking sempre atualizada.
+        Com trend_remove e trend_add juntos (avaliação refeita), a parcela
+        antiga sai antes de a nova entrar. Sem avaliações, score e trend
+        ficam null, como em rebuild.
+        """
+        settings = AlbumStats._ranking_settings()
+        fields = {field: {"$add": [{"$ifNull": [f"${field}", 0]}, delta]} for field, delta in inc.items()}
+        stages = [{"$set": fields}]
+        if last_review_at is not None:
+            fields["last_review_at"] = {"$max": ["$last_review_at", last_review_at]}
+        if trend_remove is not None:
+            remaining = {"$subtract": [1, {"$exp": {"$subtract": [trend_remove, "$trend"]}}]}
+            fields["trend"] = {"$cond": [
+                {"$gt": [remaining, 1e-9]}, {"$add": ["$trend", {"$ln": remaining}]}, None]}
+        if trend_add is not None:
+            added = {"$cond": [
+                {"$eq": [{"$ifNull": ["$trend", None]}, None]},
+                trend_add,
+                {"$add": [{"$max": ["$trend", trend_add]},
+                          {"$ln": {"$add": [1, {"$exp": {"$subtract": [
+                              {"$min": ["$trend", trend_add]}, {"$max": ["$trend", trend_add]}]}}]}}]},
+            ]}
+            if "trend" in fields:
+                stages.append({"$set": {"trend": added}})
+            else:
+                fields["trend"] = added
+
+        prior_count, prior_mean = settings["prior_count"], settings["prior_mean"]
+        return stages + [
+            {"$set": {"score": {"$cond": [
+                {"$gt": ["$count", 0]},
+                {"$divide": [{"$add": [prior_count * prior_mean, "$sum"]}, {"$add": [prior_count, "$count"]}]},
+                None,
+            ]}}},
+        ]
+
+    @staticmethod
+    def record_review(album_id, rate, timestamp):
+        db = PersistenceManager.get_database()
+        db.album_stats.update_one(
+            {"_id": album_id},
+            AlbumStats._pipeline(
+                {"count": 1, "sum": rate, f"histogram.{AlbumStats.bucket(rate)}": 1, "version": 1},
+                last_review_at=timestamp,
+                trend_add=AlbumStats.trend_point(timestamp),
+            ),
+            upsert=True
+        )
+
+    @staticmethod
+    def record_reviews(reviews, batch_size=1000):
+        """
+        Versão em lote de record_review: soma as avaliações por álbum em
+        memória e grava um update por álbum. reviews é um iterável de
+        (album_id, rate, timestamp).
+        """
+        settings = AlbumStats._ranking_settings()
+        totals = {}
+        for album_id, rate, timestamp in reviews:
+            entry = totals.setdefault(album_id, {"inc": {"count": 0, "sum": 0, "version": 1},
+                                                 "last_review_at": timestamp, "trend": []})
+            entry["inc"]["count"] += 1
+            entry["inc"]["sum"] += rate
+            bucket = f"histogram.{AlbumStats.bucket(rate)}"
+            entry["inc"][bucket] = entry["inc"].get(bucket, 0) + 1
+            entry["last_review_at"] = max(entry["last_review_at"], timestamp)
+            entry["trend"].append(AlbumStats.trend_point(timestamp, settings))
+
+        db = PersistenceManager.get_database()
+        requests = []
+        for album_id, entry in totals.items():
+            requests.append(UpdateOne(
+                {"_id": album_id},
+                AlbumStats._pipeline(entry["inc"], entry["last_review_at"], _logsumexp(entry["trend"])),
+                upsert=True
+            ))
+            if len(requests) >= batch_size:
+                db.album_stats.bulk_write(requests, ordered=False)
+                requests = []
+        if requests:
+            db.album_stats.bulk_write(requests, ordered=False)
+        return len(totals)
+
+    @staticmethod
+    def _rating_change(old_rate, new_rate):
+        inc = {"sum": new_rate - old_rate, "version": 1}
+        old_bucket, new_bucket = AlbumStats.bucket(old_rate), AlbumStats.bucket(new_rate)
+        if old_bucket != new_bucket:
+            inc[f"histogram.{old_bucket}"] = -1
+            inc[f"histogram.{new_bucket}"] = 1
+        return inc
+
+    @staticmethod
+    def change_rating(album_id, old_rate, new_rate):
+        db = PersistenceManager.get_database()
+        db.album_stats.update_one({"_id": album_id}, AlbumStats._pipeline(AlbumStats._rating_change(old_rate, new_rate)))
+
+    @staticmethod
+    def replace_review(album_id, old_rate, new_rate, old_timestamp, new_timestamp):
+        """
+        Avaliação refeita pelo mesmo usuário: troca a nota e move a parcela
+        de trend (e last_review_at) do momento antigo para o novo.
+        """
+        db = PersistenceManager.get_database()
+        db.album_stats.update_one({"_id": album_id}, AlbumStats._pipeline(
+            AlbumStats._rating_change(old_rate, new_rate),
+            last_review_at=new_timestamp,
+            trend_add=AlbumStats.trend_point(new_timestamp),
+            trend_remove=AlbumStats.trend_point(old_timestamp) if old_timestamp else None,
+        ))
+
+    @staticmethod
+    def remove_review(album_id, rate, timestamp=None):
+        db = PersistenceManager.get_database()
+        stats = db.album_stats.find_one_and_update(
+            {"_id": album_id},
+            AlbumStats._pipeline(
+                {"count": -1, "sum": -rate, f"histogram.{AlbumStats.bucket(rate)}": -1, "version": 1},
+                trend_remove=AlbumStats.trend_point(timestamp) if timestamp else None,
+            ),
+            return_document=ReturnDocument.AFTER
+        )
+        last_review_at = stats.get("last_review_at") if stats else None
+        if timestamp and last_review_at and last_review_at <= timestamp:
+            # A avaliação removida era a mais recente: last_review_at passa a
+            # ser a da mais nova que restou (índice album_timeline). O filtro
+            # não desfaz uma avaliação nova gravada nesse meio tempo.
+            newest = db.reviews.find_one({"albumId": album_id}, {"timestamp": 1},
+                                         sort=[("timestamp", -1), ("_id", -1)])
+            db.album_stats.update_one(
+                {"_id": album_id, "last_review_at": last_review_at},
+                {"$set": {"last_review_at": newest["timestamp"]}} if newest else {"$unset": {"last_review_at": ""}}
+            )
+
+    @staticmethod
+    def touch(album_id):
+        """
+        Marca uma mudança que não altera os agregados (ex.: só o texto).
+        """
+        db = PersistenceManager.get_database()
+        db.album_stats.update_one({"_id": album_id}, {"$inc": {"version": 1}})
+
+    @staticmethod
+    def rebuild(album_id=None, batch_size=1000):
+        """
+        Recalcula os agregados e o ranking a partir da coleção reviews. Sem
+        album_id, reconstrói todos os álbuns. Retorna o número de álbuns
+        gravados.
+        """
+        db = PersistenceManager.get_database()
+        settings = AlbumStats._ranking_settings()
+        rebuilt_at = datetime.utcnow()
+        # Parcelas de trend relativas a agora (<= 1), para não estourar exp.
+        now_point = AlbumStats.trend_point(rebuilt_at, settings)
+        pipeline = []
+        if album_id is not None:
+            pipeline.append({"$match": {"albumId": album_id}})
+        pipeline.append({"$group": {
+            "_id": {"album": "$albumId", "bucket": {"$min": [{"$floor": "$rate"}, 5]}},
+            "count": {"$sum": 1},
+            "sum": {"$sum": "$rate"},
+            "last_review_at": {"$max": "$timestamp"},
+            "trend": {"$sum": {"$exp": {"$divide": [
+                {"$subtract": ["$timestamp", rebuilt_at]}, settings["tau"] * 1000]}}},
+        }})
+
+        stats = {}
+        for row in db.reviews.aggregate(pipeline, allowDiskUse=True):
+            album = row["_id"]["album"]
+            entry = stats.setdefault(album, {"count": 0, "sum": 0, "histogram": {}, "trend": 0,
+                                             "last_review_at": None, "rebuilt_at": rebuilt_at})
+            entry["count"] += row["count"]
+            entry["trend"] += row["trend"]
+            entry["sum"] += row["sum"]
+            entry["histogram"][str(int(row["_id"]["bucket"]))] = row["count"]
+            if entry["last_review_at"] is None or (row["last_review_at"] and row["last_review_at"] > entry["last_review_at"]):
+                entry["last_review_at"] = row["last_review_at"]
+
+        requests = []
+        for album, entry in stats.items():
+            entry["score"] = AlbumStats.score(entry["count"], entry["sum"], settings)
+            entry["trend"] = now_point + math.log(entry["trend"]) if entry["trend"] > 0 else None
+            # $inc em version em vez de substituir o documento: a versão
+            # nunca volta a um valor já usado como ETag.
+            requests.append(UpdateOne({"_id": album}, {"$set": entry, "$inc": {"version": 1}}, upsert=True))
+            if len(requests) >= batch_size:
+                db.album_stats.bulk_write(requests, ordered=False)
+                requests = []
+        if requests:
+            db.album_stats.bulk_write(requests, ordered=False)
+
+        if album_id is not None:
+            if album_id not in stats:
+                db.album_stats.delete_one({"_id": album_id})
+        else:
+            db.album_stats.delete_many({"rebuilt_at": {"$ne": rebuilt_at}})
+
+        return len(stats)
+
+    @staticmethod
+    def top_rated(limit=20, cursor=None):
+        """
+        Álbuns em ordem decrescente de score (média bayesiana), pelo índice
+        top_rated. Recebe limit + 1 para que a rota monte o próximo cursor.
+        """
+        query = {"score": {"$ne": None}, **keyset_filter(cursor, field="score")}
+        db = PersistenceManager.get_database()
+        return list(db.album_stats.find(query).sort([("score", -1), ("_id", -1)]).limit(limit))
+
+    @staticmethod
+    def trending(limit=20, cursor=None, window=None):
+        """
+        Álbuns com avaliação dentro da janela, em ordem decrescente de trend.
+        """
+        window = window or timedelta(days=current_app.config.get('TRENDING_WINDOW_DAYS', 7))
+        query = {
+            "trend": {"$ne": None},
+            "last_review_at": {"$gte": datetime.utcnow() - window},
+            **keyset_filter(cursor, field="trend"),
+        }
+        db = PersistenceManager.get_database()
+        return list(db.album_stats.find(query).sort([("trend", -1), ("_id", -1)]).limit(limit))
+
+    @staticmethod
+    def summary(stats):
+        return {
+            "album_id": stats["_id"],
+            "overall_rating": AlbumStats.overall_rating(stats),
+            "score": round(stats["score"], 3) if stats.get("score") is not None else None,
+            "reviews": stats.get("count", 0),
+            "last_review_at": stats["last_review_at"].isoformat() if stats.get("last_review_at") else None,
+        }
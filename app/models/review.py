@@ -1,5 +1,11 @@
 from app.utils.persistence_manager import PersistenceManager
-from datetime import datetime
+from app.models.album_stats import AlbumStats
+from app.models.user_stats import UserStats
+from app.utils.pagination import keyset_filter
+from datetime import datetime, timezone
+from pymongo import InsertOne, ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from bson import ObjectId
 
 class Review:
     def __init__(self, user_id, rate, album_id, text=None):
@@ -7,9 +13,13 @@ class Review:
         self.rate = rate
         self.album_id = album_id
         self.text = text
-        self.timestamp = datetime.utcnow().date()
+        self.timestamp = datetime.utcnow()
 
     def save(self):
+        """
+        Cria ou substitui a avaliação do usuário para o álbum: a chave
+        (albumId, userId) é única. Retorna o _id da avaliação.
+        """
         db = PersistenceManager.get_database()
         if not self.is_valid_user(self.user_id):
             raise ValueError("Invalid user ID")
@@ -17,15 +27,112 @@ class Review:
         if not (0 <= self.rate <= 5):
             raise ValueError("Rate must be between 0 and 5")
 
-        review_data = {
-            "userId": self.user_id,
-            "rate": self.rate,
-            "albumId": self.album_id,
-            "text": self.text,
-            "timestamp": self.timestamp
+        review_id = ObjectId()
+        update = {
+            "$set": {"rate": self.rate, "text": self.text, "timestamp": self.timestamp},
+            "$setOnInsert": {"_id": review_id},
+        }
+        key = {"albumId": self.album_id, "userId": self.user_id}
+        try:
+            previous = db.reviews.find_one_and_update(key, update, upsert=True, return_document=ReturnDocument.BEFORE)
+        except DuplicateKeyError:
+            # Outro upsert concorrente inseriu a mesma chave primeiro.
+            previous = db.reviews.find_one_and_update(key, update, upsert=True, return_document=ReturnDocument.BEFORE)
+
+        if previous is None:
+            AlbumStats.record_review(self.album_id, self.rate, self.timestamp)
+            UserStats.record_change(self.user_id, 1)
+            return review_id
+
+        # O $set moveu timestamp para agora: a parcela de trend acompanha.
+        AlbumStats.replace_review(self.album_id, previous["rate"], self.rate,
+                                  previous.get("timestamp"), self.timestamp)
+        UserStats.record_change(self.user_id)
+        return previous["_id"]
+
+    @staticmethod
+    def bulk_save(items, chunk_size=1000):
+        """
+        Importa avaliações em lote. Os usuários são validados com uma única
+        consulta $in e as inserções vão em bulk_write não ordenado, em
+        blocos de chunk_size. Itens inválidos ou recusados pelo banco não
+        interrompem o restante: voltam em errors, com o índice na entrada.
+        """
+        errors = []
+        documents = []
+        for index, item in enumerate(items):
+            try:
+                documents.append((index, Review._bulk_document(item)))
+            except ValueError as e:
+                errors.append({"index": index, "message": str(e)})
+
+        db = PersistenceManager.get_database()
+        user_ids = sorted({document["userId"] for _, document in documents})
+        valid_users = {user["_id"] for user in db.users.find({"_id": {"$in": user_ids}}, {"_id": 1})}
+
+        pending = []
+        for index, document in documents:
+            if document["userId"] in valid_users:
+                pending.append((index, document))
+            else:
+                errors.append({"index": index, "message": "Invalid user ID"})
+
+        inserted = []
+        for start in range(0, len(pending), chunk_size):
+            chunk = pending[start:start + chunk_size]
+            failed = {}
+            try:
+                db.reviews.bulk_write([InsertOne(document) for _, document in chunk], ordered=False)
+            except BulkWriteError as e:
+                failed = {error["index"]: Review._write_error_message(error) for error in e.details["writeErrors"]}
+            for position, (index, document) in enumerate(chunk):
+                if position in failed:
+                    errors.append({"index": index, "message": failed[position]})
+                else:
+                    inserted.append(document)
+
+        AlbumStats.record_reviews((doc["albumId"], doc["rate"], doc["timestamp"]) for doc in inserted)
+        UserStats.record_reviews(doc["userId"] for doc in inserted)
+        errors.sort(key=lambda error: error["index"])
+        return {"inserted": len(inserted), "errors": errors}
+
+    @staticmethod
+    def _write_error_message(error):
+        if error.get("code") == 11000:
+            return "Review already exists for this user and album"
+        return error.get("errmsg", "Write failed")
+
+    @staticmethod
+    def _bulk_document(item):
+        if not isinstance(item, dict):
+            raise ValueError("Review must be an object")
+        for field in ("userId", "albumId", "rate"):
+            if item.get(field) is None:
+                raise ValueError(f"Missing field '{field}'")
+        if not isinstance(item["userId"], str) or not isinstance(item["albumId"], str):
+            raise ValueError("userId and albumId must be strings")
+        rate = item["rate"]
+        if isinstance(rate, bool) or not isinstance(rate, (int, float)) or not (0 <= rate <= 5):
+            raise ValueError("Rate must be between 0 and 5")
+
+        timestamp = item.get("timestamp")
+        if timestamp is None:
+            timestamp = datetime.utcnow()
+        else:
+            try:
+                timestamp = datetime.fromisoformat(timestamp)
+            except (TypeError, ValueError):
+                raise ValueError("Invalid timestamp")
+            if timestamp.tzinfo is not None:
+                timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+
+        return {
+            "userId": item["userId"],
+            "rate": rate,
+            "albumId": item["albumId"],
+            "text": item.get("text"),
+            "timestamp": timestamp
         }
-        result = db.reviews.insert_one(review_data)
-        return result.inserted_id
 
     @staticmethod
     def is_valid_user(user_id):
@@ -33,9 +140,10 @@ class Review:
         return db.users.find_one({"_id": user_id}) is not None
 
     @staticmethod
-    def get_by_user(user_id, limit=1):
+    def get_by_user(user_id, limit=1, cursor=None):
+        query = {"userId": user_id, **keyset_filter(cursor)}
         db = PersistenceManager.get_database()
-        return list(db.reviews.find({"userId": user_id}).sort("timestamp", -1).limit(limit))
+        return list(db.reviews.find(query).sort([("timestamp", -1), ("_id", -1)]).limit(limit))
 
     @staticmethod
     def update(review_id, rate=None, text=None):
@@ -48,20 +156,59 @@ class Review:
         if text is not None:
             update_data["text"] = text
 
-        result = db.reviews.update_one(
+        previous = db.reviews.find_one_and_update(
             {"_id": review_id},
-            {"$set": update_data}
+            {"$set": update_data},
+            return_document=ReturnDocument.BEFORE
         )
-        return result.matched_count > 0 and result.modified_count > 0
+        if previous is None:
+            return False
+
+        changed = any(previous.get(field) != value for field, value in update_data.items())
+        if rate is not None and previous["rate"] != rate:
+            AlbumStats.change_rating(previous["albumId"], previous["rate"], rate)
+        elif changed:
+            AlbumStats.touch(previous["albumId"])
+        if changed:
+            UserStats.record_change(previous["userId"])
+        return changed
 
     @staticmethod
     def delete(review_id):
         db = PersistenceManager.get_database()
-        result = db.reviews.delete_one({"_id": review_id})
-        return result.deleted_count > 0
+        deleted = db.reviews.find_one_and_delete({"_id": review_id})
+        if deleted is None:
+            return False
+
+        AlbumStats.remove_review(deleted["albumId"], deleted["rate"], deleted.get("timestamp"))
+        UserStats.record_change(deleted["userId"], -1)
+        return True
 
     @staticmethod
-    def get_by_album(album_id):
+    def get_by_album(album_id, limit=20, cursor=None, exclude_user_id=None):
+        query = {"albumId": album_id, **keyset_filter(cursor)}
+        if exclude_user_id is not None:
+            query["userId"] = {"$ne": exclude_user_id}
         db = PersistenceManager.get_database()
-        return list(db.reviews.find({"albumId": album_id}).sort("timestamp", -1))
+        return list(db.reviews.find(query).sort([("timestamp", -1), ("_id", -1)]).limit(limit))
+
+    @staticmethod
+    def recent(limit=20, cursor=None):
+        query = keyset_filter(cursor)
+        db = PersistenceManager.get_database()
+        return list(db.reviews.find(query).sort([("timestamp", -1), ("_id", -1)]).limit(limit))
+
+    @staticmethod
+    def get_by_user_and_album(user_id, album_id):
+        db = PersistenceManager.get_database()
+        return db.reviews.find_one({"albumId": album_id, "userId": user_id})
+
+    @staticmethod
+    def serialize(review):
+        data = dict(review)
+        if "_id" in data:
+            data["_id"] = str(data["_id"])
+        if isinstance(data.get("timestamp"), datetime):
+            data["timestamp"] = data["timestamp"].isoformat()
+        return data
 
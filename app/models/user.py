@@ -1,6 +1,18 @@
-import bcrypt
+import re
+from app.config import Config
+from app.utils.cache import TTLCache
+from app.utils.password_hasher import PasswordHasher
 from app.utils.persistence_manager import PersistenceManager
-import difflib
+from app.utils.pagination import decode_cursor, encode_cursor, is_cursor_id
+
+PUBLIC_FIELDS = {"_id": 1, "username": 1, "spotify_id": 1}
+SEARCH_CANDIDATES = 2000
+SEARCH_MIN_SIMILARITY = 0.3
+SEARCH_PREFIX_BOOST = 1.0
+
+# Usuários autenticados recentemente, para token_required não ir ao banco a
+# cada requisição. Outros workers podem ver um usuário removido por até TTL.
+principal_cache = TTLCache(maxsize=Config.PRINCIPAL_CACHE_SIZE, ttl=Config.PRINCIPAL_CACHE_TTL)
 
 class User:
     def __init__(self, username=None, password=None, spotify_id=None):
@@ -15,15 +27,32 @@ class User:
 
         hashed_password = None
         if self.password:
-            hashed_password = bcrypt.hashpw(self.password.encode('utf-8'), bcrypt.gensalt())
+            hashed_password = PasswordHasher.instance().hash(self.password)
 
         db.users.insert_one({
             "username": self.username,
-            "password": hashed_password.decode('utf-8') if hashed_password else None,
+            "password": hashed_password,
             "spotify_id": self.spotify_id,
+            **User.search_fields(self.username),
         })
         return True
 
+    @staticmethod
+    def trigrams(text):
+        """
+        Trigramas do texto normalizado, com o mesmo preenchimento do pg_trgm
+        (dois espaços antes e um depois) para que prefixos curtos também casem.
+        """
+        padded = f"  {text.strip().lower()} "
+        return sorted({padded[i:i + 3] for i in range(len(padded) - 2)})
+
+    @staticmethod
+    def search_fields(username):
+        return {
+            "username_lower": username.lower(),
+            "username_grams": User.trigrams(username),
+        }
+
     @staticmethod
     def find_user_by_spotify_id(spotify_id):
         db = PersistenceManager.get_database()
@@ -41,25 +70,57 @@ class User:
         if not user or not user.get('password'):
             return None
 
-        if bcrypt.checkpw(password.encode('utf-8'), user['password'].encode('utf-8')):
-            return user
+        hasher = PasswordHasher.instance()
+        if not hasher.verify(password, user['password']):
+            return None
+
+        if hasher.needs_rehash(user['password']):
+            # Atualiza hashes com custo antigo; o filtro evita sobrescrever
+            # uma troca de senha concorrente.
+            db.users.update_one(
+                {"_id": user["_id"], "password": user['password']},
+                {"$set": {"password": hasher.hash(password)}}
+            )
+        return user
 
-        return None
+    @staticmethod
+    def get_principal(username):
+        """
+        Versão em cache de find_user_by_username usada na autenticação.
+        """
+        principal = principal_cache.get(username)
+        if principal is None:
+            user = User.find_user_by_username(username)
+            if not user:
+                return None
+            principal = {
+                "_id": user.get("_id"),
+                "username": user.get("username", username),
+                "spotify_id": user.get("spotify_id")
+            }
+            principal_cache.set(username, principal)
+        return principal
+
+    @staticmethod
+    def invalidate_principal(username):
+        principal_cache.delete(username)
 
     @staticmethod
     def delete_user(username):
         db = PersistenceManager.get_database()
         result = db.users.delete_one({"username": username})
+        User.invalidate_principal(username)
         return result.deleted_count > 0
 
     @staticmethod
     def update_password(username, new_password):
         db = PersistenceManager.get_database()
-        hashed_password = bcrypt.hashpw(new_password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+        hashed_password = PasswordHasher.instance().hash(new_password)
         result = db.users.update_one(
             {"username": username},
             {"$set": {"password": hashed_password}}
         )
+        User.invalidate_principal(username)
         return result.matched_count > 0 and result.modified_count > 0
 
     @staticmethod
@@ -72,39 +133,110 @@ class User:
         return result.matched_count > 0 and result.modified_count > 0
     
     @staticmethod
-    def search_users(q=None):
+    def rename(username, new_username):
         db = PersistenceManager.get_database()
-        all_users = list(db["users"].find())
-        results = difflib.get_close_matches(q, [user["username"] for user in all_users], cutoff=0.6)
-        
-        matched_users = [
-            {
-                "username": user["username"],
-                "spotify_id": user["spotify_id"]
-            }
-                for user in all_users if user["username"] in results
-        ]
-        
-        return {
-            "users": matched_users
-        }
+        if db.users.find_one({"username": new_username}):
+            return False
+        result = db.users.update_one(
+            {"username": username},
+            {"$set": {"username": new_username, **User.search_fields(new_username)}}
+        )
+        User.invalidate_principal(username)
+        return result.modified_count > 0
 
     @staticmethod
-    def get_all_users():
-        db = PersistenceManager.get_database()
-        users = list(db["users"].find())
+    def search_users(q=None, limit=10):
+        """
+        Busca aproximada por trigramas, ranqueada no servidor. Os candidatos
+        são no máximo SEARCH_CANDIDATES nomes do índice multikey
+        username_grams, mais os limit primeiros nomes que começam com o termo
+        (índice username_lower), para que o custo não cresça com o número de
+        nomes que compartilham trigramas e os prefixos nunca fiquem de fora.
+        A nota é a similaridade de Jaccard entre os trigramas, com bônus para
+        os prefixos.
+        """
+        query = (q or "").strip().lower()
+        if not query:
+            return {"users": []}
 
+        db = PersistenceManager.get_database()
+        grams = User.trigrams(query)
+        users = db.users.aggregate([
+            {"$match": {"username_grams": {"$in": grams}}},
+            {"$limit": SEARCH_CANDIDATES},
+            {"$unionWith": {"coll": "users", "pipeline": [
+                {"$match": {"username_lower": {"$regex": f"^{re.escape(query)}"}}},
+                {"$limit": limit},
+            ]}},
+            {"$group": {"_id": "$_id", "user": {"$first": "$$ROOT"}}},
+            {"$replaceWith": "$user"},
+            {"$project": {
+                "_id": 0,
+                "username": 1,
+                "spotify_id": 1,
+                "username_lower": 1,
+                "similarity": {"$divide": [
+                    {"$size": {"$setIntersection": ["$username_grams", grams]}},
+                    {"$max": [1, {"$size": {"$setUnion": ["$username_grams", grams]}}]},
+                ]},
+                "prefix": {"$eq": [{"$substrCP": ["$username_lower", 0, len(query)]}, query]},
+            }},
+            {"$set": {"score": {"$add": ["$similarity", {"$cond": ["$prefix", SEARCH_PREFIX_BOOST, 0]}]}}},
+            {"$match": {"score": {"$gte": SEARCH_MIN_SIMILARITY}}},
+            {"$sort": {"score": -1, "username_lower": 1}},
+            {"$limit": limit},
+        ], allowDiskUse=True)
         return {
             "users": [
                 {
-                    "username": user["name"],
-                    "spotify_id": user["spotify_id"]
+                    "username": user["username"],
+                    "spotify_id": user.get("spotify_id")
                 } for user in users
             ]
-            }
+        }
+
+    @staticmethod
+    def iter_users(after=None, limit=None, batch_size=500):
+        """
+        Percorre os usuários em ordem de _id projetando apenas os campos
+        públicos, sem carregar a coleção inteira em memória.
+        """
+        db = PersistenceManager.get_database()
+        query = {"_id": {"$gt": after}} if after is not None else {}
+        cursor = db.users.find(query, PUBLIC_FIELDS).sort("_id", 1).batch_size(batch_size)
+        if limit is not None:
+            cursor = cursor.limit(limit)
+        return cursor
+
+    @staticmethod
+    def get_all_users(limit=100, cursor=None):
+        after = None
+        if cursor:
+            values = decode_cursor(cursor)
+            if len(values) != 1 or not is_cursor_id(values[0]):
+                raise ValueError("Invalid cursor")
+            after = values[0]
+        users = list(User.iter_users(after, limit + 1))
+        next_cursor = encode_cursor(users[limit - 1]["_id"]) if len(users) > limit else None
+
+        return {
+            "users": [User.public_fields(user) for user in users[:limit]],
+            "next": next_cursor
+        }
+
+    @staticmethod
+    def public_fields(user):
+        return {
+            "username": user["username"],
+            "spotify_id": user.get("spotify_id")
+        }
 
     @staticmethod
     def find_user_by_id(user_id):
         db = PersistenceManager.get_database()
         return db.users.find_one({"_id": user_id})
 
+    @staticmethod
+    def find_users_by_ids(user_ids, projection=None):
+        db = PersistenceManager.get_database()
+        return {user["_id"]: user for user in db.users.find({"_id": {"$in": list(set(user_ids))}}, projection)}
@@ -0,0 +1,41 @@
+from app.utils.persistence_manager import PersistenceManager
+from pymongo import UpdateOne
+
+
+class UserStats:
+    """
+    Contagem e versão das avaliações de cada usuário (coleção user_stats).
+    version muda a cada escrita nas avaliações do usuário e serve de ETag
+    para a listagem, sem consultar reviews.
+    """
+
+    @staticmethod
+    def get(user_id):
+        db = PersistenceManager.get_database()
+        return db.user_stats.find_one({"_id": user_id})
+
+    @staticmethod
+    def record_change(user_id, count=0):
+        db = PersistenceManager.get_database()
+        db.user_stats.update_one({"_id": user_id}, {"$inc": {"count": count, "version": 1}}, upsert=True)
+
+    @staticmethod
+    def record_reviews(reviews, batch_size=1000):
+        """
+        Versão em lote para importações: reviews é um iterável com o user_id
+        de cada avaliação nova.
+        """
+        totals = {}
+        for user_id in reviews:
+            totals[user_id] = totals.get(user_id, 0) + 1
+
+        db = PersistenceManager.get_database()
+        requests = []
+        for user_id, count in totals.items():
+            requests.append(UpdateOne({"_id": user_id}, {"$inc": {"count": count, "version": 1}}, upsert=True))
+            if len(requests) >= batch_size:
+                db.user_stats.bulk_write(requests, ordered=False)
+                requests = []
+        if requests:
+            db.user_stats.bulk_write(requests, ordered=False)
+        return len(totals)
@@ -3,9 +3,10 @@ from datetime import datetime, timedelta
 from flask import Blueprint, request, jsonify, current_app
 import requests
 from app.models.user import User
-from app.utils.persistence_manager import PersistenceManager
 from app.__init__ import limiter
+from app.services.token_vault import SpotifyTokenVault
 from app.utils.token_manager import TokenManager
+from app.utils.password_hasher import HasherBusy
 
 bp = Blueprint('auth', __name__, url_prefix='/auth')
 
@@ -19,7 +20,11 @@ def login():
     if not username or not password:
         return jsonify({"success": False, "message": "Username and password required"}), 400
 
-    user = User.find_user_by_credentials(username, password)
+    try:
+        user = User.find_user_by_credentials(username, password)
+    except HasherBusy as e:
+        return jsonify({"success": False, "message": str(e)}), 503
+
     if user:
         expiration_time = datetime.utcnow(
         ) + timedelta(seconds=current_app.config['JWT_EXPIRATION_SECONDS'])
@@ -44,10 +49,7 @@ def refresh():
     if not refresh_token:
         return jsonify({"success": False, "message": "Refresh token required"}), 400
 
-    TokenManager.cleanup_expired_tokens()  # Usando TokenManager para limpar tokens expirados
-    db = PersistenceManager.get_database()
-    stored_token = db.refresh_tokens.find_one(
-        {"refresh_token": refresh_token, "exp": {"$gte": datetime.utcnow()}})
+    stored_token = TokenManager.find_refresh_token(refresh_token)
 
     if not stored_token:
         return jsonify({"success": False, "message": "Invalid or expired refresh token"}), 401
@@ -104,7 +106,7 @@ def login_spotify():
 
     user_info = user_info_response.json()
     spotify_id = user_info["id"]
-    username = user_info.get("display_name", spotify_id)
+    username = user_info.get("display_name") or spotify_id
 
     existing_user = User.find_user_by_spotify_id(spotify_id)
     if existing_user:
@@ -117,9 +119,13 @@ def login_spotify():
     ) + timedelta(seconds=current_app.config['JWT_EXPIRATION_SECONDS'])
     backend_token = jwt.encode({"username": username, "exp": expiration_time},
                                current_app.config['SECRET_KEY'], algorithm="HS256")
+    backend_refresh_token = jwt.encode({"username": username, "exp": datetime.utcnow(
+    ) + timedelta(days=7)}, current_app.config['SECRET_KEY'], algorithm="HS256")
 
-    # Usando TokenManager para armazenar o refresh token
-    TokenManager.store_refresh_token(username, refresh_token)
+    # O refresh token do backend fica no TokenManager; os do Spotify, cifrados no cofre
+    TokenManager.store_refresh_token(username, backend_refresh_token)
+    SpotifyTokenVault.instance().store(username, access_token, refresh_token,
+                                       spotify_data.get("expires_in", 3600), spotify_data.get("scope"))
 
     response_data = {
         "success": True,
@@ -131,6 +137,7 @@ def login_spotify():
             "images": user_info.get("images") if user_info["images"] else None,
         },
         "backend_token": backend_token,
+        "refresh_token": backend_refresh_token,
         "spotify_access_token": access_token
     }
     return jsonify(response_data), 200
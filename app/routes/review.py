@@ -1,5 +1,10 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, current_app, request, jsonify
+from app.models.album_stats import AlbumStats
 from app.models.review import Review
+from app.models.user_stats import UserStats
+from app.services.feed import ReviewFeed
+from app.utils.etag import not_modified, tagged, version_tag
+from app.utils.pagination import keyset_filter, page_size, paginate
 
 bp = Blueprint('review', __name__, url_prefix='/review')
 
@@ -18,11 +23,78 @@ def save():
     except ValueError as e:
         return jsonify({"success": False, "message": str(e)}), 400
 
+@bp.route('/bulk', methods=['POST'])
+def bulk():
+    data = request.get_json(silent=True)
+    items = data.get('reviews') if isinstance(data, dict) else data
+    if not isinstance(items, list) or not items:
+        return jsonify({"success": False, "message": "A non-empty list of reviews is required"}), 400
+
+    max_items = current_app.config.get('REVIEW_BULK_MAX_ITEMS', 50000)
+    if len(items) > max_items:
+        return jsonify({"success": False, "message": f"At most {max_items} reviews per request"}), 413
+
+    result = Review.bulk_save(items, current_app.config.get('REVIEW_BULK_CHUNK_SIZE', 1000))
+    return jsonify({"success": True, "inserted": result["inserted"], "errors": result["errors"]}), 200
+
 @bp.route('/get/<user_id>', methods=['GET'])
 def get(user_id):
-    limit = int(request.args.get('limit', 1))
-    reviews = Review.get_by_user(user_id, limit)
-    return jsonify({"success": True, "reviews": reviews}), 200
+    limit = page_size(request.args.get('limit', default=1, type=int), default=1)
+    cursor = request.args.get('cursor')
+    try:
+        keyset_filter(cursor)
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+
+    # A versão do usuário muda a cada escrita nas avaliações dele: se o
+    # cliente já tem esta versão, responde 304 sem consultar reviews.
+    stats = UserStats.get(user_id) or {}
+    tag = version_tag("reviews", user_id, stats.get("version"), stats.get("count"), limit, cursor)
+    cached = not_modified(tag)
+    if cached:
+        return cached
+
+    try:
+        reviews = Review.get_by_user(user_id, limit + 1, cursor)
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+    reviews, next_cursor = paginate(reviews, limit)
+    return tagged((jsonify({
+        "success": True,
+        "reviews": [Review.serialize(review) for review in reviews],
+        "next": next_cursor
+    }), 200), tag)
+
+@bp.route('/feed', methods=['GET'])
+def feed():
+    limit = page_size(request.args.get('limit', default=20, type=int))
+    try:
+        page = ReviewFeed.page(limit, request.args.get('cursor'), request.headers.get('Spotify-Token'))
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+    return jsonify({"success": True, "reviews": page["reviews"], "next": page["next"]}), 200
+
+def leaderboard_page(fetch, field):
+    limit = page_size(request.args.get('limit', default=20, type=int))
+    try:
+        albums = fetch(limit + 1, request.args.get('cursor'))
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+
+    albums, next_cursor = paginate(albums, limit, field=field)
+    return jsonify({
+        "success": True,
+        "albums": [AlbumStats.summary(stats) for stats in albums],
+        "next": next_cursor
+    }), 200
+
+@bp.route('/leaderboard/top-rated', methods=['GET'])
+def top_rated():
+    return leaderboard_page(AlbumStats.top_rated, "score")
+
+@bp.route('/leaderboard/trending', methods=['GET'])
+def trending():
+    return leaderboard_page(AlbumStats.trending, "trend")
 
 @bp.route('/update/<review_id>', methods=['PUT'])
 def update(review_id):
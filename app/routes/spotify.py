@@ -1,115 +1,180 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 
+from app.models.album_stats import AlbumStats
 from app.models.review import Review
 from app.models.user import User
 from app.routes.user import token_required
-from app.services.spotify import SpotipyClient
-import spotipy
+from app.services.catalog_cache import CatalogCache
+from app.services.rate_limit import SpotifyUnavailable
+from app.services.spotify import SpotifyFanOut, SpotipyClient, spotify_client
+from app.services.token_vault import SpotifyTokenVault
+from app.utils.etag import not_modified, tagged, version_tag
+from app.utils.fields import selectable, selected
+from app.utils.pagination import page_size, paginate
 
 bp = Blueprint('spotify', __name__, url_prefix='/spotify')
 spotipy_client = SpotipyClient()
 
 
+def spotify_token():
+    """
+    Token do Spotify da requisição: o do cabeçalho Spotify-Token, se vier,
+    senão o guardado no cofre para o usuário autenticado.
+    """
+    token = request.headers.get('Spotify-Token')
+    if token:
+        return token
+    return SpotifyTokenVault.instance().access_token(request.user.get('username'))
+
+
+def spotify_unavailable(error):
+    response = jsonify({"success": False, "message": str(error)})
+    if error.retry_after:
+        response.headers['Retry-After'] = str(error.retry_after)
+    return response, 503
+
+
 @bp.route('/recent-tracks', methods=['GET'])
 @token_required
+@selectable
 def get_recent_tracks():
-    spotify_access_token = request.headers.get('Spotify-Token')
+    spotify_access_token = spotify_token()
     if not spotify_access_token:
         return jsonify({"success": False, "message": "Spotify access token required"}), 401
 
-    sp = spotipy.Spotify(auth=spotify_access_token)
+    sp = spotify_client(spotify_access_token)
     try:
         tracks = sp.current_user_recently_played(limit=5)
+    except SpotifyUnavailable as e:
+        return spotify_unavailable(e)
     except Exception as e:
         return jsonify({"success": False, "message": "Error fetching recent tracks", "error": str(e)}), 400
 
-    return jsonify({"success": True, "data": tracks}), 200
+    return jsonify({"success": True, "data": selected(tracks)}), 200
 
 
 @bp.route('/current-track', methods=['GET'])
 @token_required
+@selectable
 def get_current_track():
-    spotify_access_token = request.headers.get('Spotify-Token')
+    spotify_access_token = spotify_token()
     if not spotify_access_token:
         return jsonify({"success": False, "message": "Spotify access token required"}), 401
 
-    sp = spotipy.Spotify(auth=spotify_access_token)
+    sp = spotify_client(spotify_access_token)
     try:
         track = sp.current_user_playing_track()
+    except SpotifyUnavailable as e:
+        return spotify_unavailable(e)
     except Exception as e:
         return jsonify({"success": False, "message": "Error fetching currently playing", "error": str(e)}), 400
 
     if track is not None:
-        return jsonify({"success": True, "data": track}), 200
+        return jsonify({"success": True, "data": selected(track)}), 200
     else:
         return jsonify({"success": False, "message": "No track is currently playing"}), 204
 
 
 @bp.route('/obsessions', methods=['GET'])
 @token_required
+@selectable
 def get_top_items():
-    spotify_access_token = request.headers.get('Spotify-Token')
+    spotify_access_token = spotify_token()
     if not spotify_access_token:
         return jsonify({"success": False, "message": "Spotify access token required"}), 401
 
-    sp = spotipy.Spotify(auth=spotify_access_token)
+    sp = spotify_client(spotify_access_token)
     try:
         top_items = sp.current_user_top_artists(
             limit=5, offset=0, time_range='short_term')
+    except SpotifyUnavailable as e:
+        return spotify_unavailable(e)
     except Exception as e:
         return jsonify({"success": False, "message": "Error fetching user obsessions", "error": str(e)}), 400
-    return jsonify({"success": True, "data": top_items}), 200
+    return jsonify({"success": True, "data": selected(top_items)}), 200
+
+
+@bp.route('/dashboard', methods=['GET'])
+@token_required
+@selectable
+def get_dashboard():
+    spotify_access_token = spotify_token()
+    if not spotify_access_token:
+        return jsonify({"success": False, "message": "Spotify access token required"}), 401
+
+    sp = spotify_client(spotify_access_token)
+    data, errors = SpotifyFanOut.run({
+        "recent_tracks": lambda: sp.current_user_recently_played(limit=5),
+        "current_track": lambda: sp.current_user_playing_track(),
+        "obsessions": lambda: sp.current_user_top_artists(limit=5, offset=0, time_range='short_term'),
+        "saved_albums": lambda: sp.current_user_saved_albums(),
+    }, timeout=current_app.config.get('SPOTIFY_DASHBOARD_TIMEOUT', 3))
+
+    if not data:
+        return jsonify({"success": False, "message": "Error fetching dashboard", "errors": errors}), 502
+    return jsonify({"success": True, "data": selected(data), "errors": errors}), 200
 
 
 @bp.route('/artist/<artist_id>', methods=['GET'])
 @token_required
+@selectable
 def get_artist(artist_id):
-    spotify_access_token = request.headers.get('Spotify-Token')
+    spotify_access_token = spotify_token()
     if not spotify_access_token:
         return jsonify({"success": False, "message": "Spotify access token required"}), 401
 
-    sp = spotipy.Spotify(auth=spotify_access_token)
+    sp = spotify_client(spotify_access_token)
     try:
-        artist = sp.artist(artist_id)
+        artist = CatalogCache.instance().get_or_fetch("artist", artist_id, lambda: sp.artist(artist_id))
+    except SpotifyUnavailable as e:
+        return spotify_unavailable(e)
     except Exception as e:
         return jsonify({"success": False, "message": "Error fetching artist data", "error": str(e)}), 400
-    return jsonify({"success": True, "data": artist}), 200
+    return jsonify({"success": True, "data": selected(artist)}), 200
 
 
 @bp.route('/artist/<artist_id>/albums', methods=['GET'])
 @token_required
+@selectable
 def get_album_by_artist(artist_id):
-    spotify_access_token = request.headers.get('Spotify-Token')
+    spotify_access_token = spotify_token()
     if not spotify_access_token:
         return jsonify({"success": False, "message": "Spotify access token required"}), 401
 
-    sp = spotipy.Spotify(auth=spotify_access_token)
+    sp = spotify_client(spotify_access_token)
     try:
-        albums = sp.artist_albums(artist_id, "album")
+        albums = CatalogCache.instance().get_or_fetch(
+            "artist_albums", artist_id, lambda: sp.artist_albums(artist_id, "album"))
+    except SpotifyUnavailable as e:
+        return spotify_unavailable(e)
     except Exception as e:
         return jsonify({"success": False, "message": "Error fetching artist data", "error": str(e)}), 400
-    return jsonify({"success": True, "data": albums}), 200
+    return jsonify({"success": True, "data": selected(albums)}), 200
 
 
 @bp.route('/saved-albums', methods=['GET'])
 @token_required
+@selectable
 def get_saved_albums():
-    spotify_access_token = request.headers.get('Spotify-Token')
+    spotify_access_token = spotify_token()
     if not spotify_access_token:
         return jsonify({"success": False, "message": "Spotify access token required"}), 401
 
-    sp = spotipy.Spotify(auth=spotify_access_token)
+    sp = spotify_client(spotify_access_token)
     try:
         saved_albums = sp.current_user_saved_albums()
-        return jsonify({"success": True, "data": saved_albums}), 200
+        return jsonify({"success": True, "data": selected(saved_albums)}), 200
+    except SpotifyUnavailable as e:
+        return spotify_unavailable(e)
     except Exception as e:
         return jsonify({"success": False, "message": "Error fetching saved albums", "error": str(e)}), 500
 
 
 @bp.route('/search', methods=['GET'])
 @token_required
+@selectable
 def search_artists_and_albums():
-    spotify_access_token = request.headers.get('Spotify-Token')
+    spotify_access_token = spotify_token()
     if not spotify_access_token:
         return jsonify({"success": False, "message": "Spotify access token required"}), 401
     
@@ -119,18 +184,20 @@ def search_artists_and_albums():
     if not query:
         return jsonify({"success": False, "message": "Query parameter 'q' is required"}), 400
 
-    sp = spotipy.Spotify(auth=spotify_access_token)
     try:
         data = spotipy_client.search_artists_albums(spotify_access_token, query, limit)
-        return jsonify({"success": True, "artists": data["artists"], "albums": data["albums"]}), 200
+        return jsonify({"success": True, "artists": selected(data["artists"]), "albums": selected(data["albums"])}), 200
+    except SpotifyUnavailable as e:
+        return spotify_unavailable(e)
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
 
 @bp.route('/search/albums', methods=['GET'])
 @token_required
+@selectable
 def search_albums():    
-    spotify_access_token = request.headers.get('Spotify-Token')
+    spotify_access_token = spotify_token()
     if not spotify_access_token:
         return jsonify({"success": False, "message": "Spotify access token required"}), 401
 
@@ -142,21 +209,26 @@ def search_albums():
     
     try:
         albums = spotipy_client.search_albums(spotify_access_token, query, limit)
-        return jsonify({"success": True, "data": albums}), 200
+        return jsonify({"success": True, "data": selected(albums)}), 200
+    except SpotifyUnavailable as e:
+        return spotify_unavailable(e)
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
 
 @bp.route('/users/<spotify_id>', methods=['GET'])
 @token_required
+@selectable
 def get_user(spotify_id):
-    spotify_access_token = request.headers.get('Spotify-Token')
+    spotify_access_token = spotify_token()
     if not spotify_access_token:
         return jsonify({"success": False, "message": "Spotify access token required"}), 401
 
     try:
         user = spotipy_client.get_user(spotify_access_token, spotify_id)
-        return jsonify({"success": True, "data": user}), 200
+        return jsonify({"success": True, "data": selected(user)}), 200
+    except SpotifyUnavailable as e:
+        return spotify_unavailable(e)
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
@@ -164,19 +236,31 @@ def get_user(spotify_id):
 @bp.route('/albums/<album_id>', methods=['GET'])
 @token_required
 def get_album_details(album_id):
-    spotify_access_token = request.headers.get('Spotify-Token')
+    spotify_access_token = spotify_token()
     if not spotify_access_token:
         return jsonify({"success": False, "message": "Spotify access token required"}), 401
 
-    sp = spotipy.Spotify(auth=spotify_access_token)
+    sp = spotify_client(spotify_access_token)
 
     data = request.get_json()
     user_id = data.get('user_id')
     if not user_id:
         return jsonify({"success": False, "message": "User ID is required"}), 400
 
+    # Qualquer escrita nas avaliações do álbum incrementa stats.version;
+    # sem mudança, responde 304 antes de ir ao Spotify ou a reviews.
+    stats = AlbumStats.get(album_id) or {}
+    limit = page_size(request.args.get('limit', default=20, type=int))
+    cursor = request.args.get('cursor')
+    tag = version_tag("album", album_id, stats.get("version"), stats.get("count"), user_id, limit, cursor)
+    cached = not_modified(tag)
+    if cached:
+        return cached
+
     try:
-        album = sp.album(album_id)
+        album = CatalogCache.instance().get_or_fetch("album", album_id, lambda: sp.album(album_id))
+    except SpotifyUnavailable as e:
+        return spotify_unavailable(e)
     except Exception as e:
         return jsonify({"success": False, "message": "Error fetching album", "error": str(e)}), 400
 
@@ -188,9 +272,8 @@ def get_album_details(album_id):
     artists = [artist['name'] for artist in album['artists']]
     release_year = album['release_date'][:4]
 
-    reviews = Review.get_by_album(album_id)
-    if not reviews:
-        return jsonify({
+    if not stats.get('count'):
+        return tagged((jsonify({
             "success": True,
             "message": "No reviews yet",
             "album_info": {
@@ -201,31 +284,40 @@ def get_album_details(album_id):
                 "overall_rating": None,
                 "your_rating": None,
                 "reviews": [],
+                "reviews_next": None,
                 "your_review": None
             }
-        }), 200
+        }), 200), tag)
 
-    overall_rating = round(sum(review['rate'] for review in reviews) / len(reviews), 1)
+    overall_rating = AlbumStats.overall_rating(stats)
+    try:
+        other_reviews = Review.get_by_album(album_id, limit + 1, cursor, exclude_user_id=user_id)
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+    other_reviews, next_cursor = paginate(other_reviews, limit)
 
-    user_review = next((review for review in reviews if review['userId'] == user_id), None)
+    user_review = Review.get_by_user_and_album(user_id, album_id)
     your_rating = user_review['rate'] if user_review else None
     your_review = user_review['text'] if user_review else None
 
-    other_reviews = []
-    for review in reviews:
-        if review['userId'] != user_id:
-            user = User.find_user_by_id(review['userId'])
-            if user:
-                spotify_id = user['spotify_id']
-                user_details = sp.user(spotify_id)
-                other_reviews.append({
+    users = User.find_users_by_ids([review['userId'] for review in other_reviews])
+    profiles = spotipy_client.get_users(
+        spotify_access_token, [user['spotify_id'] for user in users.values()])
+
+    reviews_data = []
+    for review in other_reviews:
+        user = users.get(review['userId'])
+        if user:
+            user_details = profiles.get(user['spotify_id'])
+            if user_details:
+                reviews_data.append({
                     "username": user_details['display_name'],
-                    "profile_picture": user_details['images'][0]['url'] if user_details['images'] else None,
+                    "profile_picture": user_details['image'],
                     "rate": review['rate'],
                     "text": review['text']
                 })
 
-    return jsonify({
+    return tagged((jsonify({
         "success": True,
         "album_info": {
             "name": album_name,
@@ -235,7 +327,8 @@ def get_album_details(album_id):
             "overall_rating": overall_rating,
             "your_rating": your_rating,
             "your_review": your_review,
-            "reviews": other_reviews
+            "reviews": reviews_data,
+            "reviews_next": next_cursor
         }
-    }), 200
+    }), 200), tag)
 
@@ -1,8 +1,12 @@
+import json
 import jwt
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, Response, g, request, jsonify, current_app, stream_with_context
 from functools import wraps
 from app.models.user import User
+from app.services.token_vault import SpotifyTokenVault
 from app.utils.token_manager import TokenManager
+from app.utils.password_hasher import HasherBusy
+from app.utils.pagination import page_size
 from datetime import datetime, timedelta
 
 bp = Blueprint('user', __name__, url_prefix='/user')
@@ -15,15 +19,21 @@ def token_required(f):
             return jsonify({"success": False, "message": "Token is missing or invalid"}), 401
 
         token = auth_header.split(" ")[1]
+        memo = g.get('auth_memo')
+        if memo and memo[0] == token:
+            request.user = memo[1]
+            return f(*args, **kwargs)
+
         try:
             payload = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=["HS256"])
             username = payload.get('username')
 
-            user = User.find_user_by_username(username)
+            user = User.get_principal(username)
             if not user:
                 return jsonify({"success": False, "message": "User not found"}), 401
 
             request.user = payload
+            g.auth_memo = (token, payload)
 
         except jwt.ExpiredSignatureError:
             return jsonify({"success": False, "message": "Token has expired"}), 401
@@ -47,7 +57,12 @@ def create_user():
         return jsonify({"success": False, "message": "User already exists"}), 400
 
     new_user = User(username=username, password=password, spotify_id=spotify_id)
-    if new_user.save():
+    try:
+        created = new_user.save()
+    except HasherBusy as e:
+        return jsonify({"success": False, "message": str(e)}), 503
+
+    if created:
         expiration_time = datetime.utcnow() + timedelta(seconds=current_app.config['JWT_EXPIRATION_SECONDS'])
         token = jwt.encode({"username": username, "exp": expiration_time},
                            current_app.config['SECRET_KEY'], algorithm="HS256")
@@ -82,6 +97,7 @@ def delete_account():
     user_deleted = User.delete_user(username)
     if user_deleted:
         TokenManager.invalidate_tokens_for_user(username)
+        SpotifyTokenVault.discard(username)
         return jsonify({"success": True, "message": f"User '{username}' deleted successfully"}), 200
     else:
         return jsonify({"success": False, "message": "User not found or could not be deleted"}), 404
@@ -97,10 +113,14 @@ def update_password():
     if not old_password or not new_password:
         return jsonify({"success": False, "message": "Old and new passwords are required"}), 400
 
-    if not User.find_user_by_credentials(username, old_password):
-        return jsonify({"success": False, "message": "Old password is incorrect"}), 401
+    try:
+        if not User.find_user_by_credentials(username, old_password):
+            return jsonify({"success": False, "message": "Old password is incorrect"}), 401
+
+        password_updated = User.update_password(username, new_password)
+    except HasherBusy as e:
+        return jsonify({"success": False, "message": str(e)}), 503
 
-    password_updated = User.update_password(username, new_password)
     if password_updated:
         return jsonify({"success": True, "message": "Password updated successfully"}), 200
     else:
@@ -110,9 +130,10 @@ def update_password():
 @token_required
 def search_users():
     query = request.args.get('q')
-    
+    limit = max(1, min(request.args.get('limit', default=10, type=int), 50))
+
     try:
-        users = User.search_users(query)
+        users = User.search_users(query, limit)
         return jsonify({"success": True, "data": users}), 200
     except Exception as e:
         return jsonify({"success": False, "message": "No users found"}), 404
@@ -120,9 +141,25 @@ def search_users():
 @bp.route('/users', methods=['GET'])
 @token_required
 def get_all_users():
+    if request.args.get('format') == 'ndjson':
+        return Response(stream_with_context(_stream_users()), mimetype='application/x-ndjson')
+
+    limit = page_size(request.args.get('limit', type=int), default=100)
     try:
-        users = User.get_all_users()
+        users = User.get_all_users(limit, request.args.get('cursor'))
         return jsonify({"success": True, "data": users}), 200
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
     except Exception as e:
         return jsonify({"success": False, "message": "No users found"}), 404
 
+def _stream_users(batch_size=500):
+    batch = []
+    for user in User.iter_users(batch_size=batch_size):
+        batch.append(json.dumps(User.public_fields(user)))
+        if len(batch) >= batch_size:
+            yield "\n".join(batch) + "\n"
+            batch = []
+    if batch:
+        yield "\n".join(batch) + "\n"
+
@@ -0,0 +1,186 @@
+import threading
+from collections import defaultdict
+from datetime import datetime, timedelta
+from flask import current_app
+from app.services.rate_limit import SpotifyUnavailable
+from app.utils.cache import TTLCache
+from app.utils.persistence_manager import PersistenceManager
+
+
+class MemoryBackend:
+    """
+    Camada em processo: LRU limitada por tamanho, com TTL por entrada.
+    """
+
+    def __init__(self, maxsize=10000):
+        self._cache = TTLCache(maxsize=maxsize)
+
+    def get(self, key):
+        return self._cache.get(key)
+
+    def get_stale(self, key):
+        return self._cache.get_stale(key)
+
+    def set(self, key, value, ttl):
+        self._cache.set(key, value, ttl)
+
+    def delete(self, key):
+        self._cache.delete(key)
+
+
+class MongoBackend:
+    """
+    Camada compartilhada entre workers, na coleção catalog_cache. As
+    entradas vencidas são removidas pelo índice TTL em expires_at.
+    """
+
+    def __init__(self, collection="catalog_cache"):
+        self.collection = collection
+
+    def get(self, key):
+        db = PersistenceManager.get_database()
+        entry = db[self.collection].find_one({"_id": key, "expires_at": {"$gt": datetime.utcnow()}})
+        return entry["value"] if entry else None
+
+    def get_stale(self, key):
+        db = PersistenceManager.get_database()
+        entry = db[self.collection].find_one({"_id": key})
+        return entry["value"] if entry else None
+
+    def set(self, key, value, ttl):
+        db = PersistenceManager.get_database()
+        db[self.collection].replace_one(
+            {"_id": key},
+            {"value": value, "expires_at": datetime.utcnow() + timedelta(seconds=ttl)},
+            upsert=True
+        )
+
+    def delete(self, key):
+        db = PersistenceManager.get_database()
+        db[self.collection].delete_one({"_id": key})
+
+
+class CatalogCache:
+    """
+    Cache de dados de catálogo do Spotify (álbuns, artistas, perfis) com
+    TTL por tipo de entidade e camadas consultadas em ordem: a primeira
+    que tiver o valor responde e as anteriores são preenchidas com ele.
+    """
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    DEFAULT_TTLS = {
+        "album": 24 * 3600,
+        "artist": 6 * 3600,
+        "artist_albums": 6 * 3600,
+        "user": 3600,
+    }
+
+    def __init__(self, backends, ttls=None):
+        self.backends = backends
+        self.ttls = {**self.DEFAULT_TTLS, **(ttls or {})}
+        self._counters = defaultdict(lambda: {"hits": 0, "misses": 0, "stale": 0})
+        self._counters_lock = threading.Lock()
+
+    @classmethod
+    def instance(cls):
+        if cls._instance is None:
+            with cls._instance_lock:
+                if cls._instance is None:
+                    cls._instance = cls.from_config(current_app.config)
+        return cls._instance
+
+    @classmethod
+    def from_config(cls, config):
+        backends = [MemoryBackend(config.get('CATALOG_CACHE_SIZE', 10000))]
+        if config.get('CATALOG_CACHE_BACKEND', 'memory') == 'mongo':
+            backends.append(MongoBackend())
+        ttls = {entity: config[f"CATALOG_CACHE_TTL_{entity.upper()}"]
+                for entity in cls.DEFAULT_TTLS if f"CATALOG_CACHE_TTL_{entity.upper()}" in config}
+        return cls(backends, ttls)
+
+    def _count(self, entity, counter, amount=1):
+        with self._counters_lock:
+            self._counters[entity][counter] += amount
+
+    def _lookup(self, key):
+        for level, backend in enumerate(self.backends):
+            value = backend.get(key)
+            if value is not None:
+                for upper in self.backends[:level]:
+                    upper.set(key, value, self.ttl_for(key))
+                return value
+        return None
+
+    def ttl_for(self, key):
+        return self.ttls[key.split(":", 1)[0]]
+
+    def get(self, entity, key):
+        value = self._lookup(f"{entity}:{key}")
+        self._count(entity, "hits" if value is not None else "misses")
+        return value
+
+    def set(self, entity, key, value):
+        for backend in self.backends:
+            backend.set(f"{entity}:{key}", value, self.ttls[entity])
+
+    def invalidate(self, entity, key):
+        for backend in self.backends:
+            backend.delete(f"{entity}:{key}")
+
+    def get_stale(self, entity, key):
+        for backend in self.backends:
+            value = backend.get_stale(f"{entity}:{key}")
+            if value is not None:
+                self._count(entity, "stale")
+                return value
+        return None
+
+    def get_or_fetch(self, entity, key, fetch):
+        """
+        Se o Spotify estiver indisponível, serve o valor vencido quando houver.
+        """
+        value = self.get(entity, key)
+        if value is None:
+            try:
+                value = fetch()
+            except SpotifyUnavailable:
+                value = self.get_stale(entity, key)
+                if value is None:
+                    raise
+                return value
+            if value is not None:
+                self.set(entity, key, value)
+        return value
+
+    def get_many(self, entity, keys, fetch_many):
+        """
+        Versão em lote: fetch_many recebe só as chaves ausentes e devolve um
+        dicionário chave -> valor. Com o Spotify indisponível, devolve o que
+        houver em cache, mesmo vencido.
+        """
+        found = {}
+        missing = []
+        for key in dict.fromkeys(keys):
+            value = self.get(entity, key)
+            if value is None:
+                missing.append(key)
+            else:
+                found[key] = value
+
+        if missing:
+            try:
+                fetched = fetch_many(missing)
+            except SpotifyUnavailable:
+                stale = {key: self.get_stale(entity, key) for key in missing}
+                found.update({key: value for key, value in stale.items() if value is not None})
+                return found
+            for key, value in fetched.items():
+                if value is not None:
+                    self.set(entity, key, value)
+                    found[key] = value
+        return found
+
+    def stats(self):
+        with self._counters_lock:
+            return {entity: dict(counters) for entity, counters in self._counters.items()}
@@ -0,0 +1,55 @@
+from app.config import Config
+from app.models.review import Review
+from app.models.user import PUBLIC_FIELDS, User
+from app.services.spotify import SpotipyClient
+from app.utils.cache import SingleFlight, TTLCache
+from app.utils.pagination import paginate
+
+
+class ReviewFeed:
+    """
+    Avaliações mais recentes de todos os usuários, com autor e álbum. Cada
+    página custa uma leitura em reviews (índice recent), uma em users e as
+    consultas ao cache de catálogo. A primeira página fica alguns segundos
+    em memória, e requisições simultâneas por ela montam uma única vez.
+    """
+    _head_cache = TTLCache(maxsize=32, ttl=Config.FEED_CACHE_TTL)
+    _head_flight = SingleFlight()
+
+    @staticmethod
+    def page(limit, cursor=None, auth=None):
+        if cursor:
+            return ReviewFeed._build(limit, cursor, auth)
+
+        key = (limit, bool(auth))
+        cached = ReviewFeed._head_cache.get(key)
+        if cached is not None:
+            return cached
+
+        def load():
+            page = ReviewFeed._build(limit, None, auth)
+            ReviewFeed._head_cache.set(key, page)
+            return page
+
+        return ReviewFeed._head_flight.do(key, load)
+
+    @staticmethod
+    def _build(limit, cursor, auth):
+        reviews, next_cursor = paginate(Review.recent(limit + 1, cursor), limit)
+
+        users = User.find_users_by_ids([review["userId"] for review in reviews], PUBLIC_FIELDS)
+        album_ids = [review["albumId"] for review in reviews]
+        try:
+            albums = SpotipyClient().get_albums(auth, album_ids)
+        except Exception:
+            # Token inválido ou Spotify com erro: o feed sai com o que houver em cache.
+            albums = SpotipyClient().get_albums(None, album_ids)
+
+        items = []
+        for review in reviews:
+            user = users.get(review["userId"])
+            item = Review.serialize(review)
+            item["user"] = User.public_fields(user) if user else None
+            item["album"] = albums.get(review["albumId"], {"id": review["albumId"]})
+            items.append(item)
+        return {"reviews": items, "next": next_cursor}
@@ -0,0 +1,202 @@
+import os
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from flask import current_app
+from pymongo.errors import DuplicateKeyError, PyMongoError
+from app.utils.persistence_manager import PersistenceManager
+
+
+class SpotifyUnavailable(Exception):
+    """
+    O Spotify está limitando ou falhando e a chamada não foi feita (ou foi
+    abandonada). retry_after indica em quantos segundos tentar de novo.
+    """
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class SharedTokenBucket:
+    """
+    Limite global de chamadas por segundo ao Spotify, compartilhado entre
+    workers: cada processo reserva lotes de lease_size fichas da janela do
+    segundo corrente na coleção spotify_rate_windows e as gasta localmente.
+    """
+
+    def __init__(self, rate, lease_size=5, collection="spotify_rate_windows", config=None):
+        self.rate = rate
+        # Config da aplicação guardada na criação: _lease roda nas threads do
+        # SpotifyFanOut, sem contexto de aplicação.
+        self.config = config
+        self.lease_size = max(1, min(lease_size, rate))
+        self.collection = collection
+        self._window = None
+        self._tokens = 0
+        self._exhausted = False
+        self._lock = threading.Lock()
+
+    def _lease(self, window):
+        db = PersistenceManager.get_database(self.config)
+        try:
+            db[self.collection].update_one(
+                {"_id": window, "used": {"$lte": self.rate - self.lease_size}},
+                {"$inc": {"used": self.lease_size},
+                 "$setOnInsert": {"expires_at": datetime.utcnow() + timedelta(minutes=1)}},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            # A janela existe e não tem mais fichas: o filtro falhou e o upsert colidiu.
+            return 0
+        except PyMongoError:
+            # Sem o banco, não bloqueia as chamadas ao Spotify.
+            return self.lease_size
+        return self.lease_size
+
+    def acquire(self, timeout):
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.time()
+                window = int(now)
+                if self._window != window:
+                    self._window, self._tokens, self._exhausted = window, 0, False
+                if self._tokens == 0 and not self._exhausted:
+                    self._tokens = self._lease(window)
+                    self._exhausted = self._tokens == 0
+                if self._tokens > 0:
+                    self._tokens -= 1
+                    return True
+
+            wait = window + 1 - now + random.uniform(0, 0.05)
+            if time.monotonic() + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+class CircuitBreaker:
+    """
+    Abre após failure_threshold falhas seguidas e rejeita chamadas até
+    reset_timeout segundos depois; então deixa uma chamada de teste passar.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._open_until = 0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            now = time.monotonic()
+            if self._failures < self.failure_threshold:
+                return
+            if now < self._open_until or self._probing:
+                raise SpotifyUnavailable("Spotify is unavailable", max(1, int(self._open_until - now)))
+            self._probing = True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._probing = False
+
+    def cancel_probe(self):
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self, open_for=None):
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            if self._failures >= self.failure_threshold or open_for:
+                self._failures = max(self._failures, self.failure_threshold)
+                self._open_until = time.monotonic() + (open_for or self.reset_timeout)
+
+
+class SpotifyGuard:
+    """
+    Política de chamadas ao Spotify do processo: token bucket compartilhado,
+    Retry-After com backoff e jitter e circuit breaker.
+    """
+    _instance = None
+    _pid = None
+    _lock = threading.Lock()
+
+    def __init__(self, bucket, breaker, max_attempts=3, max_retry_wait=2.0, acquire_timeout=1.0):
+        self.bucket = bucket
+        self.breaker = breaker
+        self.max_attempts = max_attempts
+        self.max_retry_wait = max_retry_wait
+        self.acquire_timeout = acquire_timeout
+
+    @classmethod
+    def instance(cls):
+        """
+        Deve ser chamado com contexto de aplicação (ex.: ao criar o cliente,
+        na thread da requisição). O guard já criado não depende do contexto
+        e pode ser usado pelas threads do SpotifyFanOut.
+        """
+        if cls._instance is None or cls._pid != os.getpid():
+            with cls._lock:
+                if cls._instance is None or cls._pid != os.getpid():
+                    cls._instance = cls.from_config(current_app.config)
+                    cls._pid = os.getpid()
+        return cls._instance
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            SharedTokenBucket(config.get('SPOTIFY_RATE_LIMIT', 20), config.get('SPOTIFY_RATE_LEASE', 5),
+                              config=config),
+            CircuitBreaker(config.get('SPOTIFY_BREAKER_THRESHOLD', 5), config.get('SPOTIFY_BREAKER_RESET', 30)),
+            max_attempts=config.get('SPOTIFY_MAX_ATTEMPTS', 3),
+            max_retry_wait=config.get('SPOTIFY_MAX_RETRY_WAIT', 2.0),
+            acquire_timeout=config.get('SPOTIFY_ACQUIRE_TIMEOUT', 1.0),
+        )
+
+    def acquire(self):
+        if not self.bucket.acquire(self.acquire_timeout):
+            self.breaker.cancel_probe()
+            raise SpotifyUnavailable("Spotify rate limit reached", 1)
+
+    @staticmethod
+    def retry_delay(retry_after, attempt):
+        try:
+            base = float(retry_after)
+        except (TypeError, ValueError):
+            base = 0.5 * 2 ** attempt
+        return base + random.uniform(0, base / 2 + 0.1)
+
+    def call(self, fn, is_rate_limited, is_upstream_failure):
+        """
+        Executa fn respeitando a política. is_rate_limited(erro) devolve o
+        Retry-After (ou True) quando o erro é um 429; is_upstream_failure(erro)
+        diz se o erro conta para o circuit breaker. O breaker é consultado
+        uma vez por chamada lógica: as novas tentativas após um 429 fazem
+        parte da mesma chamada de teste.
+        """
+        self.breaker.allow()
+        for attempt in range(self.max_attempts):
+            self.acquire()
+            try:
+                result = fn()
+            except Exception as e:
+                retry_after = is_rate_limited(e)
+                if retry_after:
+                    delay = self.retry_delay(None if retry_after is True else retry_after, attempt)
+                    if attempt + 1 < self.max_attempts and delay <= self.max_retry_wait:
+                        time.sleep(delay)
+                        continue
+                    self.breaker.record_failure(open_for=delay)
+                    raise SpotifyUnavailable("Spotify rate limit reached", int(delay) + 1) from e
+                if is_upstream_failure(e):
+                    self.breaker.record_failure()
+                else:
+                    self.breaker.record_success()
+                raise
+            self.breaker.record_success()
+            return result
@@ -1,27 +1,195 @@
+import os
+import threading
+import time
+import requests
 import spotipy
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
 from flask import current_app
+from requests.adapters import HTTPAdapter
 from spotipy import SpotifyOAuth
+from urllib3.util.retry import Retry
+from app.config import Config
+from app.services.catalog_cache import CatalogCache
+from app.services.rate_limit import SpotifyGuard, SpotifyUnavailable
+from app.utils.cache import SingleFlight, TTLCache
+from app.utils.metrics import time_spotify_call
+
+
+class PooledSpotify(spotipy.Spotify):
+    """
+    Cliente spotipy que usa uma sessão HTTP compartilhada. O token fica só
+    nesta instância, que é barata de criar a cada requisição.
+    """
+
+    def __init__(self, *args, guard=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Resolvido na thread da requisição: as chamadas podem rodar em
+        # threads do SpotifyFanOut, sem contexto de aplicação.
+        self._guard = guard
+
+    def __del__(self):
+        # O spotipy fecha a sessão ao coletar o cliente; aqui ela é do pool.
+        pass
+
+    @staticmethod
+    def _rate_limited(error):
+        # O Spotify sempre manda Retry-After no 429. Sem ele, o 429 vem do
+        # próprio spotipy ("Max Retries") e é falha do serviço, não limite.
+        if isinstance(error, spotipy.SpotifyException) and error.http_status == 429:
+            return error.headers.get('Retry-After')
+        return None
+
+    @staticmethod
+    def _upstream_failure(error):
+        if isinstance(error, spotipy.SpotifyException):
+            return error.http_status >= 500 or (error.http_status == 429 and not error.headers.get('Retry-After'))
+        return isinstance(error, requests.exceptions.RequestException)
+
+    def _internal_call(self, method, url, payload, params):
+        call = super(PooledSpotify, self)._internal_call
+        return (self._guard or SpotifyGuard.instance()).call(
+            lambda: time_spotify_call(url, lambda: call(method, url, payload, dict(params))),
+            self._rate_limited,
+            self._upstream_failure,
+        )
+
+
+class SpotifyClientFactory:
+    """
+    Mantém um único pool de conexões keep-alive com api.spotify.com por
+    processo e entrega clientes por token sem estado compartilhado mutável.
+    """
+    _session = None
+    _pid = None
+    _lock = threading.Lock()
+    _clients = TTLCache(maxsize=Config.SPOTIFY_CLIENT_CACHE_SIZE, ttl=3600)
+
+    @classmethod
+    def session(cls):
+        if cls._session is None or cls._pid != os.getpid():
+            with cls._lock:
+                if cls._session is None or cls._pid != os.getpid():
+                    cls._session = cls._build_session(current_app.config)
+                    cls._pid = os.getpid()
+        return cls._session
+
+    @staticmethod
+    def _build_session(config):
+        retry = Retry(
+            total=config.get('SPOTIFY_RETRIES', 3),
+            connect=None,
+            read=False,
+            allowed_methods=frozenset(['GET', 'POST', 'PUT', 'DELETE']),
+            backoff_factor=config.get('SPOTIFY_BACKOFF_FACTOR', 0.3),
+            # Só falhas de conexão: respostas 429 e 5xx chegam ao SpotifyGuard,
+            # que decide entre esperar o Retry-After e abrir o circuit breaker.
+            respect_retry_after_header=False,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=config.get('SPOTIFY_POOL_CONNECTIONS', 4),
+            pool_maxsize=config.get('SPOTIFY_POOL_SIZE', 32),
+            max_retries=retry,
+        )
+        session = requests.Session()
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    @classmethod
+    def client(cls, auth):
+        """
+        Cliente do token, reaproveitado enquanto o token vale (até 1 h) e a
+        sessão do processo for a mesma.
+        """
+        session = cls.session()
+        client = cls._clients.get(auth)
+        if client is None or client._session is not session:
+            client = PooledSpotify(
+                auth=auth,
+                requests_session=session,
+                requests_timeout=current_app.config.get('SPOTIFY_TIMEOUT', 5),
+                guard=SpotifyGuard.instance(),
+            )
+            cls._clients.set(auth, client)
+        return client
+
+
+def spotify_client(auth):
+    return SpotifyClientFactory.client(auth)
+
+
+class SpotifyFanOut:
+    """
+    Executa chamadas independentes ao Spotify em paralelo num executor
+    limitado e compartilhado pelo processo.
+    """
+    _executor = None
+    _pid = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def executor(cls):
+        if cls._executor is None or cls._pid != os.getpid():
+            with cls._lock:
+                if cls._executor is None or cls._pid != os.getpid():
+                    cls._executor = ThreadPoolExecutor(
+                        max_workers=current_app.config.get('SPOTIFY_FANOUT_WORKERS', 16),
+                        thread_name_prefix='spotify-fanout',
+                    )
+                    cls._pid = os.getpid()
+        return cls._executor
+
+    @classmethod
+    def run(cls, calls, timeout):
+        """
+        calls é um dicionário nome -> função sem argumentos. Cada parte tem
+        até timeout segundos a partir do envio; devolve (resultados, erros)
+        para que uma parte com falha não derrube as demais.
+        """
+        executor = cls.executor()
+        started = time.monotonic()
+        futures = {name: executor.submit(call) for name, call in calls.items()}
+
+        results, errors = {}, {}
+        for name, future in futures.items():
+            try:
+                results[name] = future.result(timeout=max(0, started + timeout - time.monotonic()))
+            except TimeoutError:
+                future.cancel()
+                errors[name] = "Timed out"
+            except Exception as e:
+                errors[name] = str(e)
+        return results, errors
+
+
+def normalize_query(query):
+    return " ".join(query.split()).casefold()
 
 
 class SpotipyClient:
     _instance = None
+    _search_cache = TTLCache(maxsize=Config.SEARCH_CACHE_SIZE, ttl=Config.SEARCH_CACHE_TTL)
+    _search_flight = SingleFlight()
 
     def __new__(cls, client_id=None, client_secret=None, redirect_uri=None):
         if cls._instance is None:
             cls._instance = super(SpotipyClient, cls).__new__(cls)
+            cls._instance._oauth_settings = (client_id, client_secret, redirect_uri)
+            cls._instance._sp = None
 
-            client_id = client_id or current_app.config.get('SPOTIFY_CLIENT_ID')
-            client_secret = client_secret or current_app.config.get('SPOTIFY_CLIENT_SECRET')
-            redirect_uri = redirect_uri or current_app.config.get('SPOTIFY_REDIRECT_URI')
+        return cls._instance
 
-            cls._instance.sp = spotipy.Spotify(auth_manager=SpotifyOAuth(
-                client_id=client_id,
-                client_secret=client_secret,
-                redirect_uri=redirect_uri,
+    @property
+    def sp(self):
+        if self._sp is None:
+            client_id, client_secret, redirect_uri = self._oauth_settings
+            self._sp = spotipy.Spotify(auth_manager=SpotifyOAuth(
+                client_id=client_id or current_app.config.get('SPOTIFY_CLIENT_ID'),
+                client_secret=client_secret or current_app.config.get('SPOTIFY_CLIENT_SECRET'),
+                redirect_uri=redirect_uri or current_app.config.get('SPOTIFY_REDIRECT_URI'),
                 scope='user-read-recently-played user-read-currently-playing user-top-read user-library-read',
             ))
-
-        return cls._instance
+        return self._sp
 
     def get_recent_tracks(self, limit):
         return self.sp.current_user_recently_played(limit=limit)
@@ -35,59 +203,124 @@ class SpotipyClient:
     def get_saved_albums(self, limit):
         return self.sp.current_user_saved_albums(limit)
     
-    def search_albums(self,auth, query, limit):
-        self.sp.auth= auth
-        results = self.sp.search(q=query, limit=limit, type='album')
-        albums = results.get('albums', {}).get('items', [])
-
-        return [
-            {
-                "name": album["name"],
-                "id": album["id"],
-                "artist": album["artists"][0]["name"] if album["artists"] else "Unknown",
-                "release_date": album["release_date"],
-                "total_tracks": album["total_tracks"],
-                "image": album["images"][0]["url"] if album["images"] else None,
-                "album_type": album["album_type"]
+    def _cached_search(self, kind, query, limit, search):
+        """
+        Resultados de busca ficam num cache curto, com a consulta normalizada
+        na chave. Buscas idênticas simultâneas disparam uma única chamada.
+        """
+        key = (kind, normalize_query(query), limit)
+        result = self._search_cache.get(key)
+        if result is not None:
+            return result
+
+        def load():
+            cached = self._search_cache.get(key)
+            if cached is not None:
+                return cached
+            fresh = search()
+            self._search_cache.set(key, fresh)
+            return fresh
+
+        return self._search_flight.do(key, load)
+
+    @staticmethod
+    def _album_summary(album):
+        return {
+            "name": album["name"],
+            "id": album["id"],
+            "artist": album["artists"][0]["name"] if album["artists"] else "Unknown",
+            "release_date": album["release_date"],
+            "total_tracks": album["total_tracks"],
+            "image": album["images"][0]["url"] if album["images"] else None,
+            "album_type": album["album_type"]
+        }
+
+    def search_albums(self, auth, query, limit):
+        def search():
+            results = spotify_client(auth).search(q=query, limit=limit, type='album')
+            albums = results.get('albums', {}).get('items', [])
+            return [self._album_summary(album) for album in albums]
+
+        return self._cached_search('album', query, limit, search)
+
+    def search_artists_albums(self, auth, query, limit):
+        def search():
+            results = spotify_client(auth).search(q=query, limit=limit, type='artist,album')
+            artists = results.get('artists', {}).get('items', [])
+            albums = results.get('albums', {}).get('items', [])
+
+            return {
+                "artists": [
+                    {
+                        "name": artist["name"],
+                        "id": artist["id"],
+                        "image": artist["images"][0]["url"] if artist["images"] else None
+                    } for artist in artists
+                ],
+                "albums": [self._album_summary(album) for album in albums]
             }
-            for album in albums
-        ]
 
-    def search_artists_albums(self,auth, query, limit):
-        self.sp.auth=auth
-        results = self.sp.search(q=query, limit=limit, type='artist,album')
-        artists = results.get('artists', {}).get('items', [])
-        albums = results.get('albums', {}).get('items', [])
+        return self._cached_search('artist,album', query, limit, search)
 
+    @staticmethod
+    def _profile(user):
         return {
-            "artists": [
-                {
-                    "name": artist["name"],
-                    "id": artist["id"],
-                    "image": artist["images"][0]["url"] if artist["images"] else None
-                } for artist in artists
-            ],
-            "albums": [
-                {
-                    "name": album["name"],
-                    "id": album["id"],
-                    "artist": album["artists"][0]["name"] if album["artists"] else "Unknown",
-                    "release_date": album["release_date"],
-                    "total_tracks": album["total_tracks"],
-                    "image": album["images"][0]["url"] if album["images"] else None,
-                    "album_type": album["album_type"]
-                } for album in albums
-            ]
+            "display_name": user["display_name"],
+            "id": user["id"],
+            "image": user["images"][0]["url"] if user["images"] else None,
         }
-        
+
     def get_user(self, auth, spotify_id):
-        self.sp.auth=auth
-        user = self.sp.user(spotify_id)
-        return {
-            "user": {
-                    "display_name": user["display_name"],
-                    "id": user["id"],
-                    "image": user["images"][0]["url"] if user["images"] else None,
-                } 
-         }
+        sp = spotify_client(auth)
+        profile = CatalogCache.instance().get_or_fetch(
+            "user", spotify_id, lambda: self._profile(sp.user(spotify_id)))
+        return {"user": profile}
+
+    def get_users(self, auth, spotify_ids):
+        """
+        Busca vários perfis de usuário do Spotify de uma vez, sem repetir IDs,
+        em paralelo no executor do SpotifyFanOut e passando pelo cache de
+        catálogo. Perfis que falharem ficam de fora; só quando todos falham
+        por indisponibilidade do Spotify o cache serve os dados vencidos.
+        """
+        sp = spotify_client(auth)
+
+        def fetch_many(missing):
+            executor = SpotifyFanOut.executor()
+            futures = {spotify_id: executor.submit(lambda spotify_id=spotify_id: self._profile(sp.user(spotify_id)))
+                       for spotify_id in missing}
+            users, unavailable = {}, None
+            for spotify_id, future in futures.items():
+                try:
+                    users[spotify_id] = future.result()
+                except SpotifyUnavailable as e:
+                    unavailable = e
+                except Exception as e:
+                    current_app.logger.warning("Could not fetch Spotify profile %s: %s", spotify_id, e)
+            if not users and unavailable is not None:
+                raise unavailable
+            return users
+
+        return CatalogCache.instance().get_many(
+            "user", [spotify_id for spotify_id in spotify_ids if spotify_id], fetch_many)
+
+    def get_albums(self, auth, album_ids):
+        """
+        Resumos de vários álbuns pelo cache de catálogo. Os ausentes são
+        buscados em lotes de 20 (limite de /albums) se houver token; sem
+        token, devolve só o que já estiver em cache.
+        """
+        def fetch_many(missing):
+            if not auth:
+                return {}
+            sp = spotify_client(auth)
+            albums = {}
+            for start in range(0, len(missing), 20):
+                for album in sp.albums(missing[start:start + 20])["albums"]:
+                    if album:
+                        albums[album["id"]] = album
+            return albums
 
+        albums = CatalogCache.instance().get_many(
+            "album", [album_id for album_id in album_ids if album_id], fetch_many)
+        return {album_id: self._album_summary(album) for album_id, album in albums.items()}
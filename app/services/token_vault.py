@@ -0,0 +1,246 @@
+import base64
+import hashlib
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from cryptography.fernet import Fernet, InvalidToken, MultiFernet
+from flask import current_app
+from requests.exceptions import RequestException
+from app.services.spotify import SpotifyClientFactory
+from app.utils.cache import TTLCache
+from app.utils.persistence_manager import PersistenceManager
+
+
+class TokenCipher:
+    """
+    Criptografa os tokens do Spotify guardados no banco (Fernet). A
+    primeira chave cifra; as demais só decifram, para permitir rotação.
+    """
+
+    def __init__(self, keys):
+        self._fernet = MultiFernet([Fernet(key) for key in keys])
+
+    @classmethod
+    def from_config(cls, config):
+        keys = [key.strip() for key in (config.get('SPOTIFY_TOKEN_KEYS') or '').split(',') if key.strip()]
+        if not keys:
+            # Sem chave dedicada, deriva uma da SECRET_KEY.
+            digest = hashlib.sha256(config['SECRET_KEY'].encode('utf-8')).digest()
+            keys = [base64.urlsafe_b64encode(digest)]
+        return cls(keys)
+
+    def encrypt(self, value):
+        return self._fernet.encrypt(value.encode('utf-8')).decode('ascii')
+
+    def decrypt(self, value):
+        return self._fernet.decrypt(value.encode('ascii')).decode('utf-8')
+
+
+class SpotifyTokenVault:
+    """
+    Tokens do Spotify por usuário (coleção spotify_tokens, cifrados). O
+    access token é renovado antes de vencer: por uma thread em segundo
+    plano e, se ela atrasar, na própria leitura. A thread só renova quem
+    usou o token dentro de active_window segundos (last_used_at, gravado
+    no máximo a cada touch_interval segundos); os demais são renovados na
+    leitura. Só um worker renova cada usuário por vez (refresh_lock_until).
+    Tokens que não decifram mais (chave removida da rotação ou documento
+    corrompido) são descartados e o usuário fica sem Spotify vinculado.
+    """
+    TOKEN_URL = "https://accounts.spotify.com/api/token"
+    _instance = None
+    _pid = None
+    _lock = threading.Lock()
+
+    def __init__(self, cipher, client_id, client_secret, margin=300, active_window=86400, touch_interval=60,
+                 lock_timeout=30, cache_size=10000, timeout=5, collection="spotify_tokens"):
+        self.cipher = cipher
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.margin = margin
+        self.active_window = active_window
+        self.touch_interval = touch_interval
+        self.lock_timeout = lock_timeout
+        self.timeout = timeout
+        self.collection = collection
+        self._tokens = TTLCache(maxsize=cache_size)
+
+    @classmethod
+    def instance(cls):
+        if cls._instance is None or cls._pid != os.getpid():
+            with cls._lock:
+                if cls._instance is None or cls._pid != os.getpid():
+                    config = current_app.config
+                    interval = config.get('SPOTIFY_TOKEN_REFRESH_INTERVAL', 60)
+                    cls._instance = cls(
+                        TokenCipher.from_config(config),
+                        config.get('SPOTIFY_CLIENT_ID'),
+                        config.get('SPOTIFY_CLIENT_SECRET'),
+                        margin=config.get('SPOTIFY_TOKEN_REFRESH_MARGIN', 300),
+                        active_window=config.get('SPOTIFY_TOKEN_ACTIVE_WINDOW', 86400),
+                        touch_interval=interval,
+                        cache_size=config.get('SPOTIFY_TOKEN_CACHE_SIZE', 10000),
+                        timeout=config.get('SPOTIFY_TIMEOUT', 5),
+                    )
+                    cls._pid = os.getpid()
+                    if interval:
+                        cls._instance.start_refresher(current_app._get_current_object(), interval)
+        return cls._instance
+
+    @classmethod
+    def discard(cls, username):
+        """
+        Descarta o token em memória do usuário neste processo, sem criar o
+        cofre se ele ainda não existir.
+        """
+        if cls._instance is not None and cls._pid == os.getpid():
+            cls._instance._tokens.delete(username)
+
+    def _collection(self):
+        return PersistenceManager.get_database()[self.collection]
+
+    def store(self, username, access_token, refresh_token, expires_in, scope=None):
+        update = {
+            "access_token": self.cipher.encrypt(access_token),
+            "expires_at": datetime.utcnow() + timedelta(seconds=expires_in),
+            "scope": scope,
+            "updated_at": datetime.utcnow(),
+        }
+        if refresh_token:
+            update["refresh_token"] = self.cipher.encrypt(refresh_token)
+        self._collection().update_one(
+            {"_id": username},
+            {"$set": update, "$unset": {"refresh_lock_until": ""}},
+            upsert=True
+        )
+        self._tokens.delete(username)
+
+    def forget(self, username):
+        self._collection().delete_one({"_id": username})
+        self._tokens.delete(username)
+
+    def _remember(self, username, document):
+        token = self.cipher.decrypt(document["access_token"])
+        ttl = (document["expires_at"] - datetime.utcnow()).total_seconds() - self.margin
+        if ttl > 0:
+            self._tokens.set(username, token, ttl)
+        return token
+
+    def access_token(self, username):
+        """
+        Access token válido do usuário, ou None se não houver (usuário sem
+        Spotify vinculado ou autorização revogada).
+        """
+        token = self._tokens.get(username)
+        if token is not None:
+            return token
+
+        document = self._collection().find_one({"_id": username})
+        if document is None:
+            return None
+        self._touch(document)
+        if document["expires_at"] - timedelta(seconds=self.margin) <= datetime.utcnow():
+            document = self.refresh(document) or document
+        if document["expires_at"] <= datetime.utcnow():
+            return None
+        try:
+            return self._remember(username, document)
+        except InvalidToken:
+            self.forget(username)
+            return None
+
+    def _touch(self, document):
+        now = datetime.utcnow()
+        last_used = document.get("last_used_at")
+        if last_used is None or (now - last_used).total_seconds() >= self.touch_interval:
+            self._collection().update_one({"_id": document["_id"]}, {"$set": {"last_used_at": now}})
+
+    def refresh(self, document):
+        """
+        Renova o access token com o refresh token guardado. Devolve o
+        documento atualizado, ou None se não foi possível renovar agora.
+        """
+        now = datetime.utcnow()
+        username = document["_id"]
+        claimed = self._collection().find_one_and_update(
+            {"_id": username, "expires_at": document["expires_at"],
+             "$or": [{"refresh_lock_until": {"$exists": False}}, {"refresh_lock_until": {"$lt": now}}]},
+            {"$set": {"refresh_lock_until": now + timedelta(seconds=self.lock_timeout)}}
+        )
+        if claimed is None:
+            # Outro worker renovou (ou está renovando) este usuário.
+            return self._collection().find_one({"_id": username})
+
+        try:
+            refresh_token = self.cipher.decrypt(claimed["refresh_token"])
+        except KeyError:
+            self._release(username)
+            return None
+        except InvalidToken:
+            # Cifrado com uma chave que saiu da rotação: só um novo login resolve.
+            self.forget(username)
+            return None
+        try:
+            response = SpotifyClientFactory.session().post(
+                self.TOKEN_URL,
+                data={"grant_type": "refresh_token", "refresh_token": refresh_token},
+                auth=(self.client_id, self.client_secret),
+                timeout=self.timeout,
+            )
+        except RequestException:
+            self._release(username)
+            return None
+
+        try:
+            data = response.json()
+        except ValueError:
+            data = None
+        if not isinstance(data, dict):
+            self._release(username)
+            return None
+
+        if response.status_code == 400 and data.get("error") == "invalid_grant":
+            # Autorização revogada: o usuário precisa entrar com o Spotify de novo.
+            self.forget(username)
+            return None
+        if response.status_code != 200 or "access_token" not in data:
+            self._release(username)
+            return None
+
+        self.store(username, data["access_token"], data.get("refresh_token"), data.get("expires_in", 3600),
+                   data.get("scope", claimed.get("scope")))
+        return self._collection().find_one({"_id": username})
+
+    def _release(self, username):
+        self._collection().update_one({"_id": username}, {"$unset": {"refresh_lock_until": ""}})
+
+    def refresh_expiring(self, limit=100):
+        """
+        Renova os tokens que vencem dentro da margem, apenas de usuários
+        ativos recentemente. Retorna quantos foram renovados.
+        """
+        now = datetime.utcnow()
+        horizon = now + timedelta(seconds=self.margin)
+        query = {"expires_at": {"$lt": horizon},
+                 "last_used_at": {"$gte": now - timedelta(seconds=self.active_window)}}
+        documents = list(self._collection().find(query).sort("expires_at", 1).limit(limit))
+        refreshed = 0
+        for document in documents:
+            updated = self.refresh(document)
+            if updated is not None and updated["expires_at"] > horizon:
+                self._tokens.delete(document["_id"])
+                refreshed += 1
+        return refreshed
+
+    def start_refresher(self, app, interval):
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    with app.app_context():
+                        self.refresh_expiring()
+                except Exception:
+                    app.logger.exception("Spotify token refresh failed")
+
+        threading.Thread(target=run, name='spotify-token-refresher', daemon=True).start()
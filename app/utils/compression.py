@@ -0,0 +1,64 @@
+import gzip
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - depende do ambiente
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {
+    "application/json",
+    "application/x-ndjson",
+    "text/plain",
+    "text/html",
+}
+
+
+def choose_encoding(accept_encodings):
+    """
+    Escolhe a codificação aceita pelo cliente: br (se o pacote brotli
+    estiver instalado), depois gzip. None se nenhuma servir.
+    """
+    candidates = (["br"] if brotli is not None else []) + ["gzip"]
+    best, best_quality = None, 0
+    for encoding in candidates:
+        quality = accept_encodings[encoding]
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress(data, encoding, config):
+    if encoding == "br":
+        return brotli.compress(data, quality=config.get('COMPRESS_BROTLI_QUALITY', 4))
+    return gzip.compress(data, compresslevel=config.get('COMPRESS_LEVEL', 6))
+
+
+def register_compression(app):
+    """
+    Comprime as respostas conforme o Accept-Encoding. Respostas em stream,
+    pequenas, sem corpo ou já codificadas passam direto.
+    """
+    if not app.config.get('COMPRESS_ENABLED', True):
+        return
+
+    @app.after_request
+    def compress_response(response):
+        response.vary.add('Accept-Encoding')
+        if (response.direct_passthrough or response.is_streamed
+                or response.status_code < 200 or response.status_code in (204, 304)
+                or 'Content-Encoding' in response.headers
+                or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+            return response
+
+        encoding = choose_encoding(request.accept_encodings)
+        if encoding is None:
+            return response
+
+        data = response.get_data()
+        if len(data) < app.config.get('COMPRESS_MIN_SIZE', 500):
+            return response
+
+        response.set_data(compress(data, encoding, app.config))
+        response.headers['Content-Encoding'] = encoding
+        return response
@@ -0,0 +1,35 @@
+import hashlib
+from flask import current_app, request
+
+
+def version_tag(*parts):
+    """
+    ETag fraco a partir das partes que identificam a versão da resposta
+    (contadores de versão, parâmetros da consulta, usuário).
+    """
+    return hashlib.sha1("|".join(str(part) for part in parts).encode('utf-8')).hexdigest()[:20]
+
+
+def _revalidate(response, tag):
+    response.set_etag(tag, weak=True)
+    # O cliente pode guardar a resposta, mas deve revalidar antes de usar.
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def not_modified(tag):
+    """
+    Resposta 304 se o cliente já tem esta versão (If-None-Match), senão None.
+    """
+    if request.if_none_match.contains_weak(tag):
+        return _revalidate(current_app.response_class(status=304), tag)
+    return None
+
+
+def tagged(result, tag):
+    """
+    Acrescenta o ETag ao retorno de uma view ((response, status) ou response).
+    """
+    response, status = result if isinstance(result, tuple) else (result, None)
+    _revalidate(response, tag)
+    return (response, status) if status is not None else response
@@ -0,0 +1,81 @@
+import re
+from functools import wraps
+from flask import g, jsonify, request
+
+_TOKEN = re.compile(r"\s*([A-Za-z0-9_]+|[(),])")
+
+
+def parse_fields(spec):
+    """
+    Interpreta um seletor no formato "items(name,images(url)),total" e
+    devolve a árvore {campo: subárvore ou None}. Levanta ValueError se o
+    seletor for inválido.
+    """
+    tokens = []
+    position = 0
+    spec = spec.strip()
+    while position < len(spec):
+        match = _TOKEN.match(spec, position)
+        if not match:
+            raise ValueError("Invalid fields selector")
+        tokens.append(match.group(1))
+        position = match.end()
+
+    def parse(index, depth):
+        tree = {}
+        while index < len(tokens):
+            name = tokens[index]
+            if name in "(),":
+                raise ValueError("Invalid fields selector")
+            index += 1
+            subtree = None
+            if index < len(tokens) and tokens[index] == "(":
+                subtree, index = parse(index + 1, depth + 1)
+                if index >= len(tokens) or tokens[index] != ")":
+                    raise ValueError("Invalid fields selector")
+                index += 1
+            tree[name] = subtree
+            if index < len(tokens) and tokens[index] == ",":
+                index += 1
+                continue
+            break
+        if not tree or (index < len(tokens) and (depth == 0 or tokens[index] != ")")):
+            raise ValueError("Invalid fields selector")
+        return tree, index
+
+    tree, _ = parse(0, 0)
+    return tree
+
+
+def select(data, tree):
+    """
+    Mantém só os campos da árvore. Listas são filtradas item a item.
+    """
+    if not tree:
+        return data
+    if isinstance(data, list):
+        return [select(item, tree) for item in data]
+    if isinstance(data, dict):
+        return {name: select(data[name], subtree) for name, subtree in tree.items() if name in data}
+    return data
+
+
+def selectable(f):
+    """
+    Lê o parâmetro fields da requisição; a view usa selected() nos dados
+    que devolve. Seletor inválido responde 400 antes de chamar o Spotify.
+    """
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        spec = request.args.get('fields')
+        try:
+            g.fields = parse_fields(spec) if spec else None
+        except ValueError as e:
+            return jsonify({"success": False, "message": str(e)}), 400
+        return f(*args, **kwargs)
+
+    return decorated
+
+
+def selected(data):
+    return select(data, g.get('fields'))
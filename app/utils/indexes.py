@@ -0,0 +1,139 @@
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+# Registro declarativo dos índices de cada coleção. ensure_indexes aplica
+# tudo de forma idempotente; mudanças de especificação de um índice já
+# existente devem vir acompanhadas de uma migração (app/utils/migrations.py).
+INDEXES = {
+    "users": [
+        IndexModel([("username", ASCENDING)], name="username_unique", unique=True),
+        IndexModel([("spotify_id", ASCENDING)], name="spotify_id"),
+        IndexModel([("username_lower", ASCENDING)], name="username_lower"),
+        IndexModel([("username_grams", ASCENDING)], name="username_grams"),
+    ],
+    "reviews": [
+        # userId no fim: get_by_album filtra o próprio autor sem ler o documento.
+        IndexModel([("albumId", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING), ("userId", ASCENDING)],
+                   name="album_timeline"),
+        IndexModel([("userId", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)],
+                   name="user_timeline"),
+        IndexModel([("timestamp", DESCENDING), ("_id", DESCENDING)], name="recent"),
+        # Uma avaliação por usuário e álbum (Review.save faz upsert nesta chave).
+        IndexModel([("albumId", ASCENDING), ("userId", ASCENDING)], name="album_user_unique", unique=True),
+    ],
+    "album_stats": [
+        IndexModel([("score", DESCENDING), ("_id", DESCENDING)], name="top_rated"),
+        IndexModel([("trend", DESCENDING), ("_id", DESCENDING), ("last_review_at", DESCENDING)],
+                   name="trending"),
+    ],
+    "refresh_tokens": [
+        IndexModel([("token_hash", ASCENDING)], name="token_hash_unique", unique=True, sparse=True),
+        IndexModel([("exp", ASCENDING)], name="exp_ttl", expireAfterSeconds=0),
+        IndexModel([("username", ASCENDING)], name="username"),
+    ],
+    "catalog_cache": [
+        # Mantém as entradas vencidas por um dia para servir dados antigos
+        # enquanto o Spotify estiver indisponível.
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=24 * 3600),
+    ],
+    "rate_limits": [
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    "spotify_rate_windows": [
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    "spotify_tokens": [
+        # Sem TTL: o refresh token continua valendo depois que o access token vence.
+        IndexModel([("expires_at", ASCENDING), ("last_used_at", ASCENDING)], name="expires_at_last_used_at"),
+    ],
+}
+
+# Formato das consultas feitas pelos models: (coleção, campos de igualdade,
+# campos de ordenação, campos de intervalo, origem), como devolvido por
+# query_shape. Usado por uncovered_queries; tests/indexes_test.py confere
+# estas entradas contra as consultas reais dos models.
+QUERIES = [
+    ("users", ["username"], [], [], "User.find_user_by_username / save / find_user_by_credentials"),
+    ("users", ["spotify_id"], [], [], "User.find_user_by_spotify_id"),
+    ("users", [], [], ["username_lower"], "User.search_users (prefixo)"),
+    ("users", ["username_grams"], [], [], "User.search_users (trigramas)"),
+    ("users", ["_id"], [], [], "User.find_user_by_id / find_users_by_ids / Review.is_valid_user"),
+    ("users", [], ["_id"], [], "User.iter_users"),
+    ("reviews", ["albumId"], ["timestamp", "_id"], [], "Review.get_by_album / AlbumStats.remove_review"),
+    ("reviews", ["albumId"], ["timestamp", "_id"], ["userId"], "Review.get_by_album (exclude_user_id)"),
+    ("reviews", ["userId"], ["timestamp", "_id"], [], "Review.get_by_user"),
+    ("reviews", [], ["timestamp", "_id"], [], "Review.recent"),
+    ("reviews", ["albumId", "userId"], [], [], "Review.save / Review.get_by_user_and_album"),
+    ("reviews", ["_id"], [], [], "Review.update / Review.delete"),
+    ("album_stats", ["_id"], [], [], "AlbumStats"),
+    ("album_stats", [], ["score", "_id"], [], "AlbumStats.top_rated"),
+    ("album_stats", [], ["trend", "_id"], ["last_review_at"], "AlbumStats.trending"),
+    ("user_stats", ["_id"], [], [], "UserStats"),
+    ("catalog_cache", ["_id"], [], [], "MongoBackend"),
+    ("spotify_rate_windows", ["_id"], [], [], "SharedTokenBucket"),
+    ("rate_limits", ["_id"], [], [], "PersistenceMongoStorage"),
+    ("spotify_tokens", ["_id"], [], [], "SpotifyTokenVault / TokenManager.invalidate_tokens_for_user"),
+    ("spotify_tokens", [], ["expires_at"], ["last_used_at"], "SpotifyTokenVault.refresh_expiring"),
+    ("refresh_tokens", ["token_hash"], [], ["exp"], "TokenManager.find_refresh_token"),
+    ("refresh_tokens", ["token_hash"], [], [], "TokenManager.delete_refresh_token"),
+    ("refresh_tokens", ["username"], [], [], "TokenManager.store_refresh_token / invalidate_tokens_for_user"),
+]
+
+def ensure_indexes(db):
+    """
+    Cria os índices declarados em INDEXES. Índices já existentes com a
+    mesma especificação são ignorados pelo MongoDB.
+    """
+    created = {}
+    for collection, indexes in INDEXES.items():
+        created[collection] = db[collection].create_indexes(indexes)
+    return created
+
+
+def _index_keys(collection):
+    keys = [([("_id", ASCENDING)], True)]
+    for index in INDEXES.get(collection, []):
+        keys.append((list(index.document["key"].items()), index.document.get("unique", False)))
+    return keys
+
+
+def _covers(index_keys, equality, sort, ranges=(), unique=False):
+    fields = [field for field, _ in index_keys]
+    if unique and set(fields) == set(equality):
+        # No máximo um documento: ordenação e intervalos não pesam.
+        return True
+    if set(fields[:len(equality)]) != set(equality):
+        return False
+    rest = fields[len(equality):]
+    return rest[:len(sort)] == list(sort) and set(ranges) <= set(rest[len(sort):])
+
+
+def query_shape(query, sort=()):
+    """
+    Reduz um filtro e uma ordenação a (igualdade, ordenação, intervalo),
+    na ordem em que um índice deve conter os campos. $in conta como
+    igualdade; os demais operadores e os ramos de um $or, como intervalo.
+    Campos já usados na ordenação não se repetem no intervalo.
+    """
+    sort = [field for field, _ in sort] if not isinstance(sort, str) else [sort]
+    equality, ranges = [], []
+    for field, value in query.items():
+        if field == "$or":
+            for branch in value:
+                ranges.extend(branch)
+        elif isinstance(value, dict) and set(value) - {"$in"}:
+            ranges.append(field)
+        else:
+            equality.append(field)
+    ranges = [field for field in dict.fromkeys(ranges) if field not in sort and field not in equality]
+    return equality, sort, ranges
+
+
+def uncovered_queries():
+    """
+    Lista as consultas de QUERIES que nenhum índice registrado cobre.
+    """
+    return [
+        (collection, equality, sort, ranges, source)
+        for collection, equality, sort, ranges, source in QUERIES
+        if not any(_covers(keys, equality, sort, ranges, unique) for keys, unique in _index_keys(collection))
+    ]
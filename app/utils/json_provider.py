@@ -0,0 +1,44 @@
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depende do ambiente
+    orjson = None
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    Serializa as respostas com orjson. Datas continuam no formato HTTP do
+    provider padrão do Flask, para não mudar o que os clientes recebem.
+    """
+    sort_keys = False
+
+    def _options(self, indent=None):
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return option
+
+    def dumps_bytes(self, obj, indent=None):
+        return orjson.dumps(obj, default=self.default, option=self._options(indent))
+
+    def dumps(self, obj, **kwargs):
+        return self.dumps_bytes(obj, kwargs.get("indent")).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        return self._app.response_class(self.dumps_bytes(obj, indent) + b"\n", mimetype=self.mimetype)
+
+
+def init_json(app):
+    """
+    Usa orjson quando instalado e JSON_PROVIDER não for "default".
+    """
+    if orjson is not None and app.config.get('JSON_PROVIDER', 'orjson') == 'orjson':
+        app.json = OrjsonProvider(app)
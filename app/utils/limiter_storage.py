@@ -0,0 +1,150 @@
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from limits.storage import Storage
+from pymongo import ReturnDocument
+from pymongo.errors import PyMongoError
+from app.utils.persistence_manager import PersistenceManager
+
+
+def _epoch(moment):
+    return moment.replace(tzinfo=timezone.utc).timestamp()
+
+
+def _limit_amount(key):
+    """
+    Limite embutido na chave pelo limits: .../<amount>/<multiples>/<granularity>.
+    """
+    try:
+        return int(key.rsplit("/", 3)[-3])
+    except (IndexError, ValueError):
+        return None
+
+
+class _Counter:
+    __slots__ = ("count", "pending", "expires_at", "flushed_at", "batch_size", "lock")
+
+    def __init__(self, batch_size):
+        self.count = 0
+        self.pending = 0
+        self.expires_at = 0
+        self.flushed_at = 0
+        self.batch_size = batch_size
+        self.lock = threading.Lock()
+
+
+class PersistenceMongoStorage(Storage):
+    """
+    Storage do Flask-Limiter na coleção rate_limits, pelo mesmo cliente do
+    PersistenceManager. Cada processo acumula os incrementos localmente e
+    os soma ao banco num único update a cada batch_size acertos ou
+    flush_interval segundos; o primeiro acerto de cada janela sempre vai ao
+    banco. Com N workers, a contagem global atrasa no máximo
+    N * (lote - 1), e o lote de cada chave é limitado a um décimo do seu
+    limite: limites pequenos, como "5 per minute", vão sempre ao banco.
+
+    Uso: RATELIMIT_STORAGE_URI = "persistence-mongo://".
+    """
+    STORAGE_SCHEME = ["persistence-mongo"]
+
+    def __init__(self, uri=None, wrap_exceptions=False, collection="rate_limits",
+                 batch_size=10, flush_interval=1.0, max_keys=100000, **options):
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+        self.collection = collection
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = float(flush_interval)
+        self.max_keys = max_keys
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    @property
+    def base_exceptions(self):
+        return PyMongoError
+
+    def _collection(self):
+        return PersistenceManager.get_database()[self.collection]
+
+    def _counter(self, key):
+        with self._lock:
+            counter = self._counters.get(key)
+            if counter is None:
+                if len(self._counters) >= self.max_keys:
+                    self._prune()
+                amount = _limit_amount(key)
+                batch_size = self.batch_size if amount is None else min(self.batch_size, max(1, amount // 10))
+                counter = self._counters[key] = _Counter(batch_size)
+            return counter
+
+    def _prune(self):
+        now = time.time()
+        for key in [key for key, counter in self._counters.items() if counter.expires_at <= now]:
+            del self._counters[key]
+
+    def _flush(self, key, counter, expiry):
+        """
+        Soma counter.pending no documento da chave. Se a janela do banco já
+        venceu (e o monitor de TTL ainda não removeu), começa outra.
+        """
+        now = datetime.utcnow()
+        alive = {"$gt": ["$expires_at", now]}
+        document = self._collection().find_one_and_update(
+            {"_id": key},
+            [{"$set": {
+                "count": {"$cond": [alive, {"$add": ["$count", counter.pending]}, counter.pending]},
+                "expires_at": {"$cond": [alive, "$expires_at", now + timedelta(seconds=expiry)]},
+            }}],
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        counter.count = document["count"]
+        counter.pending = 0
+        counter.expires_at = _epoch(document["expires_at"])
+        counter.flushed_at = time.monotonic()
+
+    def incr(self, key, expiry, amount=1):
+        counter = self._counter(key)
+        with counter.lock:
+            if counter.expires_at <= time.time():
+                counter.count, counter.pending = 0, amount
+                self._flush(key, counter, expiry)
+                return counter.count
+
+            counter.pending += amount
+            if counter.pending >= counter.batch_size or time.monotonic() - counter.flushed_at >= self.flush_interval:
+                self._flush(key, counter, expiry)
+            return counter.count + counter.pending
+
+    def get(self, key):
+        with self._lock:
+            counter = self._counters.get(key)
+        if counter is not None and counter.expires_at > time.time():
+            return counter.count + counter.pending
+
+        document = self._collection().find_one({"_id": key, "expires_at": {"$gt": datetime.utcnow()}})
+        return document["count"] if document else 0
+
+    def get_expiry(self, key):
+        with self._lock:
+            counter = self._counters.get(key)
+        if counter is not None and counter.expires_at > time.time():
+            return counter.expires_at
+
+        document = self._collection().find_one({"_id": key, "expires_at": {"$gt": datetime.utcnow()}})
+        return _epoch(document["expires_at"]) if document else time.time()
+
+    def check(self):
+        try:
+            PersistenceManager.get_database().command("ping")
+            return True
+        except PyMongoError:
+            return False
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+        return self._collection().delete_many({}).deleted_count
+
+    def clear(self, key):
+        with self._lock:
+            self._counters.pop(key, None)
+        self._collection().delete_one({"_id": key})
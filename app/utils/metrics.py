@@ -0,0 +1,243 @@
+import threading
+import time
+from flask import Response, g, request
+from pymongo import monitoring
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """
+    Contador monotônico com rótulos, no formato de exposição do Prometheus.
+    """
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for key, value in sorted(values.items()):
+            yield f"{self.name}_total{_labels(self.labelnames, key)} {_number(value)}"
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Histogram:
+    """
+    Histograma cumulativo com baldes fixos (em segundos) e rótulos.
+    """
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][index] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def samples(self):
+        with self._lock:
+            values = {key: (list(counts), total, count) for key, (counts, total, count) in self._values.items()}
+        for key, (counts, total, count) in sorted(values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = _labels(self.labelnames, key, [("le", _number(bound))])
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, key)} {_number(total)}"
+            yield f"{self.name}_count{_labels(self.labelnames, key)} {count}"
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Registry:
+    """
+    Métricas do processo. collectors são funções chamadas na coleta que
+    devolvem (nome, tipo, descrição, [(rótulos, valor)]) para valores que
+    já são mantidos em outro lugar, como os contadores do CatalogCache.
+    """
+
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector):
+        self.collectors.append(collector)
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        for collector in self.collectors:
+            for name, kind, documentation, samples in collector():
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {kind}")
+                suffix = "_total" if kind == "counter" else ""
+                for labels, value in samples:
+                    lines.append(f"{name}{suffix}{_labels(labels.keys(), labels.values())} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+REQUEST_LATENCY = registry.register(Histogram(
+    "http_request_duration_seconds", "Tempo de processamento das requisições.",
+    ("blueprint", "endpoint", "method")))
+REQUESTS = registry.register(Counter(
+    "http_requests", "Requisições por rota e status.",
+    ("blueprint", "endpoint", "method", "status")))
+MONGO_LATENCY = registry.register(Histogram(
+    "mongo_command_duration_seconds", "Tempo dos comandos enviados ao MongoDB.",
+    ("command", "outcome")))
+SPOTIFY_LATENCY = registry.register(Histogram(
+    "spotify_request_duration_seconds", "Tempo das chamadas HTTP à API do Spotify.",
+    ("endpoint", "status")))
+
+
+def catalog_cache_collector():
+    # Importado aqui para não criar dependência circular com os serviços.
+    from app.services.catalog_cache import CatalogCache
+
+    cache = CatalogCache._instance
+    if cache is None:
+        return []
+    samples = [({"entity": entity, "result": result}, value)
+               for entity, counters in sorted(cache.stats().items())
+               for result, value in sorted(counters.items())]
+    return [("catalog_cache_lookups", "counter", "Consultas ao cache de catálogo por resultado.", samples)]
+
+
+registry.add_collector(catalog_cache_collector)
+
+
+class MongoCommandTimer(monitoring.CommandListener):
+    """
+    Listener do pymongo que registra a duração de cada comando.
+    """
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        MONGO_LATENCY.observe(event.duration_micros / 1e6, command=event.command_name, outcome="success")
+
+    def failed(self, event):
+        MONGO_LATENCY.observe(event.duration_micros / 1e6, command=event.command_name, outcome="failure")
+
+
+_SPOTIFY_API = "https://api.spotify.com/v1/"
+# Coleções da API cujo segmento seguinte é um id (ou nome de usuário).
+_SPOTIFY_COLLECTIONS = frozenset({
+    "albums", "artists", "audio-analysis", "audio-features", "audiobooks", "categories", "chapters",
+    "episodes", "playlists", "shows", "tracks", "users",
+})
+
+
+def spotify_endpoint(url):
+    """
+    Reduz a URL chamada a um rótulo de baixa cardinalidade, trocando por
+    {id} o segmento que segue cada coleção: "albums/4aawyAB9vmqN3uQ7FjRGTy"
+    vira "albums/{id}" e "users/qualquer.nome/playlists", "users/{id}/playlists".
+    """
+    path = url.split("?", 1)[0]
+    if path.startswith(_SPOTIFY_API):
+        path = path[len(_SPOTIFY_API):]
+    segments = [segment for segment in path.split("/") if segment]
+    return "/".join("{id}" if index and segments[index - 1] in _SPOTIFY_COLLECTIONS else segment
+                    for index, segment in enumerate(segments))
+
+
+def time_spotify_call(url, fn):
+    started = time.perf_counter()
+    status = "error"
+    try:
+        result = fn()
+        status = "ok"
+        return result
+    except Exception as e:
+        status = str(getattr(e, "http_status", None) or "error")
+        raise
+    finally:
+        SPOTIFY_LATENCY.observe(time.perf_counter() - started, endpoint=spotify_endpoint(url), status=status)
+
+
+def register_metrics(app, limiter=None):
+    """
+    Mede cada requisição por blueprint e rota e expõe /metrics.
+    """
+    if not app.config.get('METRICS_ENABLED', True):
+        return
+
+    @app.before_request
+    def start_timer():
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        started = g.pop('request_started', None)
+        if started is not None:
+            rule = request.url_rule.rule if request.url_rule else "unmatched"
+            labels = {"blueprint": request.blueprint or "", "endpoint": rule, "method": request.method}
+            REQUEST_LATENCY.observe(time.perf_counter() - started, **labels)
+            REQUESTS.inc(status=response.status_code, **labels)
+        return response
+
+    def metrics():
+        return Response(registry.render(), content_type=CONTENT_TYPE)
+
+    if limiter is not None:
+        metrics = limiter.exempt(metrics)
+    app.add_url_rule(app.config.get('METRICS_PATH', '/metrics'), 'metrics', metrics, methods=['GET'])
@@ -0,0 +1,187 @@
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from pymongo import DESCENDING, UpdateOne
+from pymongo.errors import DuplicateKeyError
+from app.models.album_stats import AlbumStats
+from app.models.user import User
+from app.utils.indexes import ensure_indexes
+from app.utils.token_manager import TokenManager
+
+
+def _backfill_album_stats(db):
+    AlbumStats.rebuild()
+
+
+def _hash_refresh_tokens(db):
+    for token in db.refresh_tokens.find({"refresh_token": {"$exists": True}}):
+        if token["refresh_token"]:
+            update = {"$set": {"token_hash": TokenManager.hash_token(token["refresh_token"])},
+                      "$unset": {"refresh_token": ""}}
+            db.refresh_tokens.update_one({"_id": token["_id"]}, update)
+        else:
+            db.refresh_tokens.delete_one({"_id": token["_id"]})
+
+
+def _index_usernames(db, batch_size=1000):
+    requests = []
+    for user in db.users.find({"username_grams": {"$exists": False}}, {"username": 1}):
+        requests.append(UpdateOne({"_id": user["_id"]}, {"$set": User.search_fields(user["username"])}))
+        if len(requests) >= batch_size:
+            db.users.bulk_write(requests, ordered=False)
+            requests = []
+    if requests:
+        db.users.bulk_write(requests, ordered=False)
+
+
+def _dedupe_reviews(db, batch_size=1000):
+    # Mantém só a avaliação mais recente de cada (albumId, userId) para que
+    # o índice único album_user_unique possa ser criado.
+    duplicates = db.reviews.aggregate([
+        {"$sort": {"timestamp": DESCENDING, "_id": DESCENDING}},
+        {"$group": {"_id": {"album": "$albumId", "user": "$userId"},
+                    "ids": {"$push": "$_id"}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}},
+    ], allowDiskUse=True)
+
+    albums = set()
+    stale = []
+    for group in duplicates:
+        albums.add(group["_id"]["album"])
+        stale.extend(group["ids"][1:])
+        if len(stale) >= batch_size:
+            db.reviews.delete_many({"_id": {"$in": stale}})
+            stale = []
+    if stale:
+        db.reviews.delete_many({"_id": {"$in": stale}})
+
+    for album_id in albums:
+        AlbumStats.rebuild(album_id)
+
+
+# Migrações versionadas, aplicadas em ordem crescente e registradas na
+# coleção migrations. Nunca altere uma migração já publicada: crie outra.
+MIGRATIONS = [
+    (1, "Backfill album_stats from reviews", _backfill_album_stats),
+    (2, "Store refresh tokens as SHA-256 hashes", _hash_refresh_tokens),
+    (3, "Build username trigram search fields", _index_usernames),
+    (4, "Keep one review per user and album", _dedupe_reviews),
+]
+
+
+class MigrationLockTimeout(RuntimeError):
+    """
+    Outro processo segurou a trava das migrações por mais tempo do que o
+    permitido para esperar.
+    """
+
+
+class MigrationLease:
+    """
+    Trava exclusiva das migrações (documento único em migration_lock) com
+    prazo de validade. O dono renova o prazo enquanto trabalha; se o
+    processo morrer, outro assume quando o prazo vencer. Quem não consegue
+    a trava espera até wait_timeout segundos e então falha.
+    """
+    LOCK_ID = "migrations"
+
+    def __init__(self, db, lease_seconds=60, wait_timeout=600, poll_interval=1.0):
+        self.db = db
+        self.lease_seconds = lease_seconds
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex}"
+        self._stop = threading.Event()
+        self._heartbeat = None
+
+    def _try_acquire(self):
+        now = datetime.utcnow()
+        try:
+            # Com a trava vigente o filtro falha e o upsert colide no _id.
+            self.db.migration_lock.update_one(
+                {"_id": self.LOCK_ID, "expires_at": {"$lt": now}},
+                {"$set": {"owner": self.owner, "expires_at": now + timedelta(seconds=self.lease_seconds)}},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            return False
+        return True
+
+    def acquire(self):
+        deadline = time.monotonic() + self.wait_timeout
+        while not self._try_acquire():
+            if time.monotonic() >= deadline:
+                holder = self.db.migration_lock.find_one({"_id": self.LOCK_ID}) or {}
+                raise MigrationLockTimeout(
+                    f"Timed out waiting for the migration lock held by {holder.get('owner')}")
+            time.sleep(self.poll_interval)
+
+        self._stop.clear()
+        self._heartbeat = threading.Thread(target=self._renew, name="migration-lease", daemon=True)
+        self._heartbeat.start()
+
+    def _renew(self):
+        while not self._stop.wait(self.lease_seconds / 3):
+            self.db.migration_lock.update_one(
+                {"_id": self.LOCK_ID, "owner": self.owner},
+                {"$set": {"expires_at": datetime.utcnow() + timedelta(seconds=self.lease_seconds)}}
+            )
+
+    def release(self):
+        self._stop.set()
+        if self._heartbeat is not None:
+            self._heartbeat.join()
+            self._heartbeat = None
+        self.db.migration_lock.delete_one({"_id": self.LOCK_ID, "owner": self.owner})
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+def applied_versions(db):
+    """
+    Versões concluídas. Registros "running" ou "failed" são de execuções
+    interrompidas e a migração volta a rodar.
+    """
+    return {doc["_id"] for doc in db.migrations.find({"status": "applied"}, {"_id": 1})}
+
+
+def pending_migrations(db):
+    applied = applied_versions(db)
+    return [migration for migration in MIGRATIONS if migration[0] not in applied]
+
+
+def migrate(db, lease_seconds=60, wait_timeout=600):
+    """
+    Aplica as migrações pendentes e depois garante os índices registrados,
+    tudo sob a MigrationLease. Retorna as versões aplicadas nesta execução.
+    As migrações devem poder rodar de novo após uma execução interrompida.
+    """
+    applied = []
+    with MigrationLease(db, lease_seconds, wait_timeout):
+        for version, description, upgrade in pending_migrations(db):
+            db.migrations.update_one(
+                {"_id": version},
+                {"$set": {"description": description, "status": "running", "started_at": datetime.utcnow()}},
+                upsert=True
+            )
+            try:
+                upgrade(db)
+            except Exception as e:
+                db.migrations.update_one({"_id": version}, {"$set": {"status": "failed", "error": str(e)}})
+                raise
+
+            db.migrations.update_one(
+                {"_id": version},
+                {"$set": {"status": "applied", "applied_at": datetime.utcnow()}}
+            )
+            applied.append(version)
+        ensure_indexes(db)
+    return applied
@@ -0,0 +1,69 @@
+import base64
+import binascii
+from datetime import datetime
+from bson import ObjectId, json_util
+
+MAX_PAGE_SIZE = 100
+
+
+def encode_cursor(*values):
+    """
+    Gera um cursor opaco a partir dos valores da chave de ordenação
+    (por exemplo timestamp e _id do último documento da página).
+    """
+    raw = json_util.dumps(list(values)).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode('ascii'))
+        values = json_util.loads(raw)
+    except (binascii.Error, UnicodeError, ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(values, list):
+        raise ValueError("Invalid cursor")
+    return values
+
+
+def is_cursor_id(value):
+    return isinstance(value, (ObjectId, str))
+
+
+def keyset_filter(cursor, field="timestamp"):
+    """
+    Filtro para a próxima página em ordem decrescente de (field, _id). Os
+    valores do cursor vêm do cliente: só datas, números, ObjectIds e
+    strings são aceitos, nunca documentos que o MongoDB leria como
+    operadores.
+    """
+    if not cursor:
+        return {}
+    values = decode_cursor(cursor)
+    if len(values) != 2:
+        raise ValueError("Invalid cursor")
+    value, last_id = values
+    if isinstance(value, bool) or not isinstance(value, (datetime, int, float)) or not is_cursor_id(last_id):
+        raise ValueError("Invalid cursor")
+    return {"$or": [
+        {field: {"$lt": value}},
+        {field: value, "_id": {"$lt": last_id}},
+    ]}
+
+
+def page_size(limit, default=20):
+    if limit is None or limit < 1:
+        return default
+    return min(limit, MAX_PAGE_SIZE)
+
+
+def paginate(documents, limit, field="timestamp"):
+    """
+    Recebe até limit + 1 documentos e devolve (página, próximo cursor).
+    """
+    documents = list(documents)
+    if len(documents) <= limit:
+        return documents, None
+    page = documents[:limit]
+    last = page[-1]
+    return page, encode_cursor(last[field], last["_id"])
@@ -0,0 +1,80 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+import bcrypt
+from flask import current_app
+
+
+class HasherBusy(Exception):
+    """
+    A fila de hashing está cheia; a requisição deve ser recusada em vez de
+    esperar e segurar o worker.
+    """
+
+
+class PasswordHasher:
+    """
+    Executa bcrypt num pool dedicado e limitado (o bcrypt libera o GIL),
+    com limite de tarefas em espera e custo configurável.
+    """
+    _instance = None
+    _pid = None
+    _lock = threading.Lock()
+
+    def __init__(self, rounds=12, workers=4, max_pending=64, timeout=10):
+        self.rounds = rounds
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='bcrypt')
+        self._slots = threading.BoundedSemaphore(workers + max_pending)
+
+    @classmethod
+    def instance(cls):
+        if cls._instance is None or cls._pid != os.getpid():
+            with cls._lock:
+                if cls._instance is None or cls._pid != os.getpid():
+                    config = current_app.config
+                    cls._instance = cls(
+                        rounds=config.get('BCRYPT_ROUNDS', 12),
+                        workers=config.get('BCRYPT_WORKERS', 4),
+                        max_pending=config.get('BCRYPT_MAX_PENDING', 64),
+                        timeout=config.get('BCRYPT_TIMEOUT', 10),
+                    )
+                    cls._pid = os.getpid()
+        return cls._instance
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise HasherBusy("Too many password operations in progress")
+
+        def task():
+            try:
+                return fn(*args)
+            finally:
+                self._slots.release()
+
+        try:
+            future = self._executor.submit(task)
+        except Exception:
+            self._slots.release()
+            raise
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            # Ainda na fila: cancela e devolve a vaga, que task não vai liberar.
+            if future.cancel():
+                self._slots.release()
+            raise HasherBusy("Password operation timed out")
+
+    def hash(self, password):
+        salt = bcrypt.gensalt(rounds=self.rounds)
+        return self._run(bcrypt.hashpw, password.encode('utf-8'), salt).decode('utf-8')
+
+    def verify(self, password, hashed):
+        return self._run(bcrypt.checkpw, password.encode('utf-8'), hashed.encode('utf-8'))
+
+    def needs_rehash(self, hashed):
+        # Formato: $2b$<custo>$<salt+hash>
+        try:
+            return int(hashed.split('$')[2]) < self.rounds
+        except (IndexError, ValueError):
+            return True
@@ -1,21 +1,59 @@
+import os
+import threading
 from pymongo import MongoClient
 from flask import current_app
+from app.utils.metrics import MongoCommandTimer
 
 
 class PersistenceManager:
+    """
+    Um MongoClient (e seu pool de conexões) por processo, criado sob demanda.
+    Depois de um fork o processo filho cria o próprio cliente em vez de
+    reaproveitar os sockets herdados do pai.
+    """
     _client = None
     _db = None
+    _pid = None
+    _lock = threading.Lock()
 
     @staticmethod
-    def get_database():
-        if not PersistenceManager._client:
-            PersistenceManager._client = MongoClient(current_app.config['MONGO_URI'])
-            PersistenceManager._db = PersistenceManager._client.get_database()
+    def client_options(config):
+        options = {
+            "maxPoolSize": config.get('MONGO_MAX_POOL_SIZE', 100),
+            "minPoolSize": config.get('MONGO_MIN_POOL_SIZE', 0),
+            "maxIdleTimeMS": config.get('MONGO_MAX_IDLE_TIME_MS'),
+            "connectTimeoutMS": config.get('MONGO_CONNECT_TIMEOUT_MS', 5000),
+            "socketTimeoutMS": config.get('MONGO_SOCKET_TIMEOUT_MS'),
+            "serverSelectionTimeoutMS": config.get('MONGO_SERVER_SELECTION_TIMEOUT_MS', 5000),
+            "waitQueueTimeoutMS": config.get('MONGO_WAIT_QUEUE_TIMEOUT_MS'),
+        }
+        if config.get('MONGO_COMPRESSORS'):
+            options["compressors"] = config['MONGO_COMPRESSORS']
+        if config.get('METRICS_ENABLED', True):
+            options["event_listeners"] = [MongoCommandTimer()]
+        return {name: value for name, value in options.items() if value is not None}
+
+    @staticmethod
+    def get_database(config=None):
+        """
+        Banco do cliente do processo. config só é lido na criação do
+        cliente; quem roda fora do contexto de aplicação passa a config.
+        """
+        if PersistenceManager._client is None or PersistenceManager._pid != os.getpid():
+            with PersistenceManager._lock:
+                if PersistenceManager._client is None or PersistenceManager._pid != os.getpid():
+                    config = config if config is not None else current_app.config
+                    PersistenceManager._client = MongoClient(
+                        config['MONGO_URI'], connect=False, **PersistenceManager.client_options(config))
+                    PersistenceManager._db = PersistenceManager._client.get_database()
+                    PersistenceManager._pid = os.getpid()
         return PersistenceManager._db
 
     @staticmethod
     def close_connection():
-        if PersistenceManager._client:
-            PersistenceManager._client.close()
+        with PersistenceManager._lock:
+            if PersistenceManager._client and PersistenceManager._pid == os.getpid():
+                PersistenceManager._client.close()
             PersistenceManager._client = None
             PersistenceManager._db = None
+            PersistenceManager._pid = None
@@ -1,14 +1,26 @@
+import hashlib
 from datetime import datetime, timedelta
 from app.utils.persistence_manager import PersistenceManager
 
 class TokenManager:
+    """
+    Os refresh tokens são guardados apenas como hash SHA-256 (token_hash,
+    índice único) e expiram sozinhos pelo índice TTL em exp.
+    """
+
+    @staticmethod
+    def hash_token(refresh_token):
+        return hashlib.sha256(refresh_token.encode('utf-8')).hexdigest()
+
     @staticmethod
     def invalidate_tokens_for_user(username):
         """
-        Invalida todos os tokens de refresh de um usuário.
+        Invalida todos os tokens de refresh de um usuário, inclusive os do
+        Spotify guardados pelo SpotifyTokenVault.
         """
         db = PersistenceManager.get_database()
         db.refresh_tokens.delete_many({"username": username})
+        db.spotify_tokens.delete_one({"_id": username})
 
     @staticmethod
     def store_refresh_token(username, refresh_token):
@@ -18,23 +30,25 @@ class TokenManager:
         db = PersistenceManager.get_database()
         db.refresh_tokens.update_one(
             {"username": username},
-            {"$set": {"refresh_token": refresh_token,
+            {"$set": {"token_hash": TokenManager.hash_token(refresh_token),
                       "exp": datetime.utcnow() + timedelta(days=7)}},
             upsert=True
         )
 
     @staticmethod
-    def delete_refresh_token(refresh_token):
+    def find_refresh_token(refresh_token):
         """
-        Deleta um refresh token específico.
+        Busca um refresh token válido. O filtro em exp cobre o intervalo
+        entre a expiração e a remoção pelo monitor de TTL do MongoDB.
         """
         db = PersistenceManager.get_database()
-        db.refresh_tokens.delete_one({"refresh_token": refresh_token})
+        return db.refresh_tokens.find_one(
+            {"token_hash": TokenManager.hash_token(refresh_token), "exp": {"$gte": datetime.utcnow()}})
 
     @staticmethod
-    def cleanup_expired_tokens():
+    def delete_refresh_token(refresh_token):
         """
-        Limpa todos os refresh tokens expirados.
+        Deleta um refresh token específico.
         """
         db = PersistenceManager.get_database()
-        db.refresh_tokens.delete_many({"exp": {"$lt": datetime.utcnow()}})
+        db.refresh_tokens.delete_one({"token_hash": TokenManager.hash_token(refresh_token)})
@@ -0,0 +1,122 @@
+import json
+import random
+import re
+import time
+from urllib.parse import parse_qs, urlsplit
+from requests import Response
+from requests.adapters import BaseAdapter
+
+API_PREFIX = "https://api.spotify.com/"
+
+
+class FakeSpotifyAdapter(BaseAdapter):
+    """
+    Transporte falso da API do Spotify para benchmarks: montado na sessão
+    do SpotifyClientFactory, responde no formato da API depois de uma
+    latência injetada. Tudo acima do HTTP (PooledSpotify, SpotifyGuard,
+    métricas) roda como em produção.
+    """
+
+    def __init__(self, latency=0.05, jitter=0.02):
+        super().__init__()
+        self.latency = latency
+        self.jitter = jitter
+        self.routes = [
+            (re.compile(r"^/v1/users/([^/]+)$"), self.user),
+            (re.compile(r"^/v1/albums/?$"), self.albums),
+            (re.compile(r"^/v1/albums/([^/]+)$"), self.album),
+            (re.compile(r"^/v1/artists/([^/]+)/albums$"), self.artist_albums),
+            (re.compile(r"^/v1/artists/([^/]+)$"), self.artist),
+            (re.compile(r"^/v1/search$"), self.search),
+            (re.compile(r"^/v1/me/player/recently-played$"), self.recently_played),
+            (re.compile(r"^/v1/me/player/currently-playing$"), self.currently_playing),
+            (re.compile(r"^/v1/me/top/artists$"), self.top_artists),
+            (re.compile(r"^/v1/me/albums$"), self.saved_albums),
+        ]
+
+    def send(self, request, **kwargs):
+        time.sleep(max(0, self.latency + random.uniform(-self.jitter, self.jitter)))
+        url = urlsplit(request.url)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        status, payload = 404, {"error": {"status": 404, "message": "Service not found"}}
+        for pattern, handler in self.routes:
+            match = pattern.match(url.path)
+            if match:
+                status, payload = 200, handler(params, *match.groups())
+                break
+
+        response = Response()
+        response.status_code = status
+        response.headers["Content-Type"] = "application/json"
+        response._content = json.dumps(payload).encode("utf-8")
+        response.encoding = "utf-8"
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self):
+        pass
+
+    @staticmethod
+    def _images(seed):
+        return [{"url": f"https://i.example.com/{seed}/{size}.jpg", "height": size, "width": size}
+                for size in (640, 300, 64)]
+
+    def _album(self, album_id):
+        return {
+            "id": album_id,
+            "name": f"Album {album_id}",
+            "album_type": "album",
+            "artists": [{"id": f"artist{album_id}", "name": f"Artist {album_id}"}],
+            "release_date": "2020-01-01",
+            "total_tracks": 12,
+            "images": self._images(album_id),
+            "available_markets": ["BR", "US", "GB", "DE", "FR"] * 20,
+            "external_urls": {"spotify": f"https://open.spotify.com/album/{album_id}"},
+        }
+
+    def _track(self, index):
+        return {"id": f"track{index}", "name": f"Track {index}", "album": self._album(f"album{index}")}
+
+    @staticmethod
+    def _limit(params, default):
+        return int(params.get("limit", default))
+
+    def user(self, params, spotify_id):
+        return {"id": spotify_id, "display_name": f"User {spotify_id}", "images": self._images(spotify_id)}
+
+    def album(self, params, album_id):
+        return self._album(album_id)
+
+    def albums(self, params):
+        return {"albums": [self._album(album_id) for album_id in params.get("ids", "").split(",") if album_id]}
+
+    def artist(self, params, artist_id):
+        return {"id": artist_id, "name": f"Artist {artist_id}", "images": self._images(artist_id)}
+
+    def artist_albums(self, params, artist_id):
+        return {"items": [self._album(f"{artist_id}x{i}") for i in range(self._limit(params, 20))]}
+
+    def search(self, params):
+        q, limit, kinds = params.get("q", ""), self._limit(params, 10), params.get("type", "track")
+        results = {}
+        if "album" in kinds:
+            results["albums"] = {"items": [self._album(f"{q}x{i}") for i in range(limit)]}
+        if "artist" in kinds:
+            results["artists"] = {"items": [
+                {"id": f"{q}x{i}", "name": f"{q} {i}", "images": self._images(q)} for i in range(limit)]}
+        return results
+
+    def recently_played(self, params):
+        return {"items": [{"track": self._track(i), "played_at": "2024-01-01T00:00:00Z"}
+                          for i in range(self._limit(params, 50))]}
+
+    def currently_playing(self, params):
+        return {"is_playing": True, "item": self._track(0)}
+
+    def top_artists(self, params):
+        return {"items": [{"id": f"top{i}", "name": f"Top {i}", "images": self._images(i)}
+                          for i in range(self._limit(params, 20))]}
+
+    def saved_albums(self, params):
+        return {"items": [{"album": self._album(f"saved{i}")} for i in range(self._limit(params, 20))]}
@@ -0,0 +1,272 @@
+"""
+Benchmark dos endpoints com um Mongo local e um Spotify falso.
+
+    python -m benchmarks.run --users 1000 --reviews 20000 --save-baseline
+    python -m benchmarks.run --compare benchmarks/baseline.json
+
+Por padrão usa MONGO_URI (ou mongodb://localhost:27017/groovesync_bench);
+com --store mongomock roda em memória, se o pacote mongomock existir.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+import jwt
+from benchmarks.fake_spotify import API_PREFIX, FakeSpotifyAdapter
+from benchmarks.seed import BENCH_PASSWORD, seed
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+
+def build_app(args):
+    os.environ.setdefault("MONGO_URI", args.mongo_uri)
+    os.environ.setdefault("SPOTIFY_CLIENT_ID", "benchmark")
+    os.environ.setdefault("SPOTIFY_CLIENT_SECRET", "benchmark")
+    os.environ.setdefault("SPOTIFY_REDIRECT_URI", "http://localhost/callback")
+
+    from app import create_app, limiter
+    from app.services.spotify import SpotifyClientFactory
+    from app.utils.persistence_manager import PersistenceManager
+
+    app = create_app()
+    app.config['MONGO_URI'] = args.mongo_uri
+    app.config['BCRYPT_ROUNDS'] = 4
+    limiter.enabled = False
+
+    if args.store == "mongomock":
+        import mongomock
+        client = mongomock.MongoClient()
+        PersistenceManager._client = client
+        PersistenceManager._db = client.get_database("groovesync_bench")
+        PersistenceManager._pid = os.getpid()
+
+    # Só o transporte é falso: clientes, guard, métricas e sessão são os de produção.
+    with app.app_context():
+        SpotifyClientFactory.session().mount(
+            API_PREFIX, FakeSpotifyAdapter(latency=args.spotify_latency, jitter=args.spotify_jitter))
+    return app
+
+
+def issue_refresh_tokens(app, count):
+    from app.utils.token_manager import TokenManager
+
+    tokens = []
+    for index in range(count):
+        token = jwt.encode({"username": f"user{index}", "exp": datetime.utcnow() + timedelta(days=7)},
+                           app.config['SECRET_KEY'], algorithm="HS256")
+        TokenManager.store_refresh_token(f"user{index}", token)
+        tokens.append(token)
+    return tokens
+
+
+def scenarios(app, data, rng):
+    """
+    Um cenário por rota relevante de cada blueprint: (nome, função que
+    devolve os argumentos de client.open).
+    """
+    secret = app.config['SECRET_KEY']
+    exp = datetime.utcnow() + timedelta(hours=1)
+
+    def token_for(index):
+        return jwt.encode({"username": f"user{index}", "exp": exp}, secret, algorithm="HS256")
+
+    users = len(data["user_ids"])
+    refresh_tokens = data["refresh_tokens"]
+
+    def auth_headers():
+        index = rng.randrange(users)
+        return index, {"Authorization": f"Bearer {token_for(index)}", "Spotify-Token": "benchmark"}
+
+    def login():
+        return {"method": "POST", "path": "/auth/login",
+                "json": {"username": f"user{rng.randrange(users)}", "password": BENCH_PASSWORD}}
+
+    def refresh():
+        return {"method": "POST", "path": "/auth/refresh",
+                "json": {"refresh_token": rng.choice(refresh_tokens)}}
+
+    def user_search():
+        _, headers = auth_headers()
+        return {"method": "GET", "path": f"/user/search?q=user{rng.randrange(users) // 10}", "headers": headers}
+
+    def user_list():
+        _, headers = auth_headers()
+        return {"method": "GET", "path": "/user/users?limit=100", "headers": headers}
+
+    def album_details():
+        index, headers = auth_headers()
+        # Os primeiros álbuns concentram as avaliações.
+        album_id = data["album_ids"][min(int(rng.paretovariate(1.2)) - 1, len(data["album_ids"]) - 1)]
+        return {"method": "GET", "path": f"/spotify/albums/{album_id}", "headers": headers,
+                "json": {"user_id": data["user_ids"][index]}}
+
+    def artist():
+        _, headers = auth_headers()
+        return {"method": "GET", "path": f"/spotify/artist/artist{rng.randrange(50)}", "headers": headers}
+
+    def search():
+        _, headers = auth_headers()
+        return {"method": "GET", "path": f"/spotify/search?q=query{rng.randrange(100)}&limit=10",
+                "headers": headers}
+
+    def dashboard():
+        _, headers = auth_headers()
+        return {"method": "GET", "path": "/spotify/dashboard", "headers": headers}
+
+    def reviews_by_user():
+        user_id = data["user_ids"][rng.randrange(users)]
+        return {"method": "GET", "path": f"/review/get/{user_id}?limit=20"}
+
+    def save_review():
+        user_id = data["user_ids"][rng.randrange(users)]
+        return {"method": "POST", "path": "/review/save",
+                "json": {"userId": user_id, "albumId": rng.choice(data["album_ids"]),
+                         "rate": rng.randint(0, 5), "text": "Benchmark"}}
+
+    # auth.refresh vem antes de auth.login, que troca o refresh token salvo.
+    return [
+        ("auth.refresh", refresh),
+        ("auth.login", login),
+        ("user.search", user_search),
+        ("user.users", user_list),
+        ("spotify.album_details", album_details),
+        ("spotify.artist", artist),
+        ("spotify.search", search),
+        ("spotify.dashboard", dashboard),
+        ("review.get", reviews_by_user),
+        ("review.save", save_review),
+    ]
+
+
+def percentile(samples, fraction):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def run_scenario(app, build_request, requests, concurrency):
+    latencies, statuses = [], {}
+    lock = threading.Lock()
+    per_worker = max(1, requests // concurrency)
+
+    def worker():
+        client = app.test_client()
+        local_latencies, local_statuses = [], {}
+        for _ in range(per_worker):
+            kwargs = build_request()
+            started = time.perf_counter()
+            try:
+                status = client.open(kwargs.pop("path"), **kwargs).status_code
+            except Exception as e:
+                # Falha do cliente (ex.: corpo não serializável): não é amostra.
+                status = type(e).__name__
+            else:
+                local_latencies.append((time.perf_counter() - started) * 1000)
+            local_statuses[status] = local_statuses.get(status, 0) + 1
+        with lock:
+            latencies.extend(local_latencies)
+            for status, count in local_statuses.items():
+                statuses[status] = statuses.get(status, 0) + count
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    statuses = {str(status): count for status, count in sorted(statuses.items(), key=lambda item: str(item[0]))}
+    if not latencies:
+        return {"requests": 0, "statuses": statuses}
+    return {
+        "requests": len(latencies),
+        "throughput_rps": round(len(latencies) / elapsed, 2),
+        "p50_ms": round(percentile(latencies, 0.50), 2),
+        "p95_ms": round(percentile(latencies, 0.95), 2),
+        "p99_ms": round(percentile(latencies, 0.99), 2),
+        "mean_ms": round(statistics.fmean(latencies), 2),
+        "statuses": statuses,
+    }
+
+
+def compare(results, baseline, tolerance):
+    """
+    Lista os cenários cujo p95 piorou mais que tolerance em relação à base.
+    """
+    regressions = []
+    for name, result in results.items():
+        previous = baseline.get("results", {}).get(name)
+        if not previous or not result["requests"] or not previous.get("requests"):
+            continue
+        if result["p95_ms"] > previous["p95_ms"] * (1 + tolerance):
+            regressions.append((name, previous["p95_ms"], result["p95_ms"]))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark dos endpoints do backend")
+    parser.add_argument("--mongo-uri", default=os.getenv("MONGO_URI", "mongodb://localhost:27017/groovesync_bench"))
+    parser.add_argument("--store", choices=["mongo", "mongomock"], default="mongo")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--albums", type=int, default=200)
+    parser.add_argument("--reviews", type=int, default=20000)
+    parser.add_argument("--requests", type=int, default=500, help="Requisições por cenário")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--spotify-latency", type=float, default=0.05, help="Latência do Spotify falso (s)")
+    parser.add_argument("--spotify-jitter", type=float, default=0.02)
+    parser.add_argument("--only", action="append", help="Roda só os cenários informados")
+    parser.add_argument("--save-baseline", nargs="?", const=DEFAULT_BASELINE)
+    parser.add_argument("--compare", nargs="?", const=DEFAULT_BASELINE)
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Piora aceitável do p95 (fração)")
+    args = parser.parse_args(argv)
+
+    app = build_app(args)
+    rng = random.Random(7)
+    with app.app_context():
+        data = seed(args.users, args.albums, args.reviews)
+        data["refresh_tokens"] = issue_refresh_tokens(app, min(args.users, 100))
+
+    results = {}
+    for name, build_request in scenarios(app, data, rng):
+        if args.only and name not in args.only:
+            continue
+        results[name] = run_scenario(app, build_request, args.requests, args.concurrency)
+        result = results[name]
+        if not result["requests"]:
+            print(f"{name:24} skipped: no successful samples  {result['statuses']}")
+            continue
+        print(f"{name:24} {result['throughput_rps']:>9} req/s  p50 {result['p50_ms']:>8} ms  "
+              f"p95 {result['p95_ms']:>8} ms  p99 {result['p99_ms']:>8} ms  {result['statuses']}")
+
+    report = {
+        "created_at": datetime.utcnow().isoformat(),
+        "params": {key: value for key, value in vars(args).items()
+                   if key not in ("save_baseline", "compare", "only")},
+        "results": results,
+    }
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as baseline_file:
+            json.dump(report, baseline_file, indent=2)
+        print(f"Baseline saved to {args.save_baseline}")
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            regressions = compare(results, json.load(baseline_file), args.tolerance)
+        for name, before, after in regressions:
+            print(f"REGRESSION {name}: p95 {before} ms -> {after} ms")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
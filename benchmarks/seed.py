@@ -0,0 +1,64 @@
+import random
+from datetime import datetime, timedelta
+import bcrypt
+from app.models.album_stats import AlbumStats
+from app.models.user import User
+from app.utils.migrations import migrate
+from app.utils.persistence_manager import PersistenceManager
+
+BENCH_PASSWORD = "benchmark"
+COLLECTIONS = ("users", "reviews", "album_stats", "user_stats", "refresh_tokens", "catalog_cache",
+               "spotify_rate_windows", "migrations")
+
+
+def seed(users=1000, albums=200, reviews=20000, batch_size=1000, rng=None):
+    """
+    Recria as coleções com dados sintéticos. Deve rodar dentro de um
+    app context; devolve os ids gerados para os cenários do benchmark.
+    """
+    rng = rng or random.Random(42)
+    db = PersistenceManager.get_database()
+    for collection in COLLECTIONS:
+        db.drop_collection(collection)
+    migrate(db)
+
+    password = bcrypt.hashpw(BENCH_PASSWORD.encode('utf-8'), bcrypt.gensalt(rounds=4)).decode('utf-8')
+    user_docs = [{
+        "username": f"user{i}",
+        "password": password,
+        "spotify_id": f"spotify{i}",
+        **User.search_fields(f"user{i}"),
+    } for i in range(users)]
+    user_ids = []
+    for start in range(0, len(user_docs), batch_size):
+        user_ids.extend(db.users.insert_many(user_docs[start:start + batch_size]).inserted_ids)
+    # _id é ObjectId, como em produção; nas avaliações e nas rotas o id
+    # trafega como string, que é o que Review.save grava em userId.
+    user_ids = [str(user_id) for user_id in user_ids]
+
+    album_ids = [f"album{i}" for i in range(albums)]
+    now = datetime.utcnow()
+    seen = set()
+    batch = []
+    for _ in range(reviews):
+        user_id = rng.choice(user_ids)
+        # Álbuns populares concentram a maior parte das avaliações.
+        album_id = album_ids[min(int(rng.paretovariate(1.2)) - 1, albums - 1)]
+        if (album_id, user_id) in seen:
+            continue
+        seen.add((album_id, user_id))
+        batch.append({
+            "userId": user_id,
+            "albumId": album_id,
+            "rate": rng.randint(0, 5),
+            "text": "Benchmark review",
+            "timestamp": now - timedelta(minutes=rng.randint(0, 60 * 24 * 365)),
+        })
+        if len(batch) >= batch_size:
+            db.reviews.insert_many(batch)
+            batch = []
+    if batch:
+        db.reviews.insert_many(batch)
+
+    AlbumStats.rebuild()
+    return {"user_ids": user_ids, "album_ids": album_ids}
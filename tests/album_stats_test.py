@@ -0,0 +1,187 @@
+import math
+import os
+import unittest
+import uuid
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock, patch
+from flask import Flask
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+from app.models.album_stats import AlbumStats, _logsumexp
+from app.models.review import Review
+
+try:
+    import mongomock
+except ImportError:  # pragma: no cover - depende do ambiente
+    mongomock = None
+
+
+def mongo_database(test):
+    """
+    Banco de teste: o mongod de MONGO_TEST_URI, se houver, ou o mongomock.
+    Pula o teste quando nenhum dos dois está disponível.
+    """
+    name = f"groovesync_test_{uuid.uuid4().hex}"
+    uri = os.getenv("MONGO_TEST_URI")
+    if uri:
+        client = MongoClient(uri, serverSelectionTimeoutMS=2000)
+        try:
+            client.admin.command("ping")
+        except PyMongoError:
+            client.close()
+        else:
+            test.addCleanup(client.close)
+            test.addCleanup(client.drop_database, name)
+            return client[name]
+    if mongomock is None:
+        test.skipTest("MONGO_TEST_URI is not reachable and mongomock is not installed")
+    return mongomock.MongoClient().get_database(name)
+
+
+class AlbumRankingTest(unittest.TestCase):
+
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config.update(LEADERBOARD_PRIOR_COUNT=10, LEADERBOARD_PRIOR_MEAN=2.5,
+                               TRENDING_HALF_LIFE_HOURS=24)
+        context = self.app.app_context()
+        context.push()
+        self.addCleanup(context.pop)
+
+    def test_bayesian_score_favours_more_reviews(self):
+        few = AlbumStats.score(2, 10)
+        many = AlbumStats.score(200, 940)
+
+        self.assertLess(few, many)
+        self.assertAlmostEqual(few, (25 + 10) / 12)
+        self.assertIsNone(AlbumStats.score(0, 0))
+
+    def test_trend_matches_decayed_activity(self):
+        now = datetime(2025, 3, 1)
+        recent = [now - timedelta(hours=1)]
+        older = [now - timedelta(hours=30), now - timedelta(hours=40)]
+
+        def trend(timestamps):
+            return _logsumexp([AlbumStats.trend_point(t) for t in timestamps])
+
+        def decayed(timestamps):
+            return sum(0.5 ** ((now - t).total_seconds() / 86400) for t in timestamps)
+
+        self.assertGreater(decayed(recent), decayed(older))
+        self.assertGreater(trend(recent), trend(older))
+        self.assertAlmostEqual(trend(recent) - trend(older), math.log(decayed(recent) / decayed(older)))
+
+    @patch("app.models.album_stats.PersistenceManager.get_database")
+    def test_record_review_updates_score_in_same_command(self, mock_get_database):
+        db = MagicMock()
+        mock_get_database.return_value = db
+
+        AlbumStats.record_review("a1", 4, datetime(2025, 3, 1))
+
+        pipeline = db.album_stats.update_one.call_args[0][1]
+        self.assertIn("trend", pipeline[0]["$set"])
+        self.assertIn("score", pipeline[1]["$set"])
+        self.assertTrue(db.album_stats.update_one.call_args[1]["upsert"])
+
+
+class AlbumStatsAggregatesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.app = Flask(__name__)
+        context = self.app.app_context()
+        context.push()
+        self.addCleanup(context.pop)
+        self.db = mongo_database(self)
+        patcher = patch("app.utils.persistence_manager.PersistenceManager.get_database", return_value=self.db)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def stats(self):
+        return AlbumStats.get("a1")
+
+    def test_insert_change_and_delete_keep_aggregates(self):
+        AlbumStats.record_review("a1", 4, datetime(2025, 3, 1))
+        AlbumStats.record_review("a1", 2, datetime(2025, 3, 2))
+
+        stats = self.stats()
+        self.assertEqual((stats["count"], stats["sum"]), (2, 6))
+        self.assertEqual(stats["histogram"], {"4": 1, "2": 1})
+        self.assertEqual(stats["last_review_at"], datetime(2025, 3, 2))
+        self.assertEqual(AlbumStats.overall_rating(stats), 3.0)
+
+        AlbumStats.change_rating("a1", 2, 5)
+
+        stats = self.stats()
+        self.assertEqual((stats["count"], stats["sum"]), (2, 9))
+        self.assertEqual(stats["histogram"], {"4": 1, "2": 0, "5": 1})
+        self.assertEqual(AlbumStats.overall_rating(stats), 4.5)
+
+        self.db.reviews.insert_one({"albumId": "a1", "userId": "u1", "rate": 4, "timestamp": datetime(2025, 3, 1)})
+        AlbumStats.remove_review("a1", 5, datetime(2025, 3, 2))
+
+        stats = self.stats()
+        self.assertEqual((stats["count"], stats["sum"]), (1, 4))
+        self.assertEqual(stats["last_review_at"], datetime(2025, 3, 1))
+        self.assertEqual(AlbumStats.overall_rating(stats), 4.0)
+        self.assertEqual(stats["version"], 4)
+
+    def test_removing_last_review_clears_rating(self):
+        AlbumStats.record_review("a1", 3, datetime(2025, 3, 1))
+        AlbumStats.remove_review("a1", 3, datetime(2025, 3, 1))
+
+        stats = self.stats()
+        self.assertEqual(stats["count"], 0)
+        self.assertIsNone(AlbumStats.overall_rating(stats))
+        self.assertIsNone(stats.get("score"))
+        self.assertIsNone(stats.get("trend"))
+        self.assertNotIn("last_review_at", stats)
+
+    def test_overall_rating_without_reviews(self):
+        self.assertIsNone(AlbumStats.overall_rating(None))
+        self.assertIsNone(AlbumStats.overall_rating({"count": 0, "sum": 0}))
+        self.assertEqual(AlbumStats.overall_rating({"count": 3, "sum": 10}), 3.3)
+
+
+class ReviewTrendTest(unittest.TestCase):
+
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config.update(TRENDING_HALF_LIFE_HOURS=24, TRENDING_WINDOW_DAYS=7)
+        context = self.app.app_context()
+        context.push()
+        self.addCleanup(context.pop)
+        self.db = mongo_database(self)
+        self.db.users.insert_many([{"_id": "u1"}, {"_id": "u2"}])
+        patcher = patch("app.utils.persistence_manager.PersistenceManager.get_database", return_value=self.db)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def save(self, user_id, rate, timestamp):
+        review = Review(user_id=user_id, rate=rate, album_id="a1")
+        review.timestamp = timestamp
+        return review.save()
+
+    def test_save_resave_then_delete_keeps_trend(self):
+        first = datetime(2025, 3, 1)
+        other = first - timedelta(hours=2)
+        resaved = first + timedelta(hours=48)
+        self.save("u2", 3, other)
+        review_id = self.save("u1", 4, first)
+        self.assertEqual(self.save("u1", 5, resaved), review_id)
+
+        stats = AlbumStats.get("a1")
+        expected = _logsumexp([AlbumStats.trend_point(other), AlbumStats.trend_point(resaved)])
+        self.assertAlmostEqual(stats["trend"], expected)
+        self.assertEqual(stats["last_review_at"], resaved)
+        self.assertEqual((stats["count"], stats["sum"]), (2, 8))
+
+        Review.delete(review_id)
+
+        stats = AlbumStats.get("a1")
+        self.assertAlmostEqual(stats["trend"], AlbumStats.trend_point(other))
+        self.assertEqual(stats["last_review_at"], other)
+        self.assertEqual((stats["count"], stats["sum"]), (1, 3))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,7 +1,9 @@
 import unittest
-from unittest.mock import patch
+from unittest.mock import MagicMock, patch
 from flask import Flask
 from app.routes.auth import bp
+from app.utils.password_hasher import HasherBusy
+import jwt
 
 
 class AuthRoutesTest(unittest.TestCase):
@@ -36,6 +38,17 @@ class AuthRoutesTest(unittest.TestCase):
         self.assertEqual(response.status_code, 401)
         self.assertEqual(response.json["message"], "Invalid username or password")
 
+    @patch("app.models.user.User.find_user_by_credentials")
+    def test_login_hasher_busy(self, mock_find_user):
+        mock_find_user.side_effect = HasherBusy("Too many password operations in progress")
+        response = self.client.post("/auth/login", json={
+            "username": "testuser",
+            "password": "testpass"
+        })
+
+        self.assertEqual(response.status_code, 503)
+        self.assertFalse(response.json["success"])
+
     def test_login_missing_fields(self):
         response = self.client.post("/auth/login", json={
             "username": "testuser"
@@ -67,6 +80,45 @@ class AuthRoutesTest(unittest.TestCase):
         self.assertEqual(response.status_code, 409)
         self.assertEqual(response.json["message"], "Username already exists")
 
+    @patch("app.utils.token_manager.TokenManager.find_refresh_token")
+    def test_refresh_success(self, mock_find_token):
+        refresh_token = jwt.encode({"username": "testuser"}, self.app.config['SECRET_KEY'], algorithm="HS256")
+        mock_find_token.return_value = {"username": "testuser"}
+        response = self.client.post("/auth/refresh", json={"refresh_token": refresh_token})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("token", response.json)
+        mock_find_token.assert_called_once_with(refresh_token)
+
+    @patch("app.utils.token_manager.TokenManager.find_refresh_token")
+    def test_refresh_unknown_token(self, mock_find_token):
+        mock_find_token.return_value = None
+        response = self.client.post("/auth/refresh", json={"refresh_token": "unknown"})
+
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json["message"], "Invalid or expired refresh token")
+
+    @patch("app.routes.auth.SpotifyTokenVault.instance")
+    @patch("app.routes.auth.TokenManager.store_refresh_token")
+    @patch("app.models.user.PersistenceManager.get_database")
+    @patch("app.routes.auth.requests")
+    def test_login_spotify_without_display_name(self, mock_requests, mock_get_database, mock_store, mock_vault):
+        self.app.config.update(SPOTIFY_REDIRECT_URI="http://localhost/callback",
+                               SPOTIFY_CLIENT_ID="id", SPOTIFY_CLIENT_SECRET="secret")
+        mock_requests.post.return_value = MagicMock(status_code=200, json=lambda: {
+            "access_token": "access", "refresh_token": "refresh", "expires_in": 3600})
+        mock_requests.get.return_value = MagicMock(status_code=200, json=lambda: {
+            "id": "spotify-id", "display_name": None, "images": []})
+        db = mock_get_database.return_value
+        db.users.find_one.return_value = None
+
+        response = self.client.post("/auth/login/spotify", json={"code": "abc"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json["user_info"]["username"], "spotify-id")
+        self.assertEqual(db.users.insert_one.call_args[0][0]["username_lower"], "spotify-id")
+        mock_vault.return_value.store.assert_called_once_with("spotify-id", "access", "refresh", 3600, None)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,51 @@
+import threading
+import time
+import unittest
+from app.utils.cache import SingleFlight, TTLCache
+
+
+class TTLCacheTest(unittest.TestCase):
+
+    def test_entries_expire(self):
+        cache = TTLCache(ttl=0.05)
+        cache.set("key", "value")
+        self.assertEqual(cache.get("key"), "value")
+
+        time.sleep(0.06)
+        self.assertIsNone(cache.get("key"))
+
+
+class SingleFlightTest(unittest.TestCase):
+
+    def test_concurrent_calls_share_one_execution(self):
+        flight = SingleFlight()
+        calls = []
+        release = threading.Event()
+
+        def load():
+            calls.append(1)
+            release.wait()
+            return "result"
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(flight.do("key", load))) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.05)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ["result"] * 5)
+
+    def test_error_is_not_cached(self):
+        flight = SingleFlight()
+
+        with self.assertRaises(ValueError):
+            flight.do("key", lambda: (_ for _ in ()).throw(ValueError("boom")))
+        self.assertEqual(flight.do("key", lambda: "ok"), "ok")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+import unittest
+from unittest.mock import Mock
+from app.services.catalog_cache import CatalogCache, MemoryBackend
+from app.services.rate_limit import SpotifyUnavailable
+
+
+class CatalogCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = CatalogCache([MemoryBackend(maxsize=2)])
+
+    def test_get_or_fetch_counts_hits_and_misses(self):
+        fetch = Mock(return_value={"name": "Album"})
+
+        self.assertEqual(self.cache.get_or_fetch("album", "1", fetch), {"name": "Album"})
+        self.assertEqual(self.cache.get_or_fetch("album", "1", fetch), {"name": "Album"})
+
+        fetch.assert_called_once()
+        self.assertEqual(self.cache.stats(), {"album": {"hits": 1, "misses": 1, "stale": 0}})
+
+    def test_evicts_least_recently_used(self):
+        self.cache.set("album", "1", "a")
+        self.cache.set("album", "2", "b")
+        self.cache.get("album", "1")
+        self.cache.set("album", "3", "c")
+
+        self.assertEqual(self.cache.get("album", "1"), "a")
+        self.assertIsNone(self.cache.get("album", "2"))
+
+    def test_lower_tier_hit_fills_upper_tier(self):
+        upper, lower = MemoryBackend(), MemoryBackend()
+        cache = CatalogCache([upper, lower])
+        lower.set("artist:1", "artist", 60)
+
+        self.assertEqual(cache.get("artist", "1"), "artist")
+        self.assertEqual(upper.get("artist:1"), "artist")
+
+    def test_get_many_fetches_only_missing_keys(self):
+        self.cache.set("user", "a", {"id": "a"})
+        fetch_many = Mock(return_value={"b": {"id": "b"}})
+
+        result = self.cache.get_many("user", ["a", "b", "b"], fetch_many)
+
+        fetch_many.assert_called_once_with(["b"])
+        self.assertEqual(result, {"a": {"id": "a"}, "b": {"id": "b"}})
+
+    def test_serves_stale_value_when_spotify_is_unavailable(self):
+        cache = CatalogCache([MemoryBackend()], ttls={"album": -1})
+        cache.set("album", "1", {"name": "Album"})
+
+        value = cache.get_or_fetch("album", "1", Mock(side_effect=SpotifyUnavailable("down")))
+
+        self.assertEqual(value, {"name": "Album"})
+        self.assertEqual(cache.stats()["album"]["stale"], 1)
+
+    def test_unavailable_without_stale_value_raises(self):
+        with self.assertRaises(SpotifyUnavailable):
+            self.cache.get_or_fetch("album", "1", Mock(side_effect=SpotifyUnavailable("down")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,48 @@
+import gzip
+import unittest
+from datetime import datetime
+from flask import Flask, jsonify
+from app.utils.compression import register_compression
+from app.utils.json_provider import OrjsonProvider
+
+
+class CompressionTest(unittest.TestCase):
+
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.json = OrjsonProvider(self.app)
+        register_compression(self.app)
+
+        @self.app.route('/big')
+        def big():
+            return jsonify({"items": [{"name": f"Album {i}"} for i in range(200)]})
+
+        @self.app.route('/small')
+        def small():
+            return jsonify({"ok": True, "at": datetime(2024, 5, 1, 10, 0)})
+
+        self.client = self.app.test_client()
+
+    def test_gzip_when_accepted(self):
+        response = self.client.get('/big', headers={"Accept-Encoding": "gzip"})
+
+        self.assertEqual(response.headers["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", response.headers["Vary"])
+        body = self.app.json.loads(gzip.decompress(response.get_data()))
+        self.assertEqual(len(body["items"]), 200)
+
+    def test_identity_without_accept_encoding(self):
+        response = self.client.get('/big')
+
+        self.assertNotIn("Content-Encoding", response.headers)
+        self.assertEqual(len(response.json["items"]), 200)
+
+    def test_small_responses_are_not_compressed_and_keep_http_dates(self):
+        response = self.client.get('/small', headers={"Accept-Encoding": "gzip"})
+
+        self.assertNotIn("Content-Encoding", response.headers)
+        self.assertEqual(response.json["at"], "Wed, 01 May 2024 10:00:00 GMT")
+
+
+if __name__ == "__main__":
+    unittest.main()
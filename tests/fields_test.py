@@ -0,0 +1,25 @@
+import unittest
+from app.utils.fields import parse_fields, select
+
+
+class FieldSelectorTest(unittest.TestCase):
+
+    def test_parses_nested_selector(self):
+        self.assertEqual(parse_fields("items(name,images(url)),total"),
+                         {"items": {"name": None, "images": {"url": None}}, "total": None})
+
+    def test_rejects_invalid_selector(self):
+        for spec in ("items(", "items()", "a)b", "items(name))", "na-me"):
+            with self.assertRaises(ValueError):
+                parse_fields(spec)
+
+    def test_select_trims_lists_and_missing_fields(self):
+        data = {"items": [{"name": "A", "available_markets": ["BR"], "images": [{"url": "u", "width": 640}]}],
+                "total": 1, "href": "h"}
+
+        self.assertEqual(select(data, parse_fields("items(name,images(url),missing),total")),
+                         {"items": [{"name": "A", "images": [{"url": "u"}]}], "total": 1})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,130 @@
+import unittest
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+from flask import Flask
+from pymongo import ASCENDING, IndexModel
+from app.models.album_stats import AlbumStats
+from app.models.review import Review
+from app.models.user import User
+from app.services.token_vault import SpotifyTokenVault
+from app.utils import indexes
+from app.utils.pagination import encode_cursor
+from app.utils.token_manager import TokenManager
+
+LOOKUPS = ("find", "find_one", "find_one_and_update", "find_one_and_delete", "update_one", "delete_one", "delete_many")
+
+
+def recorded_queries(db):
+    """
+    (coleção, filtro, ordenação) de cada consulta feita no banco falso.
+    """
+    queries = []
+    for name, args, kwargs in db.mock_calls:
+        parts = name.split(".")
+        if len(parts) == 2 and parts[1] in LOOKUPS:
+            queries.append([parts[0], args[0], kwargs.get("sort", ())])
+        elif len(parts) == 3 and parts[1] == "find()" and parts[2] == "sort":
+            queries[-1][2] = args[0]
+        elif len(parts) == 2 and parts[1] == "aggregate":
+            for stage in args[0]:
+                if "$match" in stage:
+                    queries.append([parts[0], stage["$match"], ()])
+                if "$unionWith" in stage:
+                    union = stage["$unionWith"]
+                    queries.extend([union["coll"], s["$match"], ()] for s in union["pipeline"] if "$match" in s)
+                # Depois da seleção de candidatos os $match filtram campos calculados.
+                if "$match" not in stage and "$unionWith" not in stage and "$limit" not in stage:
+                    break
+    return queries
+
+
+class IndexRegistryTest(unittest.TestCase):
+
+    def test_all_model_queries_are_covered(self):
+        self.assertEqual(indexes.uncovered_queries(), [])
+
+    def test_reports_uncovered_query(self):
+        queries = indexes.QUERIES + [("reviews", ["text"], [], [], "test")]
+        with patch.object(indexes, "QUERIES", queries):
+            self.assertEqual(indexes.uncovered_queries(), [("reviews", ["text"], [], [], "test")])
+
+    def test_index_prefix_must_match_sort(self):
+        registry = {"reviews": [IndexModel([("albumId", ASCENDING)], name="album")]}
+        queries = [("reviews", ["albumId"], ["timestamp"], [], "test")]
+        with patch.object(indexes, "INDEXES", registry), patch.object(indexes, "QUERIES", queries):
+            self.assertEqual(len(indexes.uncovered_queries()), 1)
+
+    def test_range_fields_must_be_in_index(self):
+        registry = {"album_stats": [IndexModel([("trend", ASCENDING), ("_id", ASCENDING)], name="trending")]}
+        queries = [("album_stats", [], ["trend", "_id"], ["last_review_at"], "test")]
+        with patch.object(indexes, "INDEXES", registry), patch.object(indexes, "QUERIES", queries):
+            self.assertEqual(len(indexes.uncovered_queries()), 1)
+
+    def test_query_shape(self):
+        query = {"albumId": "a1", "userId": {"$ne": "u1"}, "grams": {"$in": ["a"]},
+                 "$or": [{"score": {"$lt": 4.2}}, {"score": 4.2, "_id": {"$lt": "a1"}}]}
+
+        self.assertEqual(indexes.query_shape(query, [("score", -1), ("_id", -1)]),
+                         (["albumId", "grams"], ["score", "_id"], ["userId"]))
+        self.assertEqual(indexes.query_shape({"_id": {"$gt": "u1"}}, "_id"), ([], ["_id"], []))
+
+
+class ModelQueriesTest(unittest.TestCase):
+    """
+    Executa as consultas reais dos models contra um banco falso e confere
+    que cada formato está registrado em QUERIES.
+    """
+
+    def setUp(self):
+        self.app = Flask(__name__)
+        context = self.app.app_context()
+        context.push()
+        self.addCleanup(context.pop)
+        self.db = MagicMock()
+        self.db.__getitem__.side_effect = lambda name: getattr(self.db, name)
+        patcher = patch("app.utils.persistence_manager.PersistenceManager.get_database", return_value=self.db)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def registered(self, collection, query, sort):
+        equality, sort, ranges = indexes.query_shape(query, sort)
+        return any(
+            entry[0] == collection and set(entry[1]) == set(equality) and entry[2] == sort
+            and set(entry[3]) == set(ranges)
+            for entry in indexes.QUERIES
+        )
+
+    def test_model_queries_are_registered(self):
+        review_cursor = encode_cursor(datetime(2025, 3, 1), "r1")
+        score_cursor = encode_cursor(4.2, "a1")
+        vault = SpotifyTokenVault(MagicMock(), "client", "secret")
+        calls = [
+            lambda: User.find_user_by_username("alice"),
+            lambda: User.find_user_by_spotify_id("s1"),
+            lambda: User.find_users_by_ids(["u1"]),
+            lambda: User.search_users("alice"),
+            lambda: User.get_all_users(10, encode_cursor("u1")),
+            lambda: Review.get_by_user("u1", 10, review_cursor),
+            lambda: Review.get_by_album("a1", 10, review_cursor),
+            lambda: Review.get_by_album("a1", 10, review_cursor, exclude_user_id="u1"),
+            lambda: Review.recent(10, review_cursor),
+            lambda: Review.get_by_user_and_album("u1", "a1"),
+            lambda: AlbumStats.top_rated(10, score_cursor),
+            lambda: AlbumStats.trending(10, score_cursor),
+            lambda: TokenManager.find_refresh_token("token"),
+            lambda: TokenManager.delete_refresh_token("token"),
+            lambda: TokenManager.store_refresh_token("alice", "token"),
+            lambda: vault.refresh_expiring(),
+        ]
+        for call in calls:
+            call()
+
+        queries = recorded_queries(self.db)
+        self.assertGreaterEqual(len(queries), len(calls))
+        for collection, query, sort in queries:
+            with self.subTest(collection=collection, query=query):
+                self.assertTrue(self.registered(collection, query, sort))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock, patch
+from limits import RateLimitItemPerMinute
+from limits.storage import storage_from_string
+from limits.strategies import FixedWindowRateLimiter
+from app.utils.limiter_storage import PersistenceMongoStorage
+
+
+class PersistenceMongoStorageTest(unittest.TestCase):
+
+    def setUp(self):
+        self.db = MagicMock()
+        self.collection = self.db.__getitem__.return_value
+        self.stored = 0
+
+        def find_one_and_update(key, pipeline, **kwargs):
+            pending = pipeline[0]["$set"]["count"]["$cond"][2]
+            self.stored += pending
+            return {"_id": key["_id"], "count": self.stored,
+                    "expires_at": datetime.utcnow() + timedelta(seconds=60)}
+
+        self.collection.find_one_and_update.side_effect = find_one_and_update
+        patcher = patch("app.utils.limiter_storage.PersistenceManager.get_database", return_value=self.db)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_registered_scheme(self):
+        self.assertIsInstance(storage_from_string("persistence-mongo://"), PersistenceMongoStorage)
+
+    def test_batches_increments_between_flushes(self):
+        storage = PersistenceMongoStorage(batch_size=5, flush_interval=60)
+
+        counts = [storage.incr("key", 60) for _ in range(7)]
+
+        self.assertEqual(counts, [1, 2, 3, 4, 5, 6, 7])
+        # Primeiro acerto da janela e depois um update a cada 5 pendentes.
+        self.assertEqual(self.collection.find_one_and_update.call_count, 2)
+        self.assertEqual(self.stored, 6)
+
+    def test_sees_hits_from_other_workers_on_flush(self):
+        storage = PersistenceMongoStorage(batch_size=2, flush_interval=60)
+        storage.incr("key", 60)
+        self.stored += 10
+
+        self.assertEqual(storage.incr("key", 60), 2)
+        self.assertEqual(storage.incr("key", 60), 13)
+
+    def test_fixed_window_limit(self):
+        limiter = FixedWindowRateLimiter(PersistenceMongoStorage(batch_size=1))
+        item = RateLimitItemPerMinute(2)
+
+        self.assertEqual([limiter.hit(item, "client") for _ in range(3)], [True, True, False])
+
+    def test_small_limits_are_not_batched(self):
+        workers = [PersistenceMongoStorage(batch_size=10, flush_interval=60) for _ in range(3)]
+        limiters = [FixedWindowRateLimiter(storage) for storage in workers]
+        item = RateLimitItemPerMinute(5)
+
+        allowed = sum(limiter.hit(item, "client") for _ in range(4) for limiter in limiters)
+
+        self.assertEqual(allowed, 5)
+        self.assertEqual(self.stored, 12)
+
+    def test_batch_is_capped_by_the_limit(self):
+        storage = PersistenceMongoStorage(batch_size=10, flush_interval=60)
+        key = RateLimitItemPerMinute(50).key_for("client")
+
+        for _ in range(6):
+            storage.incr(key, 60)
+
+        # Lote de 50 // 10 = 5: primeiro acerto e depois mais um update.
+        self.assertEqual(self.collection.find_one_and_update.call_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
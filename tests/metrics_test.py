@@ -0,0 +1,75 @@
+import unittest
+from flask import Blueprint, Flask
+from app.utils.metrics import (Histogram, MONGO_LATENCY, MongoCommandTimer, REQUESTS, REQUEST_LATENCY,
+                               register_metrics, spotify_endpoint)
+
+
+class HistogramTest(unittest.TestCase):
+
+    def test_buckets_are_cumulative(self):
+        histogram = Histogram("latency_seconds", "Latência.", ("route",), buckets=(0.1, 1))
+        histogram.observe(0.05, route="/a")
+        histogram.observe(0.5, route="/a")
+        histogram.observe(3, route="/a")
+
+        samples = list(histogram.samples())
+        self.assertIn('latency_seconds_bucket{route="/a",le="0.1"} 1', samples)
+        self.assertIn('latency_seconds_bucket{route="/a",le="1"} 2', samples)
+        self.assertIn('latency_seconds_bucket{route="/a",le="+Inf"} 3', samples)
+        self.assertIn('latency_seconds_count{route="/a"} 3', samples)
+
+
+class MetricsEndpointTest(unittest.TestCase):
+
+    def setUp(self):
+        REQUEST_LATENCY.clear()
+        REQUESTS.clear()
+        MONGO_LATENCY.clear()
+        self.app = Flask(__name__)
+        bp = Blueprint('album', __name__, url_prefix='/album')
+
+        @bp.route('/<album_id>')
+        def album(album_id):
+            return {"id": album_id}
+
+        self.app.register_blueprint(bp)
+        register_metrics(self.app)
+        self.client = self.app.test_client()
+
+    def test_records_requests_by_route_template(self):
+        self.client.get("/album/1")
+        self.client.get("/album/2")
+        self.client.get("/missing")
+
+        body = self.client.get("/metrics").get_data(as_text=True)
+        self.assertIn('http_requests_total{blueprint="album",endpoint="/album/<album_id>",method="GET",status="200"} 2',
+                      body)
+        self.assertIn('http_requests_total{blueprint="",endpoint="unmatched",method="GET",status="404"} 1', body)
+        self.assertIn('http_request_duration_seconds_count{blueprint="album",endpoint="/album/<album_id>",method="GET"} 2',
+                      body)
+
+    def test_mongo_listener_records_commands(self):
+        event = type("Event", (), {"command_name": "find", "duration_micros": 1500})()
+        MongoCommandTimer().succeeded(event)
+
+        body = self.client.get("/metrics").get_data(as_text=True)
+        self.assertIn('mongo_command_duration_seconds_count{command="find",outcome="success"} 1', body)
+
+    def test_spotify_endpoint_hides_ids(self):
+        self.assertEqual(spotify_endpoint("https://api.spotify.com/v1/albums/4aawyAB9vmqN3uQ7FjRGTy?market=BR"),
+                         "albums/{id}")
+        self.assertEqual(spotify_endpoint("https://api.spotify.com/v1/me/player/recently-played"),
+                         "me/player/recently-played")
+
+    def test_spotify_endpoint_hides_segments_after_collections(self):
+        self.assertEqual(spotify_endpoint("https://api.spotify.com/v1/users/smedjan"), "users/{id}")
+        self.assertEqual(spotify_endpoint("https://api.spotify.com/v1/users/john.doe/playlists"),
+                         "users/{id}/playlists")
+        self.assertEqual(spotify_endpoint("https://api.spotify.com/v1/artists/0OdUWJ0sBjDrqHygGUXeCF/top-tracks"),
+                         "artists/{id}/top-tracks")
+        self.assertEqual(spotify_endpoint("https://api.spotify.com/v1/me/top/artists?limit=20"), "me/top/artists")
+        self.assertEqual(spotify_endpoint("https://api.spotify.com/v1/albums/?ids=a,b"), "albums")
+
+
+if __name__ == "__main__":
+    unittest.main()
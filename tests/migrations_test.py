@@ -0,0 +1,52 @@
+import unittest
+from unittest.mock import MagicMock, patch
+from pymongo.errors import DuplicateKeyError
+from app.utils import migrations
+from app.utils.migrations import MigrationLease, MigrationLockTimeout, applied_versions, migrate
+
+
+class MigrationsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.db = MagicMock()
+        self.db.migrations.find.return_value = [{"_id": 1}]
+        patcher = patch("app.utils.migrations.ensure_indexes")
+        self.mock_ensure_indexes = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_only_finished_migrations_count_as_applied(self):
+        self.assertEqual(applied_versions(self.db), {1})
+        self.assertEqual(self.db.migrations.find.call_args[0][0], {"status": "applied"})
+
+    def test_failed_migration_is_recorded_and_indexes_are_skipped(self):
+        upgrade = MagicMock(side_effect=RuntimeError("boom"))
+        with patch.object(migrations, "MIGRATIONS", [(1, "done", MagicMock()), (2, "broken", upgrade)]):
+            with self.assertRaises(RuntimeError):
+                migrate(self.db)
+
+        self.assertEqual(self.db.migrations.update_one.call_args[0],
+                         ({"_id": 2}, {"$set": {"status": "failed", "error": "boom"}}))
+        self.mock_ensure_indexes.assert_not_called()
+        self.db.migration_lock.delete_one.assert_called_once()
+
+    def test_waiters_fail_when_lease_is_held(self):
+        self.db.migration_lock.update_one.side_effect = DuplicateKeyError("held")
+        self.db.migration_lock.find_one.return_value = {"owner": "other-host:1"}
+
+        with self.assertRaises(MigrationLockTimeout) as context:
+            migrate(self.db, wait_timeout=0)
+
+        self.assertIn("other-host:1", str(context.exception))
+        self.mock_ensure_indexes.assert_not_called()
+
+    def test_lease_is_released_by_its_owner_only(self):
+        lease = MigrationLease(self.db, lease_seconds=60)
+
+        with lease:
+            pass
+
+        self.db.migration_lock.delete_one.assert_called_once_with({"_id": "migrations", "owner": lease.owner})
+
+
+if __name__ == "__main__":
+    unittest.main()
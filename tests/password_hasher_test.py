@@ -0,0 +1,64 @@
+import threading
+import unittest
+from app.utils.password_hasher import HasherBusy, PasswordHasher
+
+
+class PasswordHasherTest(unittest.TestCase):
+
+    def test_hash_and_verify(self):
+        hasher = PasswordHasher(rounds=4, workers=1)
+        hashed = hasher.hash("secret")
+
+        self.assertTrue(hasher.verify("secret", hashed))
+        self.assertFalse(hasher.verify("wrong", hashed))
+
+    def test_needs_rehash_when_cost_is_lower_than_configured(self):
+        hashed = PasswordHasher(rounds=4, workers=1).hash("secret")
+
+        self.assertTrue(PasswordHasher(rounds=5, workers=1).needs_rehash(hashed))
+        self.assertFalse(PasswordHasher(rounds=4, workers=1).needs_rehash(hashed))
+
+    def test_rejects_work_when_queue_is_full(self):
+        hasher = PasswordHasher(rounds=4, workers=1, max_pending=0)
+        release = threading.Event()
+        started = threading.Event()
+
+        def slow():
+            started.set()
+            release.wait()
+
+        worker = threading.Thread(target=hasher._run, args=(slow,))
+        worker.start()
+        started.wait()
+
+        with self.assertRaises(HasherBusy):
+            hasher.hash("secret")
+
+        release.set()
+        worker.join()
+        self.assertTrue(hasher.verify("secret", hasher.hash("secret")))
+
+
+    def test_timeout_is_reported_as_busy(self):
+        hasher = PasswordHasher(rounds=4, workers=1, max_pending=1, timeout=0.05)
+        release = threading.Event()
+        started = threading.Event()
+
+        def slow():
+            started.set()
+            release.wait()
+
+        worker = threading.Thread(target=lambda: self.assertRaises(HasherBusy, hasher._run, slow))
+        worker.start()
+        started.wait()
+
+        # A segunda tarefa vence na fila e é cancelada, devolvendo a vaga.
+        with self.assertRaises(HasherBusy):
+            hasher.hash("secret")
+
+        release.set()
+        worker.join()
+        self.assertTrue(hasher.verify("secret", hasher.hash("secret")))
+
+if __name__ == "__main__":
+    unittest.main()
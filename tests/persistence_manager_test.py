@@ -0,0 +1,40 @@
+import unittest
+from unittest.mock import patch
+from flask import Flask
+from app.utils.persistence_manager import PersistenceManager
+
+
+class PersistenceManagerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config['MONGO_URI'] = 'mongodb://localhost:27017/groovesync_test'
+        self.app.config['MONGO_MAX_POOL_SIZE'] = 7
+        self.app.config['MONGO_COMPRESSORS'] = 'zlib'
+        PersistenceManager.close_connection()
+
+    def tearDown(self):
+        PersistenceManager.close_connection()
+
+    def test_reuses_client_across_requests(self):
+        with self.app.test_request_context():
+            first = PersistenceManager.get_database()
+        with self.app.test_request_context():
+            second = PersistenceManager.get_database()
+
+        self.assertIs(first, second)
+        self.assertEqual(first.name, 'groovesync_test')
+        self.assertEqual(PersistenceManager._client.options.pool_options.max_pool_size, 7)
+
+    def test_creates_new_client_after_fork(self):
+        with self.app.app_context():
+            parent_client = PersistenceManager.get_database().client
+            with patch("app.utils.persistence_manager.os.getpid", return_value=-1):
+                child_client = PersistenceManager.get_database().client
+
+        self.assertIsNot(parent_client, child_client)
+        parent_client.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
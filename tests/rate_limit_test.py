@@ -0,0 +1,89 @@
+import unittest
+from unittest.mock import Mock, patch
+from spotipy import SpotifyException
+from app.services.rate_limit import CircuitBreaker, SpotifyGuard, SpotifyUnavailable
+from app.services.spotify import PooledSpotify
+
+
+class OpenBucket:
+    def acquire(self, timeout):
+        return True
+
+
+class SpotifyGuardTest(unittest.TestCase):
+
+    def setUp(self):
+        self.guard = SpotifyGuard(OpenBucket(), CircuitBreaker(failure_threshold=2, reset_timeout=30),
+                                  max_attempts=3, max_retry_wait=2.0)
+
+    def call(self, fn):
+        return self.guard.call(fn, PooledSpotify._rate_limited, PooledSpotify._upstream_failure)
+
+    @patch("app.services.rate_limit.time.sleep")
+    def test_retries_after_rate_limit(self, mock_sleep):
+        fn = Mock(side_effect=[SpotifyException(429, -1, "rate limited", headers={"Retry-After": "1"}), "ok"])
+
+        self.assertEqual(self.call(fn), "ok")
+        self.assertEqual(fn.call_count, 2)
+        self.assertGreaterEqual(mock_sleep.call_args[0][0], 1)
+
+    def test_long_retry_after_fails_fast_and_opens_breaker(self):
+        fn = Mock(side_effect=SpotifyException(429, -1, "rate limited", headers={"Retry-After": "60"}))
+
+        with self.assertRaises(SpotifyUnavailable) as context:
+            self.call(fn)
+        self.assertGreaterEqual(context.exception.retry_after, 60)
+
+        with self.assertRaises(SpotifyUnavailable):
+            self.call(Mock(return_value="ok"))
+        self.assertEqual(fn.call_count, 1)
+
+    def test_breaker_opens_after_upstream_failures(self):
+        failing = Mock(side_effect=SpotifyException(502, -1, "bad gateway"))
+        for _ in range(2):
+            with self.assertRaises(SpotifyException):
+                self.call(failing)
+
+        healthy = Mock(return_value="ok")
+        with self.assertRaises(SpotifyUnavailable):
+            self.call(healthy)
+        healthy.assert_not_called()
+
+    def test_client_errors_do_not_trip_breaker(self):
+        for _ in range(3):
+            with self.assertRaises(SpotifyException):
+                self.call(Mock(side_effect=SpotifyException(404, -1, "not found")))
+
+        self.assertEqual(self.call(Mock(return_value="ok")), "ok")
+
+    def test_rate_limit_without_retry_after_is_upstream_failure(self):
+        # spotipy converte o esgotamento de retentativas em 429 sem cabeçalhos.
+        exhausted = Mock(side_effect=SpotifyException(429, -1, "/v1/me:\n Max Retries"))
+        for _ in range(2):
+            with self.assertRaises(SpotifyException):
+                self.call(exhausted)
+
+        self.assertEqual(exhausted.call_count, 2)
+        with self.assertRaises(SpotifyUnavailable) as context:
+            self.call(Mock(return_value="ok"))
+        self.assertGreater(context.exception.retry_after, 2)
+
+    @patch("app.services.rate_limit.time.sleep")
+    @patch("app.services.rate_limit.time.monotonic")
+    def test_probe_retries_after_rate_limit(self, mock_monotonic, mock_sleep):
+        mock_monotonic.return_value = 0
+        failing = Mock(side_effect=SpotifyException(500, -1, "server error"))
+        for _ in range(2):
+            with self.assertRaises(SpotifyException):
+                self.call(failing)
+
+        mock_monotonic.return_value = 31
+        probe = Mock(side_effect=[SpotifyException(429, -1, "rate limited", headers={"Retry-After": "1"}), "ok"])
+
+        self.assertEqual(self.call(probe), "ok")
+        self.assertEqual(probe.call_count, 2)
+        self.assertEqual(self.call(Mock(return_value="again")), "again")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,7 +1,13 @@
 import unittest
-from unittest.mock import patch
+from unittest.mock import MagicMock, patch
 from flask import Flask
 from app.routes.review import bp
+from app.models.review import Review
+from app.services.feed import ReviewFeed
+from pymongo.errors import BulkWriteError
+from app.utils.pagination import decode_cursor, encode_cursor
+from bson import ObjectId
+from datetime import datetime
 import jwt
 
 class ReviewRoutesTest(unittest.TestCase):
@@ -14,6 +20,11 @@ class ReviewRoutesTest(unittest.TestCase):
 
         self.valid_token = jwt.encode({"username": "testuser"}, self.app.config['SECRET_KEY'], algorithm="HS256")
 
+        user_stats = patch("app.routes.review.UserStats.get", return_value={"version": 3, "count": 2})
+        self.mock_user_stats = user_stats.start()
+        self.addCleanup(user_stats.stop)
+        ReviewFeed._head_cache.clear()
+
     @patch("app.models.review.Review.save")
     def test_save_review_success(self, mock_save):
         mock_save.return_value = "review_id"
@@ -74,6 +85,122 @@ class ReviewRoutesTest(unittest.TestCase):
         self.assertEqual(response.json["success"], True)
         self.assertEqual(len(response.json["reviews"]), 0)
 
+    @patch("app.models.review.Review.get_by_user")
+    def test_get_reviews_returns_next_cursor(self, mock_get_by_user):
+        mock_get_by_user.return_value = [
+            {"_id": ObjectId(), "rate": 4, "text": "Great album!", "timestamp": datetime(2024, 5, 2)},
+            {"_id": ObjectId(), "rate": 3, "text": "Good album", "timestamp": datetime(2024, 5, 1)}
+        ]
+        response = self.client.get("/review/get/valid_user_id?limit=1")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json["reviews"]), 1)
+        self.assertIsNotNone(response.json["next"])
+        mock_get_by_user.assert_called_once_with("valid_user_id", 2, None)
+
+        self.assertEqual(decode_cursor(response.json["next"])[1], mock_get_by_user.return_value[0]["_id"])
+
+    @patch("app.models.review.Review.get_by_user")
+    def test_get_reviews_not_modified(self, mock_get_by_user):
+        mock_get_by_user.return_value = [{"rate": 4, "text": "Great album!"}]
+        etag = self.client.get("/review/get/valid_user_id").headers["ETag"]
+
+        response = self.client.get("/review/get/valid_user_id", headers={"If-None-Match": etag})
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.headers["ETag"], etag)
+        mock_get_by_user.assert_called_once()
+
+    @patch("app.models.review.Review.get_by_user")
+    def test_get_reviews_new_version_changes_etag(self, mock_get_by_user):
+        mock_get_by_user.return_value = []
+        etag = self.client.get("/review/get/valid_user_id").headers["ETag"]
+        self.mock_user_stats.return_value = {"version": 4, "count": 3}
+
+        response = self.client.get("/review/get/valid_user_id", headers={"If-None-Match": etag})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers["ETag"], etag)
+
+    @patch("app.services.spotify.SpotipyClient.get_albums")
+    @patch("app.models.user.User.find_users_by_ids")
+    @patch("app.models.review.Review.recent")
+    def test_feed_hydrates_and_caches_head(self, mock_recent, mock_find_users, mock_get_albums):
+        mock_recent.return_value = [
+            {"_id": ObjectId(), "userId": "u1", "albumId": "a1", "rate": 4, "text": "Nice",
+             "timestamp": datetime(2024, 5, 2)},
+            {"_id": ObjectId(), "userId": "u2", "albumId": "a2", "rate": 2, "text": "Meh",
+             "timestamp": datetime(2024, 5, 1)},
+        ]
+        mock_find_users.return_value = {"u1": {"_id": "u1", "username": "ana", "spotify_id": "s1"}}
+        mock_get_albums.return_value = {"a1": {"id": "a1", "name": "Album 1"}}
+
+        first = self.client.get("/review/feed?limit=1")
+        second = self.client.get("/review/feed?limit=1")
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first.json, second.json)
+        self.assertEqual(first.json["reviews"][0]["user"], {"username": "ana", "spotify_id": "s1"})
+        self.assertEqual(first.json["reviews"][0]["album"]["name"], "Album 1")
+        self.assertIsNotNone(first.json["next"])
+        mock_recent.assert_called_once_with(2, None)
+        mock_find_users.assert_called_once()
+
+        self.client.get(f"/review/feed?limit=1&cursor={first.json['next']}")
+        self.assertEqual(mock_recent.call_count, 2)
+
+    @patch("app.models.album_stats.AlbumStats.top_rated")
+    def test_top_rated_leaderboard_paginates(self, mock_top_rated):
+        mock_top_rated.return_value = [
+            {"_id": "a1", "count": 40, "sum": 180, "score": 4.2, "last_review_at": datetime(2024, 5, 2)},
+            {"_id": "a2", "count": 3, "sum": 15, "score": 3.5, "last_review_at": datetime(2024, 5, 1)},
+        ]
+        response = self.client.get("/review/leaderboard/top-rated?limit=1")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json["albums"], [{"album_id": "a1", "overall_rating": 4.5, "score": 4.2,
+                                                    "reviews": 40, "last_review_at": "2024-05-02T00:00:00"}])
+        self.assertEqual(decode_cursor(response.json["next"]), [4.2, "a1"])
+        mock_top_rated.assert_called_once_with(2, None)
+
+    def test_trending_leaderboard_invalid_cursor(self):
+        response = self.client.get("/review/leaderboard/trending?cursor=not-a-cursor")
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_get_reviews_invalid_cursor(self):
+        response = self.client.get("/review/get/valid_user_id?cursor=not-a-cursor")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json["message"], "Invalid cursor")
+
+    @patch("app.models.review.PersistenceManager.get_database")
+    def test_get_reviews_cursor_with_wrong_shape(self, mock_get_database):
+        cursor = encode_cursor(datetime(2024, 5, 1))
+        response = self.client.get(f"/review/get/valid_user_id?cursor={cursor}")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json["message"], "Invalid cursor")
+        mock_get_database.assert_not_called()
+
+    @patch("app.models.review.PersistenceManager.get_database")
+    def test_get_reviews_cursor_with_operator_values(self, mock_get_database):
+        for values in (({"$ne": None}, ObjectId()), (datetime(2024, 5, 1), {"$gt": ""}), (True, "id")):
+            cursor = encode_cursor(*values)
+            response = self.client.get(f"/review/get/valid_user_id?cursor={cursor}")
+
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json["message"], "Invalid cursor")
+        mock_get_database.assert_not_called()
+
+    @patch("app.models.review.Review.get_by_user", side_effect=ValueError("Invalid cursor"))
+    def test_get_reviews_query_rejects_cursor(self, mock_get_by_user):
+        cursor = encode_cursor(datetime(2024, 5, 1), ObjectId())
+        response = self.client.get(f"/review/get/valid_user_id?cursor={cursor}")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json["message"], "Invalid cursor")
+
     @patch("app.models.review.Review.update")
     def test_update_review_success(self, mock_update):
         mock_update.return_value = True
@@ -118,5 +245,89 @@ class ReviewRoutesTest(unittest.TestCase):
         self.assertEqual(response.json["success"], False)
         self.assertEqual(response.json["message"], "Review not found")
 
+    @patch("app.models.review.Review.bulk_save")
+    def test_bulk_reports_item_errors(self, mock_bulk_save):
+        mock_bulk_save.return_value = {"inserted": 1, "errors": [{"index": 1, "message": "Invalid user ID"}]}
+        response = self.client.post("/review/bulk", json={"reviews": [
+            {"userId": "u1", "albumId": "a1", "rate": 4},
+            {"userId": "missing", "albumId": "a1", "rate": 3},
+        ]})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json["inserted"], 1)
+        self.assertEqual(response.json["errors"], [{"index": 1, "message": "Invalid user ID"}])
+
+    def test_bulk_requires_list(self):
+        response = self.client.post("/review/bulk", json={"reviews": {}})
+
+        self.assertEqual(response.status_code, 400)
+
+
+class ReviewModelTest(unittest.TestCase):
+
+    @patch("app.models.review.AlbumStats.record_reviews")
+    @patch("app.models.review.PersistenceManager.get_database")
+    def test_bulk_save_maps_write_errors_to_input(self, mock_get_database, mock_record_reviews):
+        db = MagicMock()
+        mock_get_database.return_value = db
+        db.users.find.return_value = [{"_id": "u1"}]
+        db.reviews.bulk_write.side_effect = BulkWriteError(
+            {"writeErrors": [{"index": 1, "code": 11000, "errmsg": "E11000 duplicate key"}]})
+
+        result = Review.bulk_save([
+            {"userId": "u1", "albumId": "a1", "rate": 4},
+            {"userId": "u1", "albumId": "a2", "rate": 9},
+            {"userId": "u2", "albumId": "a1", "rate": 3},
+            {"userId": "u1", "albumId": "a2", "rate": 5},
+            {"userId": "u1", "albumId": "a3", "rate": 2, "timestamp": "2024-05-01T10:00:00+00:00"},
+        ])
+
+        db.users.find.assert_called_once_with({"_id": {"$in": ["u1", "u2"]}}, {"_id": 1})
+        db.reviews.bulk_write.assert_called_once()
+        self.assertEqual(result["inserted"], 2)
+        self.assertEqual(result["errors"], [
+            {"index": 1, "message": "Rate must be between 0 and 5"},
+            {"index": 2, "message": "Invalid user ID"},
+            {"index": 3, "message": "Review already exists for this user and album"},
+        ])
+        recorded = list(mock_record_reviews.call_args[0][0])
+        self.assertEqual([(album, rate) for album, rate, _ in recorded], [("a1", 4), ("a3", 2)])
+        self.assertEqual(recorded[1][2], datetime(2024, 5, 1, 10, 0))
+
+    @patch("app.models.review.AlbumStats.record_review")
+    @patch("app.models.review.Review.is_valid_user", return_value=True)
+    @patch("app.models.review.PersistenceManager.get_database")
+    def test_save_inserts_first_review(self, mock_get_database, mock_is_valid_user, mock_record_review):
+        db = MagicMock()
+        mock_get_database.return_value = db
+        db.reviews.find_one_and_update.return_value = None
+
+        review_id = Review(user_id="u1", rate=4, album_id="a1", text="Good").save()
+
+        key, update = db.reviews.find_one_and_update.call_args[0]
+        self.assertEqual(key, {"albumId": "a1", "userId": "u1"})
+        self.assertEqual(update["$setOnInsert"], {"_id": review_id})
+        self.assertTrue(db.reviews.find_one_and_update.call_args[1]["upsert"])
+        mock_record_review.assert_called_once()
+
+    @patch("app.models.review.AlbumStats.replace_review")
+    @patch("app.models.review.AlbumStats.record_review")
+    @patch("app.models.review.Review.is_valid_user", return_value=True)
+    @patch("app.models.review.PersistenceManager.get_database")
+    def test_save_replaces_existing_review(self, mock_get_database, mock_is_valid_user,
+                                           mock_record_review, mock_replace_review):
+        db = MagicMock()
+        mock_get_database.return_value = db
+        existing_id = ObjectId()
+        db.reviews.find_one_and_update.return_value = {"_id": existing_id, "rate": 2,
+                                                       "timestamp": datetime(2024, 5, 1)}
+
+        review = Review(user_id="u1", rate=4, album_id="a1")
+        review_id = review.save()
+
+        self.assertEqual(review_id, existing_id)
+        mock_record_review.assert_not_called()
+        mock_replace_review.assert_called_once_with("a1", 2, 4, datetime(2024, 5, 1), review.timestamp)
+
 if __name__ == '__main__':
     unittest.main()
@@ -2,8 +2,16 @@ import unittest
 from unittest.mock import patch
 from flask import Flask
 from app.routes.spotify import bp
-from app.services.spotify import SpotipyClient
+from spotipy import SpotifyException
+from app.services.catalog_cache import CatalogCache, MemoryBackend
+from app.services.rate_limit import SpotifyUnavailable
+from app.services.spotify import SpotipyClient, SpotifyClientFactory
+from app.models.user import principal_cache
 import jwt
+import os
+import subprocess
+import sys
+import time
 from flask import json
 
 class SpotifyRoutesTest(unittest.TestCase): 
@@ -13,6 +21,7 @@ class SpotifyRoutesTest(unittest.TestCase):
         self.app.config['SECRET_KEY'] = 'testsecret'
         self.app.register_blueprint(bp)
         self.client = self.app.test_client()
+        principal_cache.clear()
         
         self.valid_token = jwt.encode({"username": "testuser"}, self.app.config['SECRET_KEY'], algorithm="HS256")
     
@@ -73,5 +82,133 @@ class SpotifyRoutesTest(unittest.TestCase):
         self.assertFalse(data["success"])
         self.assertIn("Query parameter 'q' is required", data["message"])
 
+    def test_client_factory_shares_session_between_tokens(self):
+        with self.app.app_context():
+            first = SpotifyClientFactory.client("token-a")
+            second = SpotifyClientFactory.client("token-b")
+
+        self.assertIs(first._session, second._session)
+        self.assertEqual(first._auth_headers(), {"Authorization": "Bearer token-a"})
+        self.assertEqual(second._auth_headers(), {"Authorization": "Bearer token-b"})
+
+        del first
+        self.assertTrue(second._session.adapters)
+
+    @patch("app.models.user.User.find_user_by_username", return_value={"username": "testuser"})
+    @patch("app.routes.spotify.spotify_client")
+    def test_dashboard_returns_partial_results(self, mock_client, mock_find_user):
+        sp = mock_client.return_value
+        sp.current_user_recently_played.return_value = {"items": [1]}
+        sp.current_user_playing_track.return_value = None
+        sp.current_user_top_artists.side_effect = Exception("Spotify API error")
+        sp.current_user_saved_albums.return_value = {"items": [2]}
+        headers = {"Authorization": f"Bearer {self.valid_token}", "Spotify-Token": "spotify"}
+
+        response = self.client.get('/spotify/dashboard', headers=headers)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json["data"]["recent_tracks"], {"items": [1]})
+        self.assertIsNone(response.json["data"]["current_track"])
+        self.assertNotIn("obsessions", response.json["data"])
+        self.assertEqual(response.json["errors"], {"obsessions": "Spotify API error"})
+
+    @patch("app.models.user.User.find_user_by_username", return_value={"username": "testuser"})
+    @patch("app.routes.spotify.spotify_client")
+    def test_dashboard_times_out_slow_parts(self, mock_client, mock_find_user):
+        self.app.config['SPOTIFY_DASHBOARD_TIMEOUT'] = 0.1
+        sp = mock_client.return_value
+        sp.current_user_recently_played.side_effect = lambda limit: time.sleep(0.5)
+        sp.current_user_playing_track.return_value = None
+        sp.current_user_top_artists.return_value = {"items": []}
+        sp.current_user_saved_albums.return_value = {"items": []}
+        headers = {"Authorization": f"Bearer {self.valid_token}", "Spotify-Token": "spotify"}
+
+        started = time.monotonic()
+        response = self.client.get('/spotify/dashboard', headers=headers)
+
+        self.assertLess(time.monotonic() - started, 0.4)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json["errors"], {"recent_tracks": "Timed out"})
+
+    @patch("app.services.spotify.spotify_client")
+    def test_search_albums_normalizes_and_caches_queries(self, mock_client):
+        SpotipyClient._search_cache.clear()
+        mock_client.return_value.search.return_value = {"albums": {"items": [{
+            "name": "The Eminem Show", "id": "1", "artists": [{"name": "Eminem"}], "release_date": "2002-05-26",
+            "total_tracks": 20, "images": [], "album_type": "album"
+        }]}}
+        client = SpotipyClient()
+
+        first = client.search_albums("token-a", "  Eminem   Show", 10)
+        second = client.search_albums("token-b", "eminem show", 10)
+
+        self.assertEqual(first, second)
+        mock_client.return_value.search.assert_called_once()
+
+    @patch("app.services.spotify.spotify_client")
+    def test_get_users_fetches_each_missing_profile_once(self, mock_client):
+        cache = CatalogCache([MemoryBackend()])
+        cache.set("user", "cached", {"display_name": "Cached", "id": "cached", "image": None})
+        mock_client.return_value.user.side_effect = lambda spotify_id: {
+            "display_name": spotify_id.title(), "id": spotify_id, "images": []}
+
+        with self.app.app_context(), patch.object(CatalogCache, "instance", return_value=cache):
+            users = SpotipyClient().get_users("token", ["alice", "cached", "bob", "alice", None])
+
+        self.assertEqual(set(users), {"alice", "bob", "cached"})
+        self.assertEqual(sorted(call.args[0] for call in mock_client.return_value.user.call_args_list),
+                         ["alice", "bob"])
+
+    @patch("app.services.spotify.spotify_client")
+    def test_get_users_skips_profiles_that_fail(self, mock_client):
+        def user(spotify_id):
+            if spotify_id == "broken":
+                raise SpotifyException(404, -1, "not found")
+            return {"display_name": spotify_id, "id": spotify_id, "images": []}
+
+        mock_client.return_value.user.side_effect = user
+
+        with self.app.app_context(), patch.object(CatalogCache, "instance",
+                                                  return_value=CatalogCache([MemoryBackend()])):
+            users = SpotipyClient().get_users("token", ["alice", "broken"])
+
+        self.assertEqual(list(users), ["alice"])
+
+    @patch("app.services.spotify.spotify_client")
+    def test_get_users_serves_stale_profiles_when_spotify_is_unavailable(self, mock_client):
+        cache = CatalogCache([MemoryBackend()], {"user": -1})
+        cache.set("user", "alice", {"display_name": "Alice", "id": "alice", "image": None})
+        mock_client.return_value.user.side_effect = SpotifyUnavailable("Spotify is unavailable", 30)
+
+        with self.app.app_context(), patch.object(CatalogCache, "instance", return_value=cache):
+            users = SpotipyClient().get_users("token", ["alice"])
+
+        self.assertEqual(users["alice"]["display_name"], "Alice")
+
+    def test_dashboard_in_fresh_process(self):
+        # Sem nenhuma chamada anterior, o guard e o pool de conexões nascem na
+        # própria requisição; as threads do fan-out não têm contexto de app.
+        script = """
+import jwt
+from unittest.mock import patch
+from flask import Flask
+from app.routes.spotify import bp
+
+app = Flask(__name__)
+app.config.update(SECRET_KEY="testsecret", MONGO_URI="mongodb://localhost:1/test")
+app.register_blueprint(bp)
+token = jwt.encode({"username": "testuser"}, "testsecret", algorithm="HS256")
+with patch("app.models.user.User.find_user_by_username", return_value={"username": "testuser"}), \\
+        patch("app.services.rate_limit.SharedTokenBucket._lease", return_value=5), \\
+        patch("spotipy.Spotify._internal_call", return_value={"items": []}):
+    response = app.test_client().get("/spotify/dashboard", headers={
+        "Authorization": "Bearer " + token, "Spotify-Token": "spotify"})
+print(response.status_code, response.get_json()["errors"])
+"""
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        result = subprocess.run([sys.executable, "-c", script], cwd=root, capture_output=True, text=True, timeout=60)
+
+        self.assertEqual(result.stdout.strip(), "200 {}", result.stderr)
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,169 @@
+import os
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock, patch
+from cryptography.fernet import Fernet, InvalidToken
+from app.services.token_vault import SpotifyTokenVault, TokenCipher
+
+
+class FakeCipher:
+
+    def encrypt(self, value):
+        return "enc:" + value
+
+    def decrypt(self, value):
+        if not value.startswith("enc:"):
+            raise InvalidToken
+        return value[len("enc:"):]
+
+
+class SpotifyTokenVaultTest(unittest.TestCase):
+
+    def setUp(self):
+        self.db = MagicMock()
+        self.collection = self.db.__getitem__.return_value
+        self.session = MagicMock()
+        for target, value in (("app.services.token_vault.PersistenceManager.get_database", self.db),
+                              ("app.services.token_vault.SpotifyClientFactory.session", self.session)):
+            patcher = patch(target, return_value=value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.vault = SpotifyTokenVault(FakeCipher(), "client", "secret", margin=300)
+
+    def document(self, expires_in):
+        return {"_id": "alice", "access_token": "enc:old-access", "refresh_token": "enc:refresh",
+                "expires_at": datetime.utcnow() + timedelta(seconds=expires_in)}
+
+    def test_store_encrypts_tokens(self):
+        self.vault.store("alice", "access", "refresh", 3600, "user-read-recently-played")
+
+        query, update = self.collection.update_one.call_args[0]
+        self.assertEqual(query, {"_id": "alice"})
+        self.assertEqual(update["$set"]["access_token"], "enc:access")
+        self.assertEqual(update["$set"]["refresh_token"], "enc:refresh")
+
+    def test_access_token_is_cached(self):
+        self.collection.find_one.return_value = self.document(3600)
+
+        self.assertEqual(self.vault.access_token("alice"), "old-access")
+        self.assertEqual(self.vault.access_token("alice"), "old-access")
+
+        self.collection.find_one.assert_called_once()
+        self.session.post.assert_not_called()
+
+    def test_refreshes_token_close_to_expiry(self):
+        expiring = self.document(60)
+        self.collection.find_one.side_effect = [expiring, dict(expiring, access_token="enc:new-access",
+                                                               expires_at=datetime.utcnow() + timedelta(hours=1))]
+        self.collection.find_one_and_update.return_value = expiring
+        self.session.post.return_value.status_code = 200
+        self.session.post.return_value.json.return_value = {"access_token": "new-access", "expires_in": 3600}
+
+        self.assertEqual(self.vault.access_token("alice"), "new-access")
+        data = self.session.post.call_args.kwargs["data"]
+        self.assertEqual(data, {"grant_type": "refresh_token", "refresh_token": "refresh"})
+        # Sem refresh token novo na resposta, o antigo é mantido.
+        self.assertNotIn("refresh_token", self.collection.update_one.call_args[0][1]["$set"])
+
+    def test_revoked_grant_forgets_user(self):
+        expired = self.document(-10)
+        self.collection.find_one.return_value = expired
+        self.collection.find_one_and_update.return_value = expired
+        self.session.post.return_value.status_code = 400
+        self.session.post.return_value.json.return_value = {"error": "invalid_grant"}
+
+        self.assertIsNone(self.vault.access_token("alice"))
+        self.collection.delete_one.assert_called_once_with({"_id": "alice"})
+
+    def test_skips_refresh_claimed_by_other_worker(self):
+        expiring = self.document(60)
+        self.collection.find_one.return_value = expiring
+        self.collection.find_one_and_update.return_value = None
+
+        self.assertEqual(self.vault.access_token("alice"), "old-access")
+        self.session.post.assert_not_called()
+
+    def test_non_json_error_releases_lock(self):
+        expiring = self.document(60)
+        self.collection.find_one.return_value = expiring
+        self.collection.find_one_and_update.return_value = expiring
+        self.session.post.return_value.status_code = 400
+        self.session.post.return_value.json.side_effect = ValueError("not json")
+
+        self.assertEqual(self.vault.access_token("alice"), "old-access")
+        self.collection.delete_one.assert_not_called()
+        self.collection.update_one.assert_called_with({"_id": "alice"}, {"$unset": {"refresh_lock_until": ""}})
+
+    def test_background_refresh_skips_dormant_users(self):
+        self.collection.find.return_value.sort.return_value.limit.return_value = []
+
+        self.assertEqual(self.vault.refresh_expiring(), 0)
+        query = self.collection.find.call_args[0][0]
+        self.assertIn("last_used_at", query)
+        self.assertLess(query["last_used_at"]["$gte"], datetime.utcnow() - timedelta(hours=23))
+
+    def test_reading_from_database_marks_user_active(self):
+        self.collection.find_one.return_value = self.document(3600)
+
+        self.vault.access_token("alice")
+
+        query, update = self.collection.update_one.call_args[0]
+        self.assertEqual(query, {"_id": "alice"})
+        self.assertIn("last_used_at", update["$set"])
+
+    def test_recent_use_is_not_written_again(self):
+        self.collection.find_one.return_value = dict(self.document(3600), last_used_at=datetime.utcnow())
+
+        self.vault.access_token("alice")
+
+        self.collection.update_one.assert_not_called()
+
+    def test_undecryptable_access_token_forgets_user(self):
+        self.collection.find_one.return_value = dict(self.document(3600), access_token="rotated-out")
+
+        self.assertIsNone(self.vault.access_token("alice"))
+        self.collection.delete_one.assert_called_once_with({"_id": "alice"})
+
+    def test_undecryptable_refresh_token_forgets_user(self):
+        expiring = dict(self.document(60), refresh_token="rotated-out")
+        self.collection.find.return_value.sort.return_value.limit.return_value = [expiring]
+        self.collection.find_one_and_update.return_value = expiring
+
+        self.assertEqual(self.vault.refresh_expiring(), 0)
+        self.collection.delete_one.assert_called_once_with({"_id": "alice"})
+        self.session.post.assert_not_called()
+
+    def test_discard_drops_cached_token(self):
+        self.collection.find_one.return_value = self.document(3600)
+        self.vault.access_token("alice")
+        with patch.object(SpotifyTokenVault, "_instance", self.vault), \
+                patch.object(SpotifyTokenVault, "_pid", os.getpid()):
+            SpotifyTokenVault.discard("alice")
+
+        self.collection.find_one.return_value = None
+        self.assertIsNone(self.vault.access_token("alice"))
+
+
+class TokenCipherTest(unittest.TestCase):
+
+    def test_round_trip_with_key_derived_from_secret(self):
+        cipher = TokenCipher.from_config({"SECRET_KEY": "secret"})
+
+        encrypted = cipher.encrypt("access-token")
+
+        self.assertNotIn("access-token", encrypted)
+        self.assertEqual(cipher.decrypt(encrypted), "access-token")
+
+    def test_rotated_key_still_decrypts(self):
+        old, new = Fernet.generate_key().decode(), Fernet.generate_key().decode()
+        encrypted = TokenCipher.from_config({"SPOTIFY_TOKEN_KEYS": old, "SECRET_KEY": "secret"}).encrypt("token")
+
+        rotated = TokenCipher.from_config({"SPOTIFY_TOKEN_KEYS": f"{new}, {old}", "SECRET_KEY": "secret"})
+
+        self.assertEqual(rotated.decrypt(encrypted), "token")
+        with self.assertRaises(InvalidToken):
+            TokenCipher.from_config({"SPOTIFY_TOKEN_KEYS": new, "SECRET_KEY": "secret"}).decrypt(encrypted)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -4,6 +4,8 @@ import unittest
 from unittest.mock import patch
 from flask import Flask
 from app.routes.user import bp
+import json
+from app.models.user import SEARCH_CANDIDATES, User, principal_cache
 import jwt
 
 
@@ -16,6 +18,7 @@ class UserRoutesTest(unittest.TestCase):
         self.app.config['SECRET_KEY'] = 'testsecret'
         self.app.register_blueprint(bp)
         self.client = self.app.test_client()
+        principal_cache.clear()
 
         self.valid_token = jwt.encode({"username": "testuser"}, self.app.config['SECRET_KEY'], algorithm="HS256")
 
@@ -80,6 +83,90 @@ class UserRoutesTest(unittest.TestCase):
         self.assertEqual(response.status_code, 401)
         self.assertEqual(response.json["message"], "Invalid token")
 
+    @patch("app.models.user.User.find_user_by_username")
+    @patch("app.models.user.User.search_users")
+    def test_search_users_passes_limit(self, mock_search_users, mock_find_user):
+        mock_find_user.return_value = {"username": "testuser"}
+        mock_search_users.return_value = {"users": [{"username": "eminem", "spotify_id": "123"}]}
+        headers = {"Authorization": f"Bearer {self.valid_token}"}
+        response = self.client.get("/user/search?q=emin&limit=5", headers=headers)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json["data"]["users"][0]["username"], "eminem")
+        mock_search_users.assert_called_once_with("emin", 5)
+
+    @patch("app.models.user.User.find_user_by_username")
+    @patch("app.models.user.User.iter_users")
+    def test_get_all_users_ndjson_stream(self, mock_iter_users, mock_find_user):
+        mock_find_user.return_value = {"username": "testuser"}
+        mock_iter_users.return_value = iter([
+            {"_id": 1, "username": "alice", "spotify_id": "a"},
+            {"_id": 2, "username": "bob", "spotify_id": None}
+        ])
+        headers = {"Authorization": f"Bearer {self.valid_token}"}
+        response = self.client.get("/user/users?format=ndjson", headers=headers)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, "application/x-ndjson")
+        lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        self.assertEqual(lines, [{"username": "alice", "spotify_id": "a"}, {"username": "bob", "spotify_id": None}])
+
+    @patch("app.models.user.User.find_user_by_username")
+    @patch("app.models.user.User.get_all_users")
+    def test_get_all_users_paginated(self, mock_get_all_users, mock_find_user):
+        mock_find_user.return_value = {"username": "testuser"}
+        mock_get_all_users.return_value = {"users": [{"username": "alice", "spotify_id": "a"}], "next": "abc"}
+        headers = {"Authorization": f"Bearer {self.valid_token}"}
+        response = self.client.get("/user/users?limit=1&cursor=xyz", headers=headers)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json["data"]["next"], "abc")
+        mock_get_all_users.assert_called_once_with(1, "xyz")
+
+    @patch("app.models.user.User.find_user_by_username")
+    @patch("app.models.user.User.search_users")
+    def test_authenticated_user_is_cached(self, mock_search_users, mock_find_user):
+        mock_find_user.return_value = {"_id": 1, "username": "testuser"}
+        mock_search_users.return_value = {"users": []}
+        headers = {"Authorization": f"Bearer {self.valid_token}"}
+
+        self.client.get("/user/search?q=a", headers=headers)
+        self.client.get("/user/search?q=b", headers=headers)
+
+        mock_find_user.assert_called_once_with("testuser")
+
+    @patch("app.utils.token_manager.TokenManager.invalidate_tokens_for_user")
+    @patch("app.models.user.PersistenceManager.get_database")
+    @patch("app.models.user.User.find_user_by_username")
+    def test_delete_account_invalidates_cached_user(self, mock_find_user, mock_get_database, mock_invalidate):
+        mock_find_user.return_value = {"_id": 1, "username": "testuser"}
+        mock_get_database.return_value.users.delete_one.return_value.deleted_count = 1
+        headers = {"Authorization": f"Bearer {self.valid_token}"}
+
+        response = self.client.delete("/user/delete", headers=headers)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(principal_cache.get("testuser"))
+
+    @patch("app.models.user.PersistenceManager.get_database")
+    def test_search_users_ranks_bounded_candidates_on_server(self, mock_get_database):
+        mock_get_database.return_value.users.aggregate.return_value = [
+            {"username": "Eminem", "spotify_id": "1", "score": 2.0},
+            {"username": "eminence", "score": 1.4},
+        ]
+
+        result = User.search_users("  EMIN ", 2)
+
+        self.assertEqual(result, {"users": [{"username": "Eminem", "spotify_id": "1"},
+                                            {"username": "eminence", "spotify_id": None}]})
+        pipeline = mock_get_database.return_value.users.aggregate.call_args[0][0]
+        self.assertEqual(pipeline[:2], [{"$match": {"username_grams": {"$in": User.trigrams("emin")}}},
+                                        {"$limit": SEARCH_CANDIDATES}])
+        self.assertEqual(pipeline[2]["$unionWith"]["pipeline"],
+                         [{"$match": {"username_lower": {"$regex": "^emin"}}}, {"$limit": 2}])
+        self.assertEqual(pipeline[-2:], [{"$sort": {"score": -1, "username_lower": 1}}, {"$limit": 2}])
+        self.assertTrue(mock_get_database.return_value.users.aggregate.call_args[1]["allowDiskUse"])
+
 
 if __name__ == "__main__":
     unittest.main()